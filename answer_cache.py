@@ -0,0 +1,179 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_PATH, ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY
+)
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+def make_scope(corpus_version: int, file_filters=None, page_range=None) -> str:
+    """Answers are only reused for the same filter set over the same corpus."""
+    files = ",".join(sorted(file_filters)) if file_filters else "*"
+    pages = "-".join("" if p is None else str(p) for p in page_range) if page_range else "*"
+    return f"v{corpus_version}|{files}|{pages}"
+
+class AnswerCache:
+    """
+    Two-tier answer cache persisted as an append-only JSONL log:
+      1. exact tier   - (scope, normalized query text) -> result
+      2. semantic tier - cosine similarity of the query vector against cached
+         queries in the same scope, above `similarity`.
+    Entries are evicted least-recently-used beyond `max_entries`, and expire
+    `ttl` seconds after they were stored. Stores and hits append one line each;
+    the log is rewritten only when it grows well past the live entries, or on
+    clear/purge.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = ANSWER_CACHE_TTL_SECONDS, similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._log_lines = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._log_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted write
+                    self._replay(record)
+        except OSError as e:
+            print(f"⚠️ Could not read answer cache ({e}); starting empty.")
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _replay(self, record: Dict):
+        # The log is written in LRU order: a put or a touch moves the entry to the end.
+        if "put" in record:
+            entry = record["put"]
+            key = self._key(entry["scope"], entry["query"])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        elif "touch" in record:
+            key = self._key(*record["touch"])
+            if key in self._entries:
+                self._entries[key]["last_used"] = record["at"]
+                self._entries.move_to_end(key)
+
+    def _append(self, record: Dict):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write answer cache: {e}")
+            return
+        self._log_lines += 1
+        if self._log_lines > 2 * self.max_entries:
+            self._save()
+
+    def _save(self):
+        """Rewrite the log with just the live entries, oldest first."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps({"put": entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._log_lines = len(self._entries)
+
+    @staticmethod
+    def _key(scope: str, normalized_query: str) -> str:
+        return f"{scope}\x00{normalized_query}"
+
+    def _expire(self, now: float):
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl]
+        for k in expired:
+            del self._entries[k]
+
+    def _hit(self, key: str, kind: str) -> Dict:
+        entry = self._entries[key]
+        entry["last_used"] = time.time()
+        self._entries.move_to_end(key)
+        self._append({"touch": [entry["scope"], entry["query"]], "at": entry["last_used"]})
+        self.stats[kind] += 1
+        return dict(entry["result"], cached=kind)
+
+    def lookup(self, query: str, query_vector, scope: str) -> Optional[Dict]:
+        """Return a cached result (with a `cached` marker) or None on a miss."""
+        normalized = normalize_query(query)
+        with self._lock:
+            self._expire(time.time())
+            key = self._key(scope, normalized)
+            if key in self._entries:
+                return self._hit(key, "exact_hits")
+
+            candidates = [(k, e) for k, e in self._entries.items() if e["scope"] == scope]
+            if candidates and query_vector is not None:
+                q = np.asarray(query_vector, dtype=np.float32)
+                q = q / (np.linalg.norm(q) or 1.0)  # not in place: q may be the caller's array
+                matrix = np.asarray([e["vector"] for _, e in candidates], dtype=np.float32)
+                sims = matrix @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity:
+                    return self._hit(candidates[best][0], "semantic_hits")
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, query: str, query_vector, scope: str, result: Dict):
+        v = np.asarray(query_vector, dtype=np.float32)
+        v = v / (np.linalg.norm(v) or 1.0)
+        now = time.time()
+        normalized = normalize_query(query)
+        with self._lock:
+            key = self._key(scope, normalized)
+            entry = {
+                "scope": scope,
+                "query": normalized,
+                "vector": [round(float(x), 6) for x in v],
+                "result": result,
+                "created": now,
+                "last_used": now
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._append({"put": entry})
+
+    def purge_other_versions(self, corpus_version: int):
+        """Drop entries from earlier corpus versions (they can never hit again)."""
+        prefix = f"v{corpus_version}|"
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if not e["scope"].startswith(prefix)]
+            if stale:
+                for k in stale:
+                    del self._entries[k]
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def __len__(self):
+        return len(self._entries)
+
+answer_cache = AnswerCache()
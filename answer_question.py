@@ -1,7 +1,26 @@
 import re
-from retriever import retrieve_top_k_chunks
-from embedder import embed_query
-from llama_cpp_interface import generate_answer
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from retriever import retrieve_top_k_chunks, retrieve_top_k_chunks_batch
+from embedder import embed_query, encode_texts
+from llama_cpp_interface import generate_answer, stream_answer, clean_repetitions, pack_context, BUSY_ANSWER
+from llm_scheduler import SchedulerBusy
+from answer_cache import answer_cache, make_scope
+from ingestion import current_corpus_version
+from startup import record_first_answer
+from tracing import start_trace
+from config import (
+    ANSWER_CACHE_ENABLED, ANSWER_TOP_K, RERANK_ENABLED, RERANK_CANDIDATES, BATCH_QUERY_SIZE, LLM_WORKERS
+)
+
+if RERANK_ENABLED:
+    from reranker import rerank
+
+FAILED_ANSWERS = {"Failed to generate an answer.", BUSY_ANSWER}
+_seen_corpus_version = None
 
 def extract_relevant_lines_with_numbers(query: str, chunk_text: str, min_match=2, context_lines=0):
     """
@@ -51,63 +70,265 @@ def is_list_question(user_query: str):
     t = user_query.lower()
     return any(w in t for w in list_words)
 
-def answer_question(user_query: str) -> dict:
-    print(f"❓ User query: {user_query}")
-
+def _embed_and_check_cache(user_query: str, trace, file_filters=None, page_range=None):
+    """
+    Embed the query and consult the answer cache.
+    Returns (query_vector, scope, cached_or_error_result); the last item is None
+    when the question still has to be answered.
+    """
+    global _seen_corpus_version
     try:
-        query_vector = embed_query(user_query)
+        with trace.span("embed"):
+            query_vector = embed_query(user_query)
     except Exception as e:
         print(f"❌ Failed to embed query: {e}")
-        return {"answer": "Failed to process your query due to embedding error.", "source": None}
+        return None, None, {"answer": "Failed to process your query due to embedding error.", "source": None}
+
+    if not ANSWER_CACHE_ENABLED:
+        return query_vector, None, None
+    with trace.span("cache"):
+        version = current_corpus_version()
+        if version != _seen_corpus_version:
+            answer_cache.purge_other_versions(version)
+            _seen_corpus_version = version
+        scope = make_scope(version, file_filters, page_range)
+        cached = answer_cache.lookup(user_query, query_vector, scope)
+    if cached:
+        print(f"⚡ Answer cache hit ({cached['cached']}).")
+    return query_vector, scope, cached
 
+def _cache_result(user_query: str, query_vector, scope, result: dict):
+    if scope is None or not result.get("source") or result.get("answer") in FAILED_ANSWERS:
+        return
+    answer_cache.store(user_query, query_vector, scope, {
+        "answer": result["answer"], "source": result["source"]
+    })
+
+def _select_context(user_query: str, query_vector, trace, file_filters=None, page_range=None):
+    """
+    Retrieve a candidate set, rerank it with the cross-encoder (if enabled),
+    then pack the best chunks into one context.
+    Returns (selected_chunk, None) or (None, error_result).
+    """
     try:
-        # Boost top_k to ENSURE all list chunks are fetched
-        top_chunks = retrieve_top_k_chunks(query_vector, top_k=15)
+        # Retrieval is cheap: take a wide candidate set when a reranker will narrow it down.
+        with trace.span("search"):
+            top_chunks = retrieve_top_k_chunks(
+                query_vector, top_k=RERANK_CANDIDATES if RERANK_ENABLED else ANSWER_TOP_K,
+                file_filters=file_filters, page_range=page_range, query_text=user_query
+            )
     except Exception as e:
         print(f"❌ Retrieval failed: {e}")
-        return {"answer": "Failed to retrieve relevant information.", "source": None}
+        return None, {"answer": "Failed to retrieve relevant information.", "source": None}
+    return _choose_context(user_query, top_chunks, trace)
 
+def _choose_context(user_query: str, top_chunks, trace):
+    """
+    Rerank retrieved candidates (if enabled) and pack the best into one context.
+    Returns (selected_chunk, None) or (None, error_result).
+    """
     if not top_chunks or not isinstance(top_chunks[0], dict) or "chunk_text" not in top_chunks[0]:
-        return {"answer": "No relevant context found in the documents.", "source": None}
-
-    # --------- NEW: Combine all chunks that look like they have 'principle' or are list-numbered ---------
-    list_chunks = []
-    for c in top_chunks:
-        lines = c['chunk_text'].splitlines()
-        if ("principle" in c['chunk_text'].lower() 
-            or sum(1 for l in lines if re.match(r'^\s*\d+\.\s', l)) > 0):
-            list_chunks.append(c)
-    if not list_chunks:
-        list_chunks = top_chunks[:1]
-    combined_text = "\n".join([c['chunk_text'] for c in list_chunks])
-    selected_chunk = {
-        'chunk_text': combined_text,
-        'filename': list_chunks[0]['filename'],
-        'page_number': list_chunks[0]['page_number'],
-        'chunk_id': ",".join([c['chunk_id'] for c in list_chunks])
+        return None, {"answer": "No relevant context found in the documents.", "source": None}
+
+    if RERANK_ENABLED:
+        with trace.span("rerank"):
+            top_chunks = rerank(user_query, top_chunks)
+    # Fill the LLM's token budget, best-scoring first, without overlapping chunks.
+    with trace.span("context"):
+        selected_chunk = pack_context(top_chunks, user_query)
+    if not selected_chunk["citations"]:
+        return None, {"answer": "No relevant context found in the documents.", "source": None}
+    return selected_chunk, None
+
+def _add_generation_stages(trace, stats: dict):
+    """Split the LLM call into queue wait, prompt evaluation and token generation."""
+    queue_wait = stats.get("queue_wait", 0.0)
+    trace.add("queue_wait", queue_wait)
+    if "time_to_first_token" in stats:
+        trace.add("prompt_eval", stats["time_to_first_token"] - queue_wait)
+        trace.add("generation", stats.get("generation_time", 0.0))
+
+def _build_source(selected_chunk: dict, user_query: str, trace) -> dict:
+    # Proof extraction
+    with trace.span("proof"):
+        matched_lines, matched_line_nums = extract_relevant_lines_with_numbers(
+            user_query, selected_chunk.get("chunk_text", "")
+        )
+        proof = format_proof_context(
+            matched_lines,
+            selected_chunk.get("page_number", "N/A"),
+            matched_line_nums
+        )
+    return {
+        "filename": selected_chunk.get("filename", "N/A"),
+        "page_number": selected_chunk.get("page_number", "N/A"),
+        "chunk_id": selected_chunk.get("chunk_id", "N/A"),
+        "citations": selected_chunk.get("citations", []),
+        "matched_content": proof
     }
 
+def answer_question(user_query: str, file_filters=None, page_range=None) -> dict:
+    print(f"❓ User query: {user_query}")
+    trace = start_trace("answer", query=user_query)
+
+    query_vector, scope, cached = _embed_and_check_cache(user_query, trace, file_filters, page_range)
+    if cached:
+        trace.finish(outcome="cached", answer=cached.get("answer"))
+        return cached
+
+    selected_chunk, error = _select_context(user_query, query_vector, trace, file_filters, page_range)
+    if error:
+        trace.finish(outcome="no_context", answer=error["answer"])
+        return error
+
+    stats = {}
     try:
-        answer = generate_answer(selected_chunk, user_query)
+        answer = generate_answer(selected_chunk, user_query, stats=stats)
     except Exception as e:
         print(f"❌ LLM generation failed: {e}")
         answer = "Failed to generate an answer."
+    _add_generation_stages(trace, stats)
+    record_first_answer()
 
-    # Proof extraction
-    matched_lines, matched_line_nums = extract_relevant_lines_with_numbers(
-        user_query, selected_chunk.get("chunk_text", "")
-    )
-    proof = format_proof_context(
-        matched_lines,
-        selected_chunk.get("page_number", "N/A"),
-        matched_line_nums
-    )
-    return {
-        "answer": answer,
-        "source": {
-            "filename": selected_chunk.get("filename", "N/A"),
-            "page_number": selected_chunk.get("page_number", "N/A"),
-            "chunk_id": selected_chunk.get("chunk_id", "N/A"),
-            "matched_content": proof
-        }
-    }
+    result = {"answer": answer, "source": _build_source(selected_chunk, user_query, trace)}
+    _cache_result(user_query, query_vector, scope, result)
+    trace.finish(outcome="failed" if answer in FAILED_ANSWERS else "answered", answer=answer,
+                 tokens=stats.get("tokens", 0))
+    return dict(result, timings=dict(trace.stages))
+
+def answer_question_stream(user_query: str, file_filters=None, page_range=None):
+    """
+    Streaming variant of answer_question. Yields {"token": str} events while the
+    LLM generates, then a single {"result": dict} event holding the cleaned answer,
+    its source, the generation stats (time to first token, tokens/sec) and the
+    per-stage timings.
+    """
+    print(f"❓ User query: {user_query}")
+    trace = start_trace("answer", query=user_query)
+
+    query_vector, scope, cached = _embed_and_check_cache(user_query, trace, file_filters, page_range)
+    if cached:
+        trace.finish(outcome="cached", answer=cached.get("answer"))
+        yield {"result": cached}
+        return
+
+    selected_chunk, error = _select_context(user_query, query_vector, trace, file_filters, page_range)
+    if error:
+        trace.finish(outcome="no_context", answer=error["answer"])
+        yield {"result": error}
+        return
+
+    stats = {}
+    parts = []
+    try:
+        for token in stream_answer(selected_chunk, user_query, stats=stats):
+            parts.append(token)
+            yield {"token": token}
+        answer = clean_repetitions("".join(parts).strip())
+    except SchedulerBusy:
+        print("⚠️ LLM queue full; request rejected.")
+        answer = BUSY_ANSWER
+    except Exception as e:
+        print(f"❌ LLM generation failed: {e}")
+        answer = "Failed to generate an answer."
+    _add_generation_stages(trace, stats)
+    record_first_answer()
+
+    result = {"answer": answer, "source": _build_source(selected_chunk, user_query, trace)}
+    _cache_result(user_query, query_vector, scope, result)
+    trace.finish(outcome="failed" if answer in FAILED_ANSWERS else "answered", answer=answer,
+                 tokens=stats.get("tokens", 0))
+    yield {"result": dict(result, generation=stats, timings=dict(trace.stages))}
+
+def _retrieve_batch(questions, traces, file_filters=None, page_range=None):
+    """
+    Embed and search a batch of questions with one encode and one bulk search;
+    each trace gets an equal share of the batch's embed/search time.
+    Returns one (selected_chunk, error_result) pair per question.
+    """
+    n = len(questions)
+    try:
+        t0 = time.perf_counter()
+        vectors = encode_texts(questions)
+        t1 = time.perf_counter()
+        candidates = retrieve_top_k_chunks_batch(
+            vectors, top_k=RERANK_CANDIDATES if RERANK_ENABLED else ANSWER_TOP_K,
+            file_filters=file_filters, page_range=page_range, query_texts=questions
+        )
+        t2 = time.perf_counter()
+    except Exception as e:
+        print(f"❌ Batch retrieval failed: {e}")
+        return [(None, {"answer": "Failed to retrieve relevant information.", "source": None})] * n
+    for trace in traces:
+        trace.add("embed", (t1 - t0) / n)
+        trace.add("search", (t2 - t1) / n)
+    return [_choose_context(q, top_chunks, trace) for q, top_chunks, trace in zip(questions, candidates, traces)]
+
+def _answer_selected(user_query: str, selected_chunk, error, trace) -> dict:
+    if error:
+        trace.finish(outcome="no_context", answer=error["answer"])
+        return dict(error, timings=dict(trace.stages))
+    stats = {}
+    try:
+        answer = generate_answer(selected_chunk, user_query, stats=stats)
+    except Exception as e:
+        print(f"❌ LLM generation failed: {e}")
+        answer = "Failed to generate an answer."
+    _add_generation_stages(trace, stats)
+    record_first_answer()
+    result = {"answer": answer, "source": _build_source(selected_chunk, user_query, trace)}
+    record = trace.finish(outcome="failed" if answer in FAILED_ANSWERS else "answered", answer=answer,
+                          tokens=stats.get("tokens", 0))
+    return dict(result, timings=dict(trace.stages), latency=record["total"])
+
+def answer_questions(questions, file_filters=None, page_range=None,
+                     batch_size: int = BATCH_QUERY_SIZE, workers: int = LLM_WORKERS):
+    """
+    Answer many questions, yielding one result per question in input order.
+
+    Retrieval runs in a background thread, `batch_size` questions at a time
+    (one batched encode, one bulk vector search), while generation of the
+    previous batches proceeds on `workers` threads feeding the LLM
+    scheduler. The answer cache is bypassed, so every question is really
+    answered (regression runs). Each result carries "timings" (per stage;
+    embed/search are the batch's time split evenly) and "latency" (seconds
+    from the start of its batch's retrieval to its answer).
+    """
+    questions = list(questions)
+    ready = queue.Queue(maxsize=2)  # retrieved batches waiting for generation
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def retrieve():
+        try:
+            for start in range(0, len(questions), batch_size):
+                batch = questions[start:start + batch_size]
+                traces = [start_trace("answer", query=q, batch=True) for q in batch]
+                put(list(zip(batch, _retrieve_batch(batch, traces, file_filters, page_range), traces)))
+        finally:
+            put(None)
+
+    threading.Thread(target=retrieve, daemon=True).start()
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while True:
+                items = ready.get()
+                if items is None:
+                    break
+                for q, (selected_chunk, error), trace in items:
+                    pending.append(pool.submit(_answer_selected, q, selected_chunk, error, trace))
+                # Keep the scheduler busy but bounded; results stream out in order.
+                while len(pending) > 2 * max(1, workers):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        stop.set()
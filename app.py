@@ -1,14 +1,48 @@
 #app.py
+import startup  # first, so startup timings start at process start
 import streamlit as st
 import os
 import re
 import time
 import pandas as pd
-from answer_question import answer_question
-from data_loader import load_documents_from_folder
-from embedder import embed_and_store_chunks
-from qdrant_helper import create_collection as create_or_load_index
 from chunker import process_documents
+from parsed_store import parsed_store
+from config import WARMUP_ON_START, RESPONSE_TIME_WARNING_THRESHOLD, SERVER_URL, DOCS_DIR
+
+if SERVER_URL:
+    # Thin client: questions, ingestion and deletes go to a shared server.py process,
+    # which owns the vector store and keeps the models resident.
+    import client
+    from client import answer_question_stream, ingest_folder, delete_documents, cache_stats, clear_answer_cache
+else:
+    from answer_cache import answer_cache
+    from answer_question import answer_question_stream
+    from ingestion import ingest_folder, delete_documents
+    from vector_backend import get_store
+
+    def cache_stats():
+        return dict(answer_cache.stats, entries=len(answer_cache))
+
+    def clear_answer_cache():
+        answer_cache.clear()
+
+@st.cache_resource(show_spinner=False)
+def load_resources():
+    """
+    Runs once per server process, not on every rerun: opens the vector store
+    and (optionally) starts loading the models in the background. As a thin
+    client it only checks that the answer server is up.
+    """
+    if SERVER_URL:
+        client.health()
+        startup.mark("app ready")
+        return None
+    store = get_store()
+    store.create_collection()
+    if WARMUP_ON_START:
+        startup.start_warm_up()
+    startup.mark("app ready")
+    return store
 
 # == NEON TECH THEME CSS ==
 st.set_page_config(page_title="TEAM CODE-O-PHILES RAG Chatbot", layout="wide")
@@ -65,7 +99,7 @@ st.markdown("""
 
 st.title("🤖 TEAM CODE-O-PHILES RAG Chatbot")
 
-docs_dir = "documents"
+docs_dir = DOCS_DIR  # with SERVER_URL set, this must be the server's DOCS_DIR too
 os.makedirs(docs_dir, exist_ok=True)
 st.info(
     "❗️ This chatbot does not handle greetings or open conversation. All answers come strictly from the uploaded documents."
@@ -93,13 +127,14 @@ with st.sidebar:
                     new_upload = True
             if new_upload:
                 with st.spinner("Processing and ingesting uploaded documents..."):
-                    chunks = load_documents_from_folder(docs_dir)
-                    chunk_count = len(chunks)
-                    if chunk_count == 0:
+                    summary = ingest_folder(docs_dir)
+                    changed = summary["added"] + summary["updated"]
+                    if summary["failed"]:
+                        st.error(f"Could not parse: {', '.join(summary['failed'])}", icon='🚫')
+                    if changed and summary["chunks"] == 0:
                         st.error("No chunks generated. Please check your files.", icon='🚫')
-                    else:
-                        st.success(f"✅ {len(saved_paths)} file(s) ingested! {chunk_count} chunks total.")
-                        embed_and_store_chunks(chunks)
+                    elif changed:
+                        st.success(f"✅ {len(changed)} file(s) ingested! {summary['chunks']} new chunks.")
             else:
                 st.info("No new files uploaded or all files up-to-date.")
 
@@ -108,35 +143,43 @@ with st.sidebar:
         existing_files = [f for f in os.listdir(docs_dir) if f.lower().endswith(('.pdf', '.docx'))]
         to_del = st.multiselect("Select file(s) to delete:", options=existing_files, key="delete_sidebar")
         if st.button("Delete Selected"):
-            for fname in to_del:
-                try:
-                    os.remove(os.path.join(docs_dir, fname))
-                    st.success(f"Deleted: {fname}", icon="✅")
-                except Exception as e:
-                    st.error(f"Problem deleting {fname}: {e}")
+            with st.spinner("Removing files and their indexed chunks..."):
+                result = delete_documents(docs_dir, to_del)
+            for fname in result["deleted"]:
+                st.success(f"Deleted: {fname}", icon="✅")
+            for fname, error in result["failed"].items():
+                st.error(f"Problem deleting {fname}: {error}")
             st.experimental_rerun()
 
     # --- Chunk Table & Preview
     with st.expander("📊 Chunk Status + Preview", expanded=False):
         def chunk_preview_and_table():
-            docs = [f for f in os.listdir(docs_dir) if f.endswith(('.pdf', '.docx'))]
-            file_counts, preview_chunks = [], {}
+            """
+            Counts come from the parsed-document store; only new or modified files
+            get parsed (once). Files that failed to parse stay "ERR" until they change.
+            """
+            docs = sorted(f for f in os.listdir(docs_dir) if f.endswith(('.pdf', '.docx')))
+            paths = {f: os.path.join(docs_dir, f) for f in docs}
+            summaries = parsed_store.summaries(list(paths.values()))
+            stale = [paths[f] for f in docs if summaries[paths[f]] is None]
+            if stale:
+                with st.spinner(f"Parsing {len(stale)} new or modified file(s)..."):
+                    process_documents(stale)
+                summaries = parsed_store.summaries(list(paths.values()))
+            file_counts = []
             for f in docs:
-                path = os.path.join(docs_dir, f)
-                try:
-                    chunks = process_documents([path])
-                    file_counts.append({"Document": f, "Chunks": len(chunks)})
-                    preview_chunks[f] = chunks[0]["chunk_text"][:350] + ("..." if len(chunks[0]["chunk_text"]) > 350 else "")
-                except Exception:
-                    file_counts.append({"Document": f, "Chunks": "ERR"})
-                    preview_chunks[f] = "Preview failed."
-            return file_counts, preview_chunks
-        file_counts, preview_chunks = chunk_preview_and_table()
+                summary = summaries[paths[f]]
+                failed = summary is None or summary["error"]
+                file_counts.append({"Document": f, "Chunks": "ERR" if failed else summary["num_chunks"]})
+            return file_counts, paths
+        file_counts, preview_paths = chunk_preview_and_table()
         if file_counts:
             st.write("**Chunk Table:**")
             st.dataframe(pd.DataFrame(file_counts), use_container_width=True)
-            doc_to_preview = st.selectbox("Preview doc:", list(preview_chunks.keys()), key="doc_prev")
-            st.code(preview_chunks[doc_to_preview], language="markdown")
+            doc_to_preview = st.selectbox("Preview doc:", list(preview_paths.keys()), key="doc_prev")
+            first = parsed_store.first_chunk(preview_paths[doc_to_preview])
+            preview = first[:350] + ("..." if len(first) > 350 else "") if first else "Preview failed."
+            st.code(preview, language="markdown")
 
     # --- File-wise Filtering
     with st.expander("🔎 File-wise Query Filter", expanded=False):
@@ -144,11 +187,36 @@ with st.sidebar:
         filter_files = st.multiselect(
             "Restrict Query to Files (optional)", options=existing_files, key="file_filter"
         )
+        page_col1, page_col2 = st.columns(2)
+        with page_col1:
+            page_from = st.number_input("From page (0 = any)", min_value=0, value=0, step=1, key="page_from")
+        with page_col2:
+            page_to = st.number_input("To page (0 = any)", min_value=0, value=0, step=1, key="page_to")
+
+    # --- Answer cache stats
+    with st.expander("⚡ Answer Cache", expanded=False):
+        try:
+            cache_info = cache_stats()  # the server's cache when SERVER_URL is set
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Exact hits", cache_info["exact_hits"])
+            c2.metric("Similar hits", cache_info["semantic_hits"])
+            c3.metric("Misses", cache_info["misses"])
+            st.caption(f"{cache_info['entries']} cached answers")
+            if st.button("Clear answer cache"):
+                clear_answer_cache()
+        except Exception as e:
+            st.caption(f"Answer cache unavailable: {e}")
+
+    # --- Startup timings
+    with st.expander("⏱️ Startup", expanded=False):
+        for name, seconds in startup.metrics().items():
+            st.write(f"**{name}:** " + (f"{seconds:.2f} sec" if seconds is not None else "not yet"))
 
 try:
-    create_or_load_index()
+    load_resources()
 except Exception as e:
-    st.error(f"Failed to load Qdrant collection: {e}")
+    st.error(f"Answer server at {SERVER_URL} is not reachable: {e}" if SERVER_URL
+             else f"Failed to load vector store: {e}")
 
 st.markdown("---")
 st.subheader("💬 Ask about your uploaded documents:")
@@ -165,6 +233,12 @@ def render_source(source, highlight=None):
         with st.expander("📄 Source Context", expanded=False):
             st.text(f"📁 File: {source.get('filename', 'N/A')}")
             st.text(f"📄 Page: {source.get('page_number', 'N/A')} | 🔖 Chunk ID: {source.get('chunk_id', 'N/A')}")
+            citations = source.get("citations") or []
+            if len(citations) > 1:
+                st.markdown("\n".join(
+                    f"- [{c['ref']}] {c['filename']}, page {c['page_number']} (chunk {c['chunk_id']})"
+                    for c in citations
+                ))
             # === This uses only the precise proof content (with heading and line numbers) ===
             proof = source.get("matched_content") or "Proof from document:\n(No direct supporting text was extracted from this chunk.)"
             st.markdown(proof)
@@ -193,30 +267,6 @@ def pretty_bot_answer(ans):
 
 user_input = st.chat_input("Type your question here and hit Enter...", key="chat_input")
 
-if user_input:
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
-    with st.spinner("Thinking..."):
-        t0 = time.time()
-        files_to_filter_on = filter_files if filter_files else None
-        result = answer_question(user_input, file_filters=files_to_filter_on) if 'file_filters' in answer_question.__code__.co_varnames else answer_question(user_input)
-        elapsed = time.time() - t0
-
-        answer = result.get("answer", "No answer generated.")
-        source = result.get("source")
-        answer_msg = pretty_bot_answer(answer)
-        highlight_snippet = answer if source and answer and answer.lower() in source.get("chunk_text", "").lower() else None
-
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": answer_msg + f"\n\n<span style='font-size:.82em;color:#7ee1fe;'>⏱️ Response time: {elapsed:.2f} sec</span>",
-            "source": source,
-            "highlight": highlight_snippet
-        })
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": "<span style='color:#26f7fd'>🤖 Do you have another question about your documents?</span>"
-        })
-
 with st.container():
     st.markdown('<div class="scroll-box-chat" id="chat-scrollbox">', unsafe_allow_html=True)
     for idx, msg in enumerate(st.session_state.chat_history):
@@ -249,6 +299,58 @@ with st.container():
             st.markdown("<div class='chat-meta-divider'></div>", unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+if user_input:
+    st.session_state.chat_history.append({"role": "user", "content": user_input})
+    st.markdown("<div class='chat-meta-divider'></div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='user-bubble'>{user_input}</div>", unsafe_allow_html=True)
+    st.markdown("<div class='chat-meta-divider'></div>", unsafe_allow_html=True)
+
+    # Streaming bubble: tokens are rendered as llama.cpp produces them.
+    bubble = st.empty()
+    bubble.markdown("<div class='bot-bubble'>Thinking...</div>", unsafe_allow_html=True)
+    t0 = time.time()
+    files_to_filter_on = filter_files if filter_files else None
+    page_range = (int(page_from) or None, int(page_to) or None)
+    streamed, result = "", {}
+    for event in answer_question_stream(user_input, file_filters=files_to_filter_on, page_range=page_range):
+        if "token" in event:
+            streamed += event["token"]
+            bubble.markdown(f"<div class='bot-bubble'>{streamed}▌</div>", unsafe_allow_html=True)
+        else:
+            result = event["result"]
+    elapsed = time.time() - t0
+
+    answer = result.get("answer", "No answer generated.")
+    source = result.get("source")
+    generation = result.get("generation", {})
+    ttft = generation.get("time_to_first_token")
+    queue_wait = generation.get("queue_wait") or 0.0
+    answer_msg = pretty_bot_answer(answer)
+    highlight_snippet = answer if source and answer and answer.lower() in source.get("chunk_text", "").lower() else None
+    timing = f"⏱️ Response time: {elapsed:.2f} sec"
+    if result.get("cached"):
+        timing += " (⚡ cached answer)"
+    elif ttft is not None:
+        timing += f" (first token after {ttft:.2f} sec"
+        timing += f", {queue_wait:.2f} sec waiting for the model)" if queue_wait >= 0.05 else ")"
+    stages = result.get("timings") or {}
+    if elapsed > RESPONSE_TIME_WARNING_THRESHOLD and stages:
+        slowest = max(stages, key=stages.get)
+        timing += f" — slowest stage: {slowest} ({stages[slowest]:.2f} sec)"
+
+    st.session_state.chat_history.append({
+        "role": "assistant",
+        "content": answer_msg + f"\n\n<span style='font-size:.82em;color:#7ee1fe;'>{timing}</span>",
+        "source": source,
+        "highlight": highlight_snippet
+    })
+    st.session_state.chat_history.append({
+        "role": "assistant",
+        "content": "<span style='color:#26f7fd'>🤖 Do you have another question about your documents?</span>"
+    })
+    # Rerun so the finished answer is drawn with its source and feedback buttons.
+    st.experimental_rerun()
+
 # Download chat history
 history_lines = [
     f"{msg['role'].capitalize()}: {re.sub('<.*?>','',msg['content'])}"
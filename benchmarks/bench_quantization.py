@@ -0,0 +1,111 @@
+"""
+Measure recall@k, latency and memory of quantized flat-index search.
+
+    python benchmarks/bench_quantization.py [--chunks 100000] [--queries 200] [--k 5]
+                                            [--rescore 0 50 200 500] [--embeddings vectors.npy]
+
+Ground truth is exact float32 cosine top-k. Every quantization ("none",
+"int8", "binary") is searched with each rescore shortlist size; a shortlist
+of 0 means "no rescoring", i.e. the ranking of the quantized pass alone.
+Memory is reported as the bytes the first pass scans (kept hot in RAM)
+and the total on-disk size of the index.
+
+By default the corpus is synthetic: clustered unit vectors, which are closer to
+real sentence embeddings than uniform noise. Pass --embeddings with a saved
+(n, dim) matrix of real embeddings for representative numbers. Queries are
+perturbed corpus rows.
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from config import EMBEDDING_DIMENSION
+from flat_index import FlatIndexStore
+
+BUILD_BATCH = 4096
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    return (v / np.linalg.norm(v, axis=1, keepdims=True)).astype(np.float32)
+
+def synthetic_corpus(n: int, dim: int, seed: int = 0, clusters: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return _unit(centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)))
+
+def make_queries(corpus: np.ndarray, n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = corpus[rng.integers(0, len(corpus), n)]
+    return _unit(rows + 0.05 * rng.normal(size=rows.shape))
+
+def build(path: str, corpus: np.ndarray, quantization: str) -> FlatIndexStore:
+    store = FlatIndexStore(path=path, dimension=corpus.shape[1], quantization=quantization)
+    store.create_collection()
+    for start in range(0, len(corpus), BUILD_BATCH):
+        stop = min(start + BUILD_BATCH, len(corpus))
+        payloads = [{"filename": "bench.pdf", "page_number": 1, "chunk_id": str(i)} for i in range(start, stop)]
+        store.add_documents(corpus[start:stop], payloads, ids=list(range(start, stop)))
+    return store
+
+def index_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def run(store: FlatIndexStore, queries: np.ndarray, truth: np.ndarray, k: int, rescore: int) -> dict:
+    # rescore=0 -> shortlist of exactly k, i.e. the quantized ranking decides membership.
+    store.rescore_candidates = rescore or k
+    recalls, latencies = [], []
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        hits = store.search(q, top_k=k)
+        latencies.append(time.perf_counter() - t)
+        recalls.append(len({h["point_id"] for h in hits} & set(expected.tolist())) / k)
+    latencies.sort()
+    return {
+        "recall_at_k": statistics.mean(recalls),
+        "query_p50_ms": statistics.median(latencies) * 1000,
+        "query_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 50, 200, 500])
+    parser.add_argument("--embeddings", help="Optional .npy (n, dim) matrix of real embeddings")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        corpus = _unit(np.load(args.embeddings).astype(np.float32))[: args.chunks]
+    else:
+        corpus = synthetic_corpus(args.chunks, EMBEDDING_DIMENSION)
+    queries = make_queries(corpus, args.queries)
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, : args.k]
+    print(f"📊 {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench_quant_") as tmp:
+        for quantization in ("none", "int8", "binary"):
+            path = os.path.join(tmp, quantization)
+            store = build(path, corpus, quantization)
+            first_pass = store._codes.nbytes if quantization != "none" else store._vectors.nbytes
+            for rescore in (args.rescore if quantization != "none" else [0]):
+                r = dict(run(store, queries, truth, args.k, rescore), quantization=quantization,
+                         rescore=rescore, first_pass_mb=first_pass / 2**20, disk_mb=index_bytes(path) / 2**20)
+                rows.append(r)
+                print(f"{quantization:>6} rescore {rescore:>4} | recall@{args.k} {r['recall_at_k']:.3f} | "
+                      f"p50 {r['query_p50_ms']:7.2f} ms p95 {r['query_p95_ms']:7.2f} ms | "
+                      f"first pass {r['first_pass_mb']:7.1f} MB | disk {r['disk_mb']:7.1f} MB")
+
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
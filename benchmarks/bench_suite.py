@@ -0,0 +1,232 @@
+"""
+Offline end-to-end benchmark suite: ingestion throughput, retrieval latency
+at several corpus sizes, and answer_question latency per stage.
+
+    python benchmarks/bench_suite.py [--pdfs 10 --pages 20 --docx 5]
+                                     [--sizes 1000 10000 50000] [--queries 50]
+                                     [--backend flat] [--real-embedder] [--token-delay 0.0]
+                                     [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Runs with LLM_MODE="stub" (and, unless --real-embedder, EMBEDDING_MODE="stub"),
+so no model files are needed and every run does identical work. All indexes,
+caches and logs live in a temporary directory; the answer and embedding caches
+are off so every query and chunk is really processed.
+
+Results are written as JSON to benchmarks/results/. With a baseline file,
+every metric is compared against it and the run exits with status 1 if
+any metric regressed by more than --tolerance (default 20%). Baselines are
+machine-specific: record one with --save-baseline on the machine that
+compares against it.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import config
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+def configure(tmp: str, args):
+    """Point every store, cache and log at `tmp` and select the stub models.
+    Must run before any other project module is imported."""
+    config.LLM_MODE = "stub"
+    config.STUB_TOKEN_DELAY = args.token_delay
+    config.EMBEDDING_MODE = "sentence-transformers" if args.real_embedder else "stub"
+    config.VECTOR_BACKEND = args.backend
+    config.QDRANT_PATH = os.path.join(tmp, "qdrant")
+    config.FLAT_INDEX_PATH = os.path.join(tmp, "flat_index")
+    config.LEXICAL_INDEX_PATH = os.path.join(tmp, "lexical.sqlite")
+    config.INGEST_MANIFEST_PATH = os.path.join(tmp, "manifest.json")
+    config.PARSED_STORE_PATH = os.path.join(tmp, "parsed_documents.sqlite")
+    config.METADATA_STORE_PATH = os.path.join(tmp, "chunk_metadata.sqlite")
+    config.ANSWER_CACHE_ENABLED = False
+    config.ANSWER_CACHE_PATH = os.path.join(tmp, "answer_cache.jsonl")
+    config.EMBEDDING_CACHE_ENABLED = False
+    config.LLM_PREFIX_CACHE_PATH = ""
+    config.LOG_DIR = os.path.join(tmp, "logs")
+    config.LOG_LATENCY = False
+    config.SAVE_RESPONSES = False
+
+def _percentiles(prefix: str, seconds: list) -> dict:
+    values = sorted(seconds)
+    return {
+        f"{prefix}.p50_ms": statistics.median(values) * 1000,
+        f"{prefix}.p95_ms": values[int(0.95 * (len(values) - 1))] * 1000,
+    }
+
+def bench_ingest(docs_dir: str, corpus: dict) -> dict:
+    import tracing
+    from ingestion import ingest_folder
+    t0 = time.perf_counter()
+    summary = ingest_folder(docs_dir)
+    total = time.perf_counter() - t0
+    stages = {stage: s["p50"] for stage, s in tracing.summary().get("ingest", {}).items()}
+    return {
+        "ingest.total_s": total,
+        "ingest.pages_per_sec": corpus["pages"] / total,
+        "ingest.chunks_per_sec": summary["chunks"] / total,
+        "ingest.embeddings_per_sec": summary["chunks"] / stages["embed"] if stages.get("embed") else 0.0,
+        **{f"ingest.stage.{stage}_s": seconds for stage, seconds in stages.items() if stage != "total"},
+    }
+
+def bench_store_sizes(tmp: str, backend: str, sizes: list, n_queries: int) -> dict:
+    """Raw vector search latency on random unit vectors at each corpus size."""
+    from vector_backend import make_store
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(n_queries, config.EMBEDDING_DIMENSION)).astype(np.float32)
+    metrics = {}
+    for n in sizes:
+        store = make_store(backend, path=os.path.join(tmp, f"sized_{n}"))
+        store.create_collection()
+        for start in range(0, n, 4096):
+            stop = min(start + 4096, n)
+            vectors = rng.normal(size=(stop - start, config.EMBEDDING_DIMENSION)).astype(np.float32)
+            payloads = [{"filename": f"doc_{i % 50}.pdf", "page_number": i % 40 + 1,
+                         "chunk_id": str(i), "chunk_text": ""} for i in range(start, stop)]
+            store.add_documents(vectors, payloads, ids=list(range(start, stop)))
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            store.search(q, top_k=config.TOP_K)
+            latencies.append(time.perf_counter() - t)
+        metrics.update(_percentiles(f"retrieval.{backend}.{n}", latencies))
+    return metrics
+
+def bench_retrieval(questions: list) -> dict:
+    """Full retrieval path (embed + dense/hybrid search) over the ingested corpus."""
+    from embedder import embed_query
+    from retriever import retrieve_top_k_chunks
+    latencies = []
+    for q in questions:
+        t = time.perf_counter()
+        retrieve_top_k_chunks(embed_query(q), top_k=config.ANSWER_TOP_K, query_text=q)
+        latencies.append(time.perf_counter() - t)
+    return _percentiles(f"retrieval.{config.RETRIEVAL_MODE}", latencies)
+
+def bench_answers(facts: list) -> dict:
+    import tracing
+    from answer_question import answer_question
+    latencies, hits = [], 0
+    for fact in facts:
+        t = time.perf_counter()
+        result = answer_question(fact["question"])
+        latencies.append(time.perf_counter() - t)
+        citations = (result.get("source") or {}).get("citations", [])
+        hits += any(c["filename"] == fact["filename"] and c["page_number"] == fact["page_number"]
+                    for c in citations)
+    stages = tracing.summary().get("answer", {})
+    return {
+        **_percentiles("e2e", latencies),
+        "e2e.source_hit_rate": hits / len(facts),
+        **{f"e2e.stage.{stage}.p50_ms": s["p50"] * 1000 for stage, s in stages.items() if stage != "total"},
+    }
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith(("_per_sec", "_rate"))
+
+def compare(metrics: dict, baseline: dict, tolerance: float) -> list:
+    """Print a comparison table; return the names of regressed metrics."""
+    regressions = []
+    print(f"\n{'metric':<44} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(metrics) | set(baseline)):
+        old, new = baseline.get(name), metrics.get(name)
+        if old is None or new is None:
+            print(f"{name:<44} {str(old):>12} {str(new):>12} {'n/a':>9}")
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better(name) else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  ❌ regression"
+            regressions.append(name)
+        elif worse < -tolerance:
+            flag = "  ✅ improved"
+        print(f"{name:<44} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--docx", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--backend", default="flat", choices=["flat", "qdrant"])
+    parser.add_argument("--real-embedder", action="store_true", help="Use EMBEDDING_MODEL_NAME instead of the stub")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub LLM seconds per generated token")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as tmp:
+        configure(tmp, args)
+        from synthetic_corpus import generate_corpus
+
+        docs_dir = os.path.join(tmp, "documents")
+        print(f"📄 Generating corpus: {args.pdfs} PDFs x {args.pages} pages, {args.docx} DOCX...")
+        corpus = generate_corpus(docs_dir, args.pdfs, args.pages, args.docx, seed=args.seed)
+        facts = corpus["facts"][:: max(1, len(corpus["facts"]) // args.queries)][: args.queries]
+
+        metrics = {}
+        print("📥 Ingestion...")
+        metrics.update(bench_ingest(docs_dir, corpus))
+        print("🔎 Retrieval...")
+        metrics.update(bench_retrieval([f["question"] for f in facts]))
+        metrics.update(bench_store_sizes(tmp, args.backend, args.sizes, args.queries))
+        print("🧠 End-to-end answers...")
+        metrics.update(bench_answers(facts))
+
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "embedder": "real" if args.real_embedder else "stub",
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "save_baseline")},
+        },
+        "metrics": metrics,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results written to {out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        for name, value in sorted(metrics.items()):
+            print(f"{name:<44} {value:>12.3f}")
+        print("ℹ️ No baseline to compare against (run with --save-baseline to record one).")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("args") != result["meta"]["args"]:
+        print("⚠️ Baseline was recorded with different settings; comparison may not be meaningful.")
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}.")
+        sys.exit(1)
+    print("\n✅ No regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare vector backends on startup time, query latency and peak RSS.
+
+    python benchmarks/bench_vector_backends.py [--sizes 1000 10000 100000]
+                                               [--backends qdrant flat] [--queries 200]
+
+Each index is built once from seeded random unit vectors (with filename and
+page payloads). Then every (backend, size) pair is measured in a fresh
+subprocess, so startup and RSS are not polluted by the build or by the other
+backend. Startup means opening the store and answering the first query.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from config import EMBEDDING_DIMENSION
+from vector_backend import make_store
+
+BUILD_BATCH = 2048
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    v = np.random.default_rng(seed).normal(size=(n, EMBEDDING_DIMENSION)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+def _payloads(start: int, stop: int):
+    return [{
+        "filename": f"doc_{i % 50}.pdf",
+        "page_number": i % 40 + 1,
+        "chunk_id": f"{i % 40 + 1}_{i}",
+        "chunk_text": f"synthetic chunk {i} " * 20
+    } for i in range(start, stop)]
+
+def build(backend: str, path: str, n: int):
+    store = make_store(backend, path=path)
+    store.create_collection()
+    vectors = _vectors(n, seed=0)
+    for start in range(0, n, BUILD_BATCH):
+        stop = min(start + BUILD_BATCH, n)
+        store.add_documents(vectors[start:stop], _payloads(start, stop), ids=list(range(start, stop)))
+
+def measure(backend: str, path: str, n_queries: int) -> dict:
+    import resource
+    queries = _vectors(n_queries, seed=1)
+    t0 = time.perf_counter()
+    store = make_store(backend, path=path)
+    store.search(queries[0], top_k=5)
+    startup = time.perf_counter() - t0
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        store.search(q, top_k=5)
+        latencies.append(time.perf_counter() - t)
+    filtered = []
+    for q in queries[: max(1, n_queries // 4)]:
+        t = time.perf_counter()
+        store.search(q, top_k=5, file_filters=["doc_3.pdf"], page_range=(5, 20))
+        filtered.append(time.perf_counter() - t)
+
+    latencies.sort()
+    return {
+        "startup_s": startup,
+        "query_p50_ms": statistics.median(latencies) * 1000,
+        "query_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "filtered_p50_ms": statistics.median(filtered) * 1000,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["qdrant", "flat"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--measure", nargs=2, metavar=("BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.queries)))
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench_vectors_") as tmp:
+        for n in args.sizes:
+            for backend in args.backends:
+                path = os.path.join(tmp, f"{backend}_{n}")
+                t0 = time.perf_counter()
+                build(backend, path, n)
+                build_s = time.perf_counter() - t0
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--queries", str(args.queries),
+                     "--measure", backend, path],
+                    check=True, capture_output=True, text=True, cwd=ROOT
+                ).stdout.strip().splitlines()[-1]
+                rows.append(dict(json.loads(out), backend=backend, chunks=n, build_s=build_s))
+                r = rows[-1]
+                print(f"{backend:>7} {n:>7} chunks | build {build_s:6.2f} s | startup {r['startup_s']:6.3f} s | "
+                      f"query p50 {r['query_p50_ms']:7.2f} ms p95 {r['query_p95_ms']:7.2f} ms | "
+                      f"filtered p50 {r['filtered_p50_ms']:7.2f} ms | RSS {r['max_rss_mb']:7.1f} MB")
+
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Retrieval quality vs. cost: sweep chunking, k and index settings through
+retrieve_top_k_chunks and report recall@k, MRR, query latency and index size.
+
+    python benchmarks/eval_retrieval.py --docs documents/ --questions questions.jsonl
+    python benchmarks/eval_retrieval.py --synthetic 5 --stub-embedder     # self-contained smoke run
+
+    sweep options: --chunk-sizes 200 400  --overlaps 0 50  --k 1 3 5 10
+                   --quantization none int8 binary  --hnsw-m 16 32  --hnsw-ef 64 128 (qdrant only)
+                   --backend flat|qdrant  --mode hybrid|dense  --target-recall 0.9
+
+Questions file (JSONL), one question per line:
+    {"question": "...", "expected": [{"filename": "a.pdf", "page_number": 3, "contains": "exact phrase"}]}
+A retrieved chunk counts as relevant when it matches any expected entry:
+same filename, same page (if given) and containing the phrase (if given,
+whitespace/case-insensitive). Expectations are stated against the documents,
+not chunk ids, so they stay valid across chunk sizes. A facts.json written by
+synthetic_corpus.py is accepted too.
+
+recall@k is the fraction of questions with a relevant chunk in the top k;
+MRR is the mean of 1/rank of the first relevant chunk (0 if none in the top k).
+Latency covers retrieval only (the query embedding is computed once up front).
+Index size is the vector index on disk; the BM25 index size is listed separately.
+"""
+import io
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import statistics
+import contextlib
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from bench_suite import configure, RESULTS_DIR
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def load_questions(path: str):
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            facts = json.load(f)["facts"]
+        return [{"question": fact["question"], "expected": [{
+            "filename": fact["filename"], "page_number": fact["page_number"], "contains": fact["statement"]
+        }]} for fact in facts]
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def is_relevant(chunk: dict, expected: list) -> bool:
+    for e in expected:
+        if chunk.get("filename") != e["filename"]:
+            continue
+        if e.get("page_number") is not None and chunk.get("page_number") != e["page_number"]:
+            continue
+        if e.get("contains") and _norm(e["contains"]) not in _norm(chunk.get("chunk_text", "")):
+            continue
+        return True
+    return False
+
+def dir_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+def chunk_pages(pages: list, max_tokens: int, overlap: int) -> list:
+    from chunker import chunk_text
+    chunks = []
+    for fname, page_number, text in pages:
+        for i, chunk in enumerate(chunk_text(text, max_tokens=max_tokens, overlap=overlap)):
+            chunks.append({"filename": fname, "page_number": page_number,
+                           "chunk_id": f"{page_number}_{i}", "chunk_text": chunk})
+    return chunks
+
+def index_settings(args):
+    """(quantization, hnsw_m, hnsw_ef) combinations; HNSW knobs only exist for Qdrant."""
+    hnsw = list(itertools.product(args.hnsw_m, args.hnsw_ef)) if args.backend == "qdrant" else [(None, None)]
+    return [(q, m, ef) for q in args.quantization for m, ef in hnsw]
+
+def evaluate(store, lexical, questions, query_vectors, ks, mode):
+    from retriever import retrieve_top_k_chunks
+    rows = []
+    for k in ks:
+        latencies, hits, reciprocal_ranks = [], 0, []
+        for q, vec in zip(questions, query_vectors):
+            with contextlib.redirect_stdout(io.StringIO()):
+                t = time.perf_counter()
+                results = retrieve_top_k_chunks(vec, top_k=k, query_text=q["question"], mode=mode,
+                                                store=store, lexical=lexical)
+                latencies.append(time.perf_counter() - t)
+            rank = next((i for i, c in enumerate(results, start=1) if is_relevant(c, q["expected"])), None)
+            hits += rank is not None
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        latencies.sort()
+        rows.append({
+            "k": k,
+            "recall_at_k": hits / len(questions),
+            "mrr": statistics.mean(reciprocal_ranks),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="documents/")
+    parser.add_argument("--questions", help="JSONL questions file (or a synthetic facts.json)")
+    parser.add_argument("--synthetic", type=int, metavar="N_PDFS", help="Generate a corpus and questions instead")
+    parser.add_argument("--max-questions", type=int, default=200)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--quantization", nargs="+", default=["none", "int8", "binary"])
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--backend", default="flat", choices=["flat", "qdrant"])
+    parser.add_argument("--mode", default=config.RETRIEVAL_MODE, choices=["dense", "hybrid"])
+    parser.add_argument("--stub-embedder", action="store_true", help="Hashed stand-in embedder (no model files)")
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--out", help="Results JSON (a .csv with the same name is written too)")
+    args = parser.parse_args()
+    if not args.questions and not args.synthetic:
+        parser.error("pass --questions FILE or --synthetic N")
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="eval_retrieval_") as tmp:
+        configure(tmp, SimpleNamespace(token_delay=0.0, real_embedder=not args.stub_embedder, backend=args.backend))
+        from chunker import extract_pages
+        from embedder import encode_texts, chunk_payloads
+        from lexical_index import LexicalIndex
+        from vector_backend import make_store
+
+        docs = args.docs
+        if args.synthetic:
+            from synthetic_corpus import generate_corpus
+            docs = os.path.join(tmp, "documents")
+            corpus = generate_corpus(docs, pdfs=args.synthetic, pages=10, docx_files=max(1, args.synthetic // 2))
+            with open(os.path.join(tmp, "facts.json"), "w", encoding="utf-8") as f:
+                json.dump(corpus, f)
+            questions = load_questions(args.questions or os.path.join(tmp, "facts.json"))
+        else:
+            questions = load_questions(args.questions)
+        questions = questions[: args.max_questions]
+
+        pages = []
+        for name in sorted(os.listdir(docs)):
+            if name.lower().endswith(tuple(config.SUPPORTED_EXTENSIONS)):
+                pages.extend((name, n, text) for n, text in extract_pages(os.path.join(docs, name)))
+        print(f"📄 {len(pages)} pages, {len(questions)} questions")
+        query_vectors = encode_texts([q["question"] for q in questions])
+
+        for run, (size, overlap) in enumerate(itertools.product(args.chunk_sizes, args.overlaps)):
+            if overlap >= size:
+                continue
+            chunks = chunk_pages(pages, size, overlap)
+            vectors = encode_texts([c["chunk_text"] for c in chunks])
+            payloads = chunk_payloads(chunks, list(range(len(chunks))))
+            lexical_path = os.path.join(tmp, f"lexical_{run}.sqlite")
+            lexical = LexicalIndex(lexical_path)
+            lexical.add(list(range(len(chunks))), payloads)
+
+            for quantization, m, ef in index_settings(args):
+                path = os.path.join(tmp, f"index_{run}_{quantization}_{m}_{ef}")
+                options = {"path": path, "quantization": quantization}
+                if args.backend == "qdrant":
+                    options.update(hnsw_m=m, hnsw_ef=ef)
+                store = make_store(args.backend, **options)
+                store.create_collection()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for start in range(0, len(chunks), 1024):
+                        ids = list(range(start, min(start + 1024, len(chunks))))
+                        store.add_documents(vectors[ids], payloads[ids[0]:ids[-1] + 1], ids=ids)
+                index_mb = dir_bytes(path) / 2**20
+                for row in evaluate(store, lexical, questions, query_vectors, args.k, args.mode):
+                    rows.append(dict(
+                        chunk_size=size, overlap=overlap, quantization=quantization, hnsw_m=m, hnsw_ef=ef,
+                        chunks=len(chunks), index_mb=index_mb, bm25_mb=dir_bytes(lexical_path) / 2**20, **row
+                    ))
+                    r = rows[-1]
+                    hnsw = f" m={m} ef={ef}" if m else ""
+                    print(f"chunk {size:>4}/{overlap:<3} {quantization:>6}{hnsw} k={r['k']:<3} | "
+                          f"recall {r['recall_at_k']:.3f} MRR {r['mrr']:.3f} | "
+                          f"p50 {r['p50_ms']:6.2f} ms p95 {r['p95_ms']:6.2f} ms | "
+                          f"{len(chunks)} chunks, index {index_mb:6.2f} MB")
+                del store
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("retrieval_eval-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "rows": rows}, f, indent=2)
+    with open(os.path.splitext(out)[0] + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n💾 Results written to {out}")
+
+    passing = [r for r in rows if r["recall_at_k"] >= args.target_recall]
+    if not passing:
+        print(f"❌ No configuration reached recall@k >= {args.target_recall}.")
+        return
+    best = min(passing, key=lambda r: (r["index_mb"], r["p50_ms"], r["k"]))
+    print(f"✅ Cheapest configuration with recall@k >= {args.target_recall}: "
+          f"chunk {best['chunk_size']}/{best['overlap']}, k={best['k']}, quantization={best['quantization']}"
+          + (f", hnsw m={best['hnsw_m']} ef={best['hnsw_ef']}" if best["hnsw_m"] else "")
+          + f" (recall {best['recall_at_k']:.3f}, MRR {best['mrr']:.3f}, p50 {best['p50_ms']:.2f} ms, "
+          f"index {best['index_mb']:.2f} MB)")
+    print(f"   To ingest with it, set CHUNK_MAX_TOKENS = {best['chunk_size']} and "
+          f"CHUNK_OVERLAP_TOKENS = {best['overlap']} in config.py.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Seeded synthetic PDF/DOCX corpora for benchmarks.
+
+Every page (PDF) or section (DOCX) is filler prose built from a fixed
+vocabulary plus a few "fact" sentences with unique codes, e.g.
+"The allocated budget for project QX-0412 is 7310 units." Each fact comes
+back with a matching question and its file/page, so the same corpus serves
+as ground truth for retrieval-quality runs.
+
+    python benchmarks/synthetic_corpus.py OUT_DIR [--pdfs 10] [--pages 20] [--docx 5]
+"""
+import os
+import json
+import random
+import argparse
+from typing import Dict, List
+
+WORDS = (
+    "agency budget review process framework delivery contract schedule risk audit report "
+    "system network service policy standard quality capacity supply demand region program "
+    "resource training vendor support operation compliance safety project planning data "
+    "analysis finance procurement strategy performance maintenance facility equipment record"
+).split()
+SECTION_HEADERS = ["Scope of Work:", "Requirements:", "Background:", "Deliverables:", "Timeline:"]
+FACT_TEMPLATES = [
+    ("The allocated budget for project {code} is {number} units.",
+     "What is the allocated budget for project {code}?"),
+    ("Project {code} is managed by the {word} office in region {number}.",
+     "Which office manages project {code}?"),
+    ("The audit of contract {code} found {number} open issues.",
+     "How many open issues did the audit of contract {code} find?"),
+]
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+def _section(rng: random.Random, n_sentences: int, facts: List[str]) -> str:
+    sentences = [_sentence(rng) for _ in range(n_sentences)]
+    for fact in facts:
+        sentences.insert(rng.randrange(len(sentences) + 1), fact)
+    return rng.choice(SECTION_HEADERS) + "\n" + " ".join(sentences)
+
+def _make_facts(rng: random.Random, n: int, used_codes: set) -> List[Dict]:
+    facts = []
+    for _ in range(n):
+        code = f"{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}-{rng.randint(0, 9999):04d}"
+        while code in used_codes:
+            code = code[:-1] + str(rng.randint(0, 9))
+        used_codes.add(code)
+        statement, question = rng.choice(FACT_TEMPLATES)
+        values = {"code": code, "number": rng.randint(10, 9999), "word": rng.choice(WORDS)}
+        facts.append({"statement": statement.format(**values), "question": question.format(**values), "code": code})
+    return facts
+
+def page_texts(rng: random.Random, n_pages: int, facts_per_page: int, used_codes: set):
+    """[(page_text, [fact, ...]), ...] for one document."""
+    pages = []
+    for _ in range(n_pages):
+        facts = _make_facts(rng, facts_per_page, used_codes)
+        sections = [_section(rng, rng.randint(6, 12), [f["statement"] for f in facts[i::2]]) for i in range(2)]
+        pages.append(("\n".join(sections), facts))
+    return pages
+
+def write_pdf(path: str, pages: List[str]):
+    import fitz
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, page.rect.width - 40, page.rect.height - 40), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+def write_docx(path: str, sections: List[str]):
+    import docx
+    doc = docx.Document()
+    for text in sections:
+        for line in text.split("\n"):
+            doc.add_paragraph(line)
+    doc.save(path)
+
+def generate_corpus(out_dir: str, pdfs: int = 10, pages: int = 20, docx_files: int = 5,
+                    docx_sections: int = 10, facts_per_page: int = 2, seed: int = 0) -> Dict:
+    """
+    Write the corpus into `out_dir` and return a description:
+    {"files": [...], "pages": int, "facts": [{"question", "statement", "code", "filename", "page_number"}]}.
+    DOCX facts have page_number 0, matching the chunker.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    used_codes = set()
+    files, facts, total_pages = [], [], 0
+    for i in range(pdfs):
+        fname = f"synthetic_{i:03d}.pdf"
+        doc_pages = page_texts(rng, pages, facts_per_page, used_codes)
+        write_pdf(os.path.join(out_dir, fname), [text for text, _ in doc_pages])
+        for page_number, (_, page_facts) in enumerate(doc_pages, start=1):
+            facts.extend(dict(f, filename=fname, page_number=page_number) for f in page_facts)
+        files.append(fname)
+        total_pages += pages
+    for i in range(docx_files):
+        fname = f"synthetic_{i:03d}.docx"
+        doc_sections = page_texts(rng, docx_sections, facts_per_page, used_codes)
+        write_docx(os.path.join(out_dir, fname), [text for text, _ in doc_sections])
+        for _, section_facts in doc_sections:
+            facts.extend(dict(f, filename=fname, page_number=0) for f in section_facts)
+        files.append(fname)
+    return {"files": files, "pages": total_pages, "facts": facts}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir")
+    parser.add_argument("--pdfs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--docx", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    info = generate_corpus(args.out_dir, args.pdfs, args.pages, args.docx, seed=args.seed)
+    with open(os.path.join(args.out_dir, "facts.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    print(f"📄 {len(info['files'])} files, {info['pages']} PDF pages, {len(info['facts'])} facts -> {args.out_dir}")
@@ -1,9 +1,13 @@
 import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import INGEST_WORKERS, PDF_PAGES_PER_TASK, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
 
 SECTION_HEADER_PAT = re.compile(r"^[A-Z][A-Za-z0-9 ,\-\(\)/]+: ?$")  # e.g. "Scope of Work:", "Requirements:", etc.
 
-def chunk_text(text: str, max_tokens: int = 400, overlap: int = 50):
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS):
     """
     Improved chunker: keeps section headings with their content if present,
     otherwise performs sentence-based overlap chunking.
@@ -48,46 +52,200 @@ def chunk_text(text: str, max_tokens: int = 400, overlap: int = 50):
             chunks.append(final_chunk)
     return chunks
 
-def process_pdf(file_path):
-    import fitz
-    doc = fitz.open(file_path)
-    all_chunks = []
-    fname = os.path.basename(file_path)
-    for page_num in range(len(doc)):
-        text = doc[page_num].get_text()
-        for i, chunk in enumerate(chunk_text(text)):
-            if chunk.strip() and len(chunk.split()) >= 10:
-                all_chunks.append({
-                    "filename": fname,
-                    "page_number": page_num + 1,
-                    "chunk_id": f"{page_num+1}_{i}",
-                    "chunk_text": chunk
-                })
-    return all_chunks
+def _timed(timings, stage, fn, *args):
+    """Call fn(*args), adding its duration to timings[stage] when timings is a dict."""
+    if timings is None:
+        return fn(*args)
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
 
-def process_docx(file_path):
+def extract_pages(file_path, page_range=None, timings=None):
+    """
+    Raw text per page as [(page_number, text), ...]. PDF pages are 1-based
+    (`page_range` is a 0-based (start, stop) slice); a DOCX is one "page" 0.
+    Extraction time is added to timings["parse"] if given.
+    """
+    if file_path.lower().endswith(".pdf"):
+        import fitz
+        # Closed right away: pool workers parse many files in one process.
+        with _timed(timings, "parse", fitz.open, file_path) as doc:
+            start, stop = page_range or (0, len(doc))
+            return [
+                (page_num + 1, _timed(timings, "parse", doc[page_num].get_text))
+                for page_num in range(start, min(stop, len(doc)))
+            ]
     import docx
-    fname = os.path.basename(file_path)
-    doc = docx.Document(file_path)
+    doc = _timed(timings, "parse", docx.Document, file_path)
     paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-    text = "\n".join(paragraphs)
-    results = []
-    for i, chunk in enumerate(chunk_text(text)):
-        if chunk.strip() and len(chunk.split()) >= 10:
-            results.append({
-                "filename": fname,
-                "page_number": 0,
-                "chunk_id": f"docx_0_{i}",
-                "chunk_text": chunk
-            })
-    return results
-
-def process_documents(paths):
+    return [(0, "\n".join(paragraphs))]
+
+def page_chunks(fname, page_number, text, id_prefix="", timings=None):
+    """Chunk records for one page of text; chunk ids are "<prefix><page>_<i>"."""
+    return [
+        {
+            "filename": fname,
+            "page_number": page_number,
+            "chunk_id": f"{id_prefix}{page_number}_{i}",
+            "chunk_text": chunk
+        }
+        for i, chunk in enumerate(_timed(timings, "chunk", chunk_text, text))
+        if chunk.strip() and len(chunk.split()) >= 10
+    ]
+
+def process_pdf(file_path, page_range=None, timings=None, pages=None):
+    """
+    Chunk a PDF page by page. `page_range` is a (start, stop) pair of
+    0-based page indexes so large PDFs can be split across workers;
+    chunk ids depend only on the page, so the split does not change them.
+    Text extraction and chunking time are added to `timings` ("parse"/"chunk") if given.
+    The extracted (page_number, text) pairs are appended to `pages` if given.
+    """
     all_chunks = []
+    fname = os.path.basename(file_path)
+    for page_number, text in extract_pages(file_path, page_range, timings):
+        if pages is not None:
+            pages.append((page_number, text))
+        all_chunks.extend(page_chunks(fname, page_number, text, timings=timings))
+    return all_chunks
+
+def process_docx(file_path, timings=None, pages=None):
+    [(_, text)] = extract_pages(file_path, timings=timings)
+    if pages is not None:
+        pages.append((0, text))
+    return page_chunks(os.path.basename(file_path), 0, text, id_prefix="docx_", timings=timings)
+
+def _plan_tasks(paths, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    One task per DOCX and per `pages_per_task` pages of each PDF, in input order.
+    Each task is (path, page_range or None).
+    """
+    tasks = []
     for path in paths:
         lower = path.lower()
         if lower.endswith(".pdf"):
-            all_chunks.extend(process_pdf(path))
+            try:
+                import fitz
+                with fitz.open(path) as doc:
+                    n_pages = len(doc)
+            except Exception:
+                n_pages = 0  # let the parse task report the error
+            if n_pages > pages_per_task:
+                tasks.extend((path, (p, p + pages_per_task)) for p in range(0, n_pages, pages_per_task))
+            else:
+                tasks.append((path, None))
         elif lower.endswith(".docx"):
-            all_chunks.extend(process_docx(path))
+            tasks.append((path, None))
+    return tasks
+
+def _parse_task(task):
+    """
+    Runs in a worker process: returns
+    (path, pages, chunks, {"parse", "chunk"} seconds, error message).
+    """
+    path, page_range = task
+    timings = {"parse": 0.0, "chunk": 0.0}
+    pages = []
+    try:
+        if path.lower().endswith(".pdf"):
+            chunks = process_pdf(path, page_range, timings, pages)
+        else:
+            chunks = process_docx(path, timings, pages)
+        return path, pages, chunks, timings, None
+    except Exception as e:
+        return path, pages, [], timings, str(e)
+
+def _run_tasks(tasks, workers):
+    """Yield task results in task order, keeping at most 2*workers tasks in flight."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _parse_task(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in task_iter:
+            pending.append(pool.submit(_parse_task, task))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for task in task_iter:
+                pending.append(pool.submit(_parse_task, task))
+                break
+
+def _parse_files(paths, workers):
+    """Parse `paths` (none of them cached); yields (path, pages, chunks, timings, error) per file in order."""
+    tasks = _plan_tasks(paths)
+    remaining = {}
+    for path, _ in tasks:
+        remaining[path] = remaining.get(path, 0) + 1
+
+    current, pages, chunks, timings, error = None, [], [], {}, None
+    for path, task_pages, task_chunks, task_timings, task_error in _run_tasks(tasks, workers):
+        if path != current:
+            current, pages, chunks, timings, error = path, [], [], {"parse": 0.0, "chunk": 0.0}, None
+        pages.extend(task_pages)
+        chunks.extend(task_chunks)
+        for stage, seconds in task_timings.items():
+            timings[stage] += seconds
+        error = error or task_error
+        remaining[path] -= 1
+        if remaining[path] == 0:
+            yield path, pages, ([] if error else chunks), timings, error
+
+def iter_parsed_files(paths, workers=INGEST_WORKERS):
+    """
+    Parse and chunk files across a process pool (large PDFs are split by
+    page range). Yields (path, chunks, timings, error) once per file, in
+    input order, so output is deterministic whatever the worker count.
+    `timings` holds "parse" and "chunk" seconds summed over the file's tasks.
+
+    Files whose size and mtime match an entry in the parsed-document store
+    are served from it without parsing (zero timings); everything parsed
+    here is written back, so ingestion and the app's chunk preview share
+    a single parse per file version. Files that failed last time are re-parsed.
+    """
+    from parsed_store import parsed_store
+    workers = workers or os.cpu_count() or 1
+    paths = [p for p in paths if p.lower().endswith((".pdf", ".docx"))]
+    summaries = parsed_store.summaries(paths)
+    # Failed parses are retried: the cause (e.g. a missing parser package) may be fixed by now.
+    fresh = {p for p in paths if summaries[p] and not summaries[p]["error"]}
+    stats = {p: os.stat(p) for p in paths if p not in fresh}  # taken before parsing starts
+    parsed = _parse_files([p for p in paths if p not in fresh], workers)
+
+    for done, path in enumerate(paths, start=1):
+        # Cached chunks are read one file at a time, as they are yielded, so memory stays bounded.
+        chunks = parsed_store.get_chunks(path) if path in fresh else None
+        if chunks is not None:
+            timings, error = {"parse": 0.0, "chunk": 0.0}, None
+            status = f"{len(chunks)} chunks (cached)"
+        else:
+            if path in fresh:  # modified since the freshness check: parse it here
+                stats[path] = os.stat(path)
+                _, pages, chunks, timings, error = next(_parse_files([path], 1))
+            else:
+                _, pages, chunks, timings, error = next(parsed)
+            parsed_store.put(path, stats[path], pages, chunks, error)
+            status = f"❌ {error}" if error else f"{len(chunks)} chunks in {sum(timings.values()):.2f} sec"
+        print(f"📄 [{done}/{len(paths)}] {os.path.basename(path)}: {status}")
+        yield path, chunks, timings, error
+
+def iter_document_chunks(paths, workers=INGEST_WORKERS):
+    """Stream of chunks for `paths` in deterministic order (files that fail to parse are skipped)."""
+    for _, chunks, _, _ in iter_parsed_files(paths, workers):
+        yield from chunks
+
+def process_documents(paths, workers=1):
+    """
+    Chunk all `paths`. Runs in-process by default; pass workers=None to use
+    INGEST_WORKERS (all cores by default).
+    """
+    t0 = time.perf_counter()
+    all_chunks = list(iter_document_chunks(paths, workers or INGEST_WORKERS))
+    if len(paths) > 1:
+        print(f"🧩 {len(all_chunks)} chunks from {len(paths)} files in {time.perf_counter() - t0:.2f} sec")
     return all_chunks
@@ -0,0 +1,71 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+
+from config import SERVER_URL, LLM_REQUEST_TIMEOUT
+
+# Thin client for server.py, mirroring the in-process functions app.py uses
+# (answer_question_stream, ingest_folder, delete_documents), so a front-end
+# can switch to a shared server by importing from here instead.
+
+UNREACHABLE_ANSWER = "The answer service is not reachable. Is server.py running?"
+TIMEOUT = LLM_REQUEST_TIMEOUT + 30  # the server's own queue/generation timeout, plus slack
+
+def _request(path: str, payload: Optional[Dict] = None, base_url: str = SERVER_URL):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(
+        base_url.rstrip("/") + path, data=data,
+        headers={"Content-Type": "application/json"} if data is not None else {}
+    )
+    return urllib.request.urlopen(request, timeout=TIMEOUT)
+
+def _post(path: str, payload: Dict, base_url: str = SERVER_URL) -> Dict:
+    with _request(path, payload, base_url) as response:
+        return json.loads(response.read())
+
+def health(base_url: str = SERVER_URL) -> Dict:
+    with _request("/health", base_url=base_url) as response:
+        return json.loads(response.read())
+
+def retrieve(question: str, top_k: Optional[int] = None, file_filters: Optional[List[str]] = None,
+             page_range=None, base_url: str = SERVER_URL) -> Dict:
+    return _post("/retrieve", {"question": question, "top_k": top_k, "file_filters": file_filters,
+                               "page_range": page_range}, base_url)
+
+def answer_question(question: str, file_filters: Optional[List[str]] = None, page_range=None,
+                    base_url: str = SERVER_URL) -> Dict:
+    try:
+        return _post("/answer", {"question": question, "file_filters": file_filters,
+                                 "page_range": page_range}, base_url)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"❌ Answer service request failed: {e}")
+        return {"answer": UNREACHABLE_ANSWER, "source": None}
+
+def answer_question_stream(question: str, file_filters: Optional[List[str]] = None, page_range=None,
+                           base_url: str = SERVER_URL) -> Iterator[Dict]:
+    """Same events as answer_question.answer_question_stream, read from the server's NDJSON stream."""
+    try:
+        with _request("/answer", {"question": question, "file_filters": file_filters,
+                                  "page_range": page_range, "stream": True}, base_url) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"❌ Answer service request failed: {e}")
+        yield {"result": {"answer": UNREACHABLE_ANSWER, "source": None}}
+
+# The server only ingests from and deletes in its own DOCS_DIR; folder_path is
+# kept for signature parity with ingestion and is not sent.
+def ingest_folder(folder_path: str, base_url: str = SERVER_URL) -> Dict:
+    return _post("/ingest", {}, base_url)
+
+def delete_documents(folder_path: str, filenames: List[str], base_url: str = SERVER_URL) -> Dict:
+    return _post("/delete", {"filenames": list(filenames)}, base_url)
+
+def cache_stats(base_url: str = SERVER_URL) -> Dict:
+    with _request("/cache", base_url=base_url) as response:
+        return json.loads(response.read())
+
+def clear_answer_cache(base_url: str = SERVER_URL) -> Dict:
+    return _post("/cache/clear", {}, base_url)
@@ -2,25 +2,77 @@
 CHUNK_MAX_TOKENS = 250              # Maximum tokens per chunk
 CHUNK_OVERLAP_TOKENS = 50           # Overlap tokens between chunks
 CHUNK_ENCODING = 'utf-8'            # Fallback encoding
+INGEST_WORKERS = None               # Parser processes for bulk ingestion (None = all cores)
+PDF_PAGES_PER_TASK = 50             # Large PDFs are split into page ranges of this size
 
 # === Embedding Model Config ===
 EMBEDDING_MODEL_NAME = "intfloat/e5-small-v2"  # HuggingFace model or local path
+EMBEDDING_MODE = "sentence-transformers"       # or "stub": deterministic hashed vectors, no model files (benchmarks)
 EMBEDDING_DIMENSION = 384                     # Must match the embedding model
+EMBED_BATCH_SIZE = 64                         # Chunks per encode() call during ingestion
+EMBEDDING_CACHE_ENABLED = True                # Reuse embeddings of text seen before (per model)
+EMBEDDING_CACHE_PATH = "./embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000         # ~300 MB of float32 vectors at 384 dims
 
 # === Vector Store (Qdrant, replaces FAISS) ===
+VECTOR_BACKEND = "qdrant"                      # "qdrant" (embedded Qdrant) or "flat" (memory-mapped NumPy)
 QDRANT_COLLECTION = "docs"
 QDRANT_PATH = "./qdrant_data"
+UPSERT_BATCH_SIZE = 256                        # Points per upsert request to the vector store
+QDRANT_HNSW_M = None                           # HNSW graph degree for new collections (None = Qdrant default, 16)
+QDRANT_HNSW_EF_CONSTRUCT = None                # HNSW build-time beam width (None = Qdrant default, 100)
+QDRANT_HNSW_EF = None                          # HNSW search-time beam width (None = Qdrant default)
+FLAT_INDEX_PATH = "./flat_index"               # Used when VECTOR_BACKEND = "flat"
+FLAT_INDEX_DTYPE = "float32"                   # or "float16" to halve the vector file
+VECTOR_QUANTIZATION = "none"                   # "none", "int8" or "binary": compact first-pass vectors
+QUANTIZATION_RESCORE_CANDIDATES = 200          # Shortlist rescored with the original vectors
+COMPACT_DELETED_RATIO = 0.2                    # Compact the index once this fraction of its rows is deleted
 TOP_K = 3                                      # Number of chunks to retrieve
+ANSWER_TOP_K = 6                               # Chunks retrieved per question before context packing
+RETRIEVAL_MODE = "hybrid"                      # "dense" (vectors only) or "hybrid" (vectors + BM25, fused)
+HYBRID_CANDIDATES = 30                         # Candidates taken from each ranking before fusion
+RRF_K = 60                                     # Reciprocal rank fusion damping constant
+LEXICAL_INDEX_PATH = "lexical_index.sqlite"    # On-disk BM25 inverted index (SQLite FTS5)
+LEXICAL_MMAP_BYTES = 256 * 1024 * 1024         # Memory-map up to this much of the lexical index
+
+# === Reranking (cross-encoder between retrieval and generation) ===
+RERANK_ENABLED = True
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 20                         # Retrieved candidates scored by the cross-encoder
+RERANK_TOP_N = 4                               # Best reranked chunks handed to context packing
+RERANK_BUDGET_MS = 800                         # Past this, fall back to retrieval order
+RERANK_CACHE_SIZE = 5000                       # Cached (query, chunk) scores
+INGEST_MANIFEST_PATH = "ingest_manifest.json"  # Per-file content hashes + point-id ranges
+INGEST_BATCH_SIZE = 256                        # Chunks per embed/upsert batch in the ingestion pipeline
+INGEST_QUEUE_BATCHES = 4                       # Batches buffered between pipeline stages (bounds memory)
+PARSED_STORE_PATH = "parsed_documents.sqlite"  # Page texts + chunks per file version, shared by ingestion and the UI
+METADATA_STORE_PATH = "chunk_metadata.sqlite"  # Chunk records (incl. text) by point id; payloads hold no text
 
 # (Optional/backup:)  # === FAISS (Unused with Qdrant, keep for reference)
 # FAISS_INDEX_PATH = "vector_store/faiss_index.bin"
 # VECTOR_METADATA_PATH = "vector_store/vector_metadata.json"
 
 # === LLM Config ===
-LLM_MODE = "llama.cpp"                         # Use llama.cpp for local GGUF models
+LLM_MODE = "llama.cpp"                         # Use llama.cpp for local GGUF models; "stub" = deterministic stand-in
+STUB_TOKEN_DELAY = 0.0                         # Seconds per generated token in stub mode
 LLM_MODEL_PATH = "models/llama/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
 LLM_MAX_INPUT_TOKENS = 1024
 DEVICE = "cpu"                                 # or "gpu" if using CUDA-enabled llama.cpp build
+LLM_PREFIX_CACHE_ENABLED = True                # Reuse KV state of the fixed PROMPT_TEMPLATE preamble
+LLM_PREFIX_CACHE_PATH = "models/llama/prompt_prefix.state"  # Persist that state across restarts ("" = memory only)
+LLM_WORKERS = 1                                # Model instances (each with its own KV cache) serving requests
+LLM_THREADS = None                             # Total llama.cpp threads split across workers (None = all cores)
+LLM_QUEUE_SIZE = 16                            # Waiting requests beyond this are rejected (backpressure)
+LLM_REQUEST_TIMEOUT = 120                      # Seconds per request, queue wait included
+WARMUP_ON_START = True                         # Load store/models in a background thread at startup
+BATCH_QUERY_SIZE = 32                          # Questions embedded/searched together in `main.py batch`
+
+# === Local HTTP service (server.py) ===
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_URL = ""                                # e.g. "http://127.0.0.1:8765": app.py then sends questions there
+QUERY_BATCH_MAX = 32                           # Concurrent query embeddings coalesced into one encode call
+QUERY_BATCH_WAIT_MS = 5                        # How long the first query waits for others to join its batch
 
 PROMPT_TEMPLATE = (
     "Instruction: Using only the content below, answer the user's question specifically and concisely. "
@@ -40,13 +92,24 @@ UI_THEME = "dark"                               # Options: "dark" or "light"
 # === Performance Settings ===
 RESPONSE_TIME_WARNING_THRESHOLD = 15            # Warn if response takes too long (in seconds)
 
+# === Answer Cache ===
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_PATH = "answer_cache.jsonl"
+ANSWER_CACHE_MAX_ENTRIES = 500                  # LRU-evicted beyond this
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600        # Entries expire after a week
+ANSWER_CACHE_SIMILARITY = 0.95                  # Cosine threshold for near-duplicate questions
+
 # === Logging & Debug ===
-LOG_LATENCY = True
-LOG_DIR = "logs/"
-SAVE_RESPONSES = True
+LOG_LATENCY = True                              # Print a per-stage timing line for every answer/ingest
+LOG_DIR = "logs/"                               # traces.jsonl and metrics.prom are written here
+SAVE_RESPONSES = True                           # Include question and answer text in traces
+TRACE_ENABLED = True                            # Write stage timings to LOG_DIR and keep rolling percentiles
+TRACE_WINDOW = 1000                             # Recent traces per stage used for p50/p95/p99
+METRICS_WRITE_INTERVAL = 15                     # Seconds between background rewrites of metrics.prom
 
 # === File Support ===
 SUPPORTED_EXTENSIONS = [".pdf", ".docx"]
+DOCS_DIR = "documents"                          # Uploaded documents; the only folder server.py ingests or deletes from
 
 
 # === Chunker Functions ===
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+import config
+
+# test_llama.py is a manual smoke script that loads a real GGUF model at import.
+collect_ignore = ["test_llama.py"]
+
+# Several modules open their store at import (metadata_store, lexical_index,
+# answer_cache), so point every path at a scratch directory and select the
+# stub models before any test imports them.
+_TMP = tempfile.mkdtemp(prefix="rag-tests-")
+config.LLM_MODE = "stub"
+config.EMBEDDING_MODE = "stub"
+config.STUB_TOKEN_DELAY = 0.0
+config.VECTOR_BACKEND = "flat"
+config.QDRANT_PATH = os.path.join(_TMP, "qdrant")
+config.FLAT_INDEX_PATH = os.path.join(_TMP, "flat_index")
+config.LEXICAL_INDEX_PATH = os.path.join(_TMP, "lexical.sqlite")
+config.INGEST_MANIFEST_PATH = os.path.join(_TMP, "manifest.json")
+config.PARSED_STORE_PATH = os.path.join(_TMP, "parsed_documents.sqlite")
+config.METADATA_STORE_PATH = os.path.join(_TMP, "chunk_metadata.sqlite")
+config.ANSWER_CACHE_PATH = os.path.join(_TMP, "answer_cache.jsonl")
+config.EMBEDDING_CACHE_ENABLED = False
+config.LLM_PREFIX_CACHE_PATH = ""
+config.LOG_DIR = os.path.join(_TMP, "logs")
+config.LOG_LATENCY = False
+config.SAVE_RESPONSES = False
@@ -0,0 +1,88 @@
+import re
+from typing import Callable, Dict, List, Tuple
+
+CITATION_FORMAT = "[{ref}] (File: {filename}, Page: {page_number})\n{chunk_text}\n"
+SHINGLE_SIZE = 5
+
+def _shingles(text: str, n: int = SHINGLE_SIZE) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def _overlaps(shingles: set, packed: List[set], threshold: float) -> bool:
+    """True if `shingles` is mostly contained in an already-packed chunk (or vice versa)."""
+    for other in packed:
+        smaller = min(len(shingles), len(other)) or 1
+        if len(shingles & other) / smaller >= threshold:
+            return True
+    return False
+
+def pack_chunks(
+    chunks: List[Dict],
+    count_tokens: Callable[[str], int],
+    budget: int,
+    overlap_threshold: float = 0.5,
+    truncate: Callable[[str, int], str] = None
+) -> Tuple[str, List[Dict]]:
+    """
+    Fill `budget` tokens with the highest-scoring chunks first.
+
+    Chunks mostly duplicated by an already-packed chunk (sliding-window
+    overlap, repeated boilerplate) are dropped. Each packed chunk is prefixed
+    with a numbered citation. If not even the best chunk fits and `truncate`
+    is given, that chunk is cut down to the budget instead of leaving the
+    context empty.
+
+    Returns (packed_text, citations) where citations line up with the [n] markers.
+    """
+    ranked = sorted(chunks, key=lambda c: c.get("score", 0.0), reverse=True)
+    parts, citations, packed_shingles = [], [], []
+    remaining = budget
+    for chunk in ranked:
+        text = chunk.get("chunk_text", "").strip()
+        if not text:
+            continue
+        shingles = _shingles(text)
+        if _overlaps(shingles, packed_shingles, overlap_threshold):
+            continue
+        ref = len(citations) + 1
+        block = CITATION_FORMAT.format(
+            ref=ref,
+            filename=chunk.get("filename", ""),
+            page_number=chunk.get("page_number", ""),
+            chunk_text=text
+        )
+        cost = count_tokens(block)
+        if cost > remaining:
+            if citations or truncate is None:
+                continue  # a smaller, lower-ranked chunk may still fit
+            header_cost = count_tokens(CITATION_FORMAT.format(
+                ref=ref, filename=chunk.get("filename", ""),
+                page_number=chunk.get("page_number", ""), chunk_text=""
+            ))
+            # Tokens can merge or split where the text meets the header, so
+            # re-count and shrink until the block really fits.
+            allowance = remaining - header_cost
+            while allowance > 0:
+                block = CITATION_FORMAT.format(
+                    ref=ref, filename=chunk.get("filename", ""),
+                    page_number=chunk.get("page_number", ""), chunk_text=truncate(text, allowance)
+                )
+                cost = count_tokens(block)
+                if cost <= remaining:
+                    break
+                allowance -= cost - remaining
+            if allowance <= 0:
+                continue  # not even the citation header fits
+        parts.append(block)
+        packed_shingles.append(shingles)
+        citations.append({
+            "ref": ref,
+            "filename": chunk.get("filename", ""),
+            "page_number": chunk.get("page_number", ""),
+            "chunk_id": chunk.get("chunk_id", ""),
+            "score": chunk.get("score")
+        })
+        remaining -= cost
+    return "".join(parts), citations
@@ -3,7 +3,8 @@
 import os
 from chunker import process_documents
 
-def load_documents_from_folder(folder_path):
+def load_documents_from_folder(folder_path, workers=None):
+    """Chunk every PDF/DOCX in the folder, parsing files in parallel (workers=None uses INGEST_WORKERS)."""
     document_paths = []
     for filename in os.listdir(folder_path):
         if filename.lower().endswith((".pdf", ".docx")):
@@ -14,5 +15,5 @@ def load_documents_from_folder(folder_path):
         print("⚠️ No valid PDF or DOCX files found in folder:", folder_path)
         return []
 
-    chunks = process_documents(document_paths)
+    chunks = process_documents(sorted(document_paths), workers=workers)
     return chunks
@@ -1,45 +1,180 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-embedder = SentenceTransformer('intfloat/e5-small-v2', device='cuda')
-# or, after instantiation:
-# embedder = embedder.to('cuda')
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Optional
 
-from qdrant_helper import create_collection, add_documents, search
-from config import EMBEDDING_MODEL_NAME
+import numpy as np
+
+from vector_backend import add_documents, allocate_ids
+from embedding_cache import embedding_cache
+from metadata_store import metadata_store
+from config import EMBEDDING_MODEL_NAME, EMBEDDING_MODE, EMBEDDING_DIMENSION, EMBED_BATCH_SIZE, DEVICE
 
 import uuid
-import json
-import os
-
-# Load embedding model once
-print("🔤 Loading embedding model...")
-embedder = SentenceTransformer(EMBEDDING_MODEL_NAME)
-
-# Paths for storing offline backup metadata (optional, for data transparency)
-METADATA_FILE = "vector_metadata.json"
-
-def embed_and_store_chunks(chunks: List[Dict]):
-    vectors = []
-    metadata = []
-
-    for chunk in chunks:
-        embedding = embedder.encode(chunk['chunk_text']).tolist()
-        vectors.append(embedding)
-        metadata.append({
-            "id": str(uuid.uuid4()),
-            "filename": chunk["filename"],
-            "page_number": chunk["page_number"],
-            "chunk_id": chunk["chunk_id"],
-            "chunk_text": chunk["chunk_text"]
-        })
-
-    print(f"📤 Adding {len(vectors)} vectors to Qdrant collection...")
-    add_documents(vectors, metadata)
-
-    # Save (optional) metadata alongside index
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print("✅ Qdrant and metadata saved offline.")
+
+# SentenceTransformer expects a torch device string; config uses "cpu"/"gpu".
+EMBED_DEVICE = "cuda" if DEVICE.lower() == "gpu" else "cpu"
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """
+    The process-wide embedding model, loaded on first use (importing this
+    module does not import torch or sentence-transformers).
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None and EMBEDDING_MODE == "stub":
+                from stub_models import StubEmbedder
+                _embedder = StubEmbedder(EMBEDDING_DIMENSION)
+            elif _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                t0 = time.perf_counter()
+                print(f"🔤 Loading embedding model ({EMBED_DEVICE.upper()})...")
+                _embedder = SentenceTransformer(EMBEDDING_MODEL_NAME, device=EMBED_DEVICE)
+                print(f"🔤 Embedding model ready in {time.perf_counter() - t0:.2f} sec")
+    return _embedder
+
+def encode_texts(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Batch-encode texts into a (len(texts), dim) float32 matrix.
+    Texts already in the embedding cache are not re-encoded; the rest are
+    encoded (and cached) by _encode_uncached.
+    """
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+    if embedding_cache is None:
+        return _encode_uncached(texts, batch_size)
+    cached = embedding_cache.get_many(texts)
+    missing = [i for i, v in enumerate(cached) if v is None]
+    vectors = np.empty((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+    for i, v in enumerate(cached):
+        if v is not None:
+            vectors[i] = v
+    if missing:
+        fresh = _encode_uncached([texts[i] for i in missing], batch_size)
+        vectors[missing] = fresh
+        embedding_cache.put_many([texts[i] for i in missing], fresh)
+    return vectors
+
+def _encode_uncached(texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Texts are encoded shortest-first so each batch pads to a similar length,
+    then rows are put back in input order.
+    """
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    sorted_vectors = get_embedder().encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    vectors = np.empty_like(sorted_vectors, dtype=np.float32)
+    vectors[order] = sorted_vectors
+    return vectors
+
+# What vector points carry: enough for filtered search and citations. The
+# chunk text lives in the metadata store and is fetched for hits only.
+POINT_PAYLOAD_FIELDS = ("id", "filename", "page_number", "chunk_id")
+
+def chunk_payloads(chunks: List[Dict], ids: Optional[List[int]] = None) -> List[Dict]:
+    """Full chunk records (metadata store / BM25 rows) for `chunks`."""
+    return [{
+        "id": ids[i] if ids is not None else str(uuid.uuid4()),
+        "filename": chunk["filename"],
+        "page_number": chunk["page_number"],
+        "chunk_id": chunk["chunk_id"],
+        "chunk_text": chunk["chunk_text"]
+    } for i, chunk in enumerate(chunks)]
+
+def point_payloads(records: List[Dict]) -> List[Dict]:
+    """chunk_payloads() records trimmed to POINT_PAYLOAD_FIELDS."""
+    return [{field: r[field] for field in POINT_PAYLOAD_FIELDS} for r in records]
+
+def embed_and_store_chunks(chunks: List[Dict], ids: Optional[List[int]] = None,
+                           batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Embed chunks in batches and upsert them. When `ids` is given, point i is
+    written with ids[i] (overwriting any existing point with that id);
+    otherwise ids come from the store's allocator.
+    """
+    if not chunks:
+        print("⚠️ No chunks to embed.")
+        return
+
+    t0 = time.perf_counter()
+    vectors = encode_texts([chunk["chunk_text"] for chunk in chunks], batch_size=batch_size)
+    elapsed = time.perf_counter() - t0
+    print(f"🔤 Embedded {len(chunks)} chunks in {elapsed:.2f} sec "
+          f"({len(chunks) / max(elapsed, 1e-9):.1f} chunks/sec, batch size {batch_size})")
+
+    if ids is None:
+        ids = list(allocate_ids(len(chunks)))
+    records = chunk_payloads(chunks, ids)
+
+    print(f"📤 Adding {len(vectors)} vectors to the vector store...")
+    add_documents(vectors, point_payloads(records), ids=ids)
+    metadata_store.put(records)
+    print("✅ Vectors and metadata saved offline.")
+
+class QueryBatcher:
+    """
+    Coalesces concurrent embed_query calls into single encode_texts calls.
+    The first waiting query holds its batch open for at most `max_wait_ms`
+    (or until `max_batch` queries have joined), so a lone query pays only
+    that wait while a burst of queries pays for one forward pass.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = {"batches": 0, "queries": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        threading.Thread(target=self._run, name="query-batcher", daemon=True).start()
+
+    def embed(self, text: str) -> List[float]:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                vectors = encode_texts([text for text, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["queries"] += len(items)
+            for (_, future), vector in zip(items, vectors):
+                future.set_result(vector.tolist())
+
+_query_batcher: Optional[QueryBatcher] = None
+
+def enable_query_batching(max_batch: int, max_wait_ms: float) -> QueryBatcher:
+    """Route every later embed_query call through a shared QueryBatcher (used by server.py)."""
+    global _query_batcher
+    if _query_batcher is None:
+        _query_batcher = QueryBatcher(max_batch, max_wait_ms)
+    return _query_batcher
 
 def embed_query(query: str) -> List[float]:
-    return embedder.encode(query).tolist()
+    if _query_batcher is not None:
+        return _query_batcher.embed(query)
+    if embedding_cache is None:
+        return get_embedder().encode(query).tolist()
+    return encode_texts([query])[0].tolist()
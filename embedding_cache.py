@@ -0,0 +1,193 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_MODE, EMBEDDING_DIMENSION,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+)
+
+# On-disk layout (row-aligned, append-only):
+#   keys.bin     16-byte blake2b digest of the normalized text per row
+#   vectors.bin  (count, dim) float32 embeddings, read through np.memmap
+#   meta.json    model name, dim, committed row count
+# Rows are appended before meta.json is replaced, so an interrupted write only
+# leaves ignored bytes past the committed count. A different model name (or
+# dimension) in meta.json wipes the cache.
+KEY_BYTES = 16
+_KEY_DTYPE = np.dtype(f"V{KEY_BYTES}")
+COMPACT_TO = 0.8  # fraction of max_entries kept when the cache overflows
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+class EmbeddingCache:
+    """
+    Persistent text -> embedding cache for one model. Lookups go through an
+    in-memory dict of digests built from keys.bin at open; vectors stay
+    memory-mapped. Recency is tracked per row in memory; when the cache
+    exceeds `max_entries` it is rewritten with the most recently used rows,
+    oldest first, so file order doubles as recency order on the next open.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH,
+                 model_name: str = "stub" if EMBEDDING_MODE == "stub" else EMBEDDING_MODEL_NAME,
+                 dimension: int = EMBEDDING_DIMENSION, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._meta = None
+        self._tick = 0  # recency clock; only ever moves forward
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _save_meta(self):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _open(self):
+        if self._meta is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta = None
+        if os.path.exists(self._file("meta.json")):
+            try:
+                with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+        if not meta or meta.get("model") != self.model_name or meta.get("dim") != self.dimension:
+            if meta:
+                print(f"🔤 Embedding model changed ({meta.get('model')} -> {self.model_name}); "
+                      f"clearing embedding cache.")
+            meta = {"model": self.model_name, "dim": self.dimension, "count": 0}
+        self._meta = meta
+        n = meta["count"]
+        for name, size in (("keys.bin", n * KEY_BYTES), ("vectors.bin", n * self.dimension * 4)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(size)
+        self._save_meta()
+        self._reopen()
+
+    def _reopen(self, last_used: Optional[np.ndarray] = None):
+        """
+        Rebuild the key index from keys.bin (at open, after compaction or clear).
+        `last_used` carries the recency of the rows kept by a compaction; otherwise
+        file order is recency order.
+        """
+        n = self._meta["count"]
+        keys = np.fromfile(self._file("keys.bin"), dtype=_KEY_DTYPE, count=n) if n else []
+        self._row_of: Dict[bytes, int] = {k.tobytes(): i for i, k in enumerate(keys)}
+        self._last_used = np.zeros(max(n, 1024), dtype=np.int64)
+        if last_used is None:
+            self._last_used[:n] = np.arange(self._tick, self._tick + n)
+            self._tick += n
+        else:
+            self._last_used[:n] = last_used
+        self._map_vectors()
+
+    def _map_vectors(self):
+        n = self._meta["count"]
+        if n:
+            self._vectors = np.memmap(self._file("vectors.bin"), dtype=np.float32, mode="r",
+                                      shape=(n, self.dimension))
+        else:
+            self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector (float32 copy) per text, or None for misses."""
+        with self._lock:
+            self._open()
+            out = []
+            for text in texts:
+                row = self._row_of.get(text_key(text))
+                if row is None:
+                    out.append(None)
+                    continue
+                self._last_used[row] = self._tick
+                self._tick += 1
+                out.append(np.array(self._vectors[row]))
+            hits = sum(v is not None for v in out)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(out) - hits
+            return out
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        with self._lock:
+            self._open()
+            keys, rows, pending = [], [], set()
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key in self._row_of or key in pending:
+                    continue
+                pending.add(key)
+                keys.append(key)
+                rows.append(vector)
+            if not keys:
+                return
+            with open(self._file("keys.bin"), "ab") as f:
+                f.write(b"".join(keys))
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(np.asarray(rows, dtype=np.float32).tobytes())
+            start = self._meta["count"]
+            self._meta["count"] += len(keys)
+            self._save_meta()
+            # Index the appended rows in place; they are the most recently used.
+            for i, key in enumerate(keys, start):
+                self._row_of[key] = i
+            end = self._meta["count"]
+            if end > len(self._last_used):
+                grown = np.zeros(max(end, 2 * len(self._last_used)), dtype=np.int64)
+                grown[:start] = self._last_used[:start]
+                self._last_used = grown
+            self._last_used[start:end] = np.arange(self._tick, self._tick + len(keys))
+            self._tick += len(keys)
+            self._map_vectors()
+            if end > self.max_entries:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the cache with the most recently used rows only."""
+        keep_n = int(self.max_entries * COMPACT_TO)
+        order = np.argsort(self._last_used[:self._meta["count"]], kind="stable")[-keep_n:]
+        keys = np.fromfile(self._file("keys.bin"), dtype=_KEY_DTYPE, count=self._meta["count"])
+        keys[order].tofile(self._file("keys.bin.tmp"))
+        np.asarray(self._vectors[order], dtype=np.float32).tofile(self._file("vectors.bin.tmp"))
+        # Zero count first: a crash between the two replaces leaves an empty cache, never a mismatched one.
+        self._meta["count"] = 0
+        self._save_meta()
+        os.replace(self._file("keys.bin.tmp"), self._file("keys.bin"))
+        os.replace(self._file("vectors.bin.tmp"), self._file("vectors.bin"))
+        self._meta["count"] = len(order)
+        self._save_meta()
+        self._reopen(last_used=self._last_used[order])
+        print(f"🔤 Embedding cache compacted to {len(order)} entries.")
+
+    def clear(self):
+        with self._lock:
+            self._meta = {"model": self.model_name, "dim": self.dimension, "count": 0}
+            os.makedirs(self.path, exist_ok=True)
+            for name in ("keys.bin", "vectors.bin"):
+                open(self._file(name), "wb").close()
+            self._save_meta()
+            self._reopen()
+
+    def __len__(self):
+        with self._lock:
+            self._open()
+            return self._meta["count"]
+
+embedding_cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
@@ -0,0 +1,403 @@
+import os
+import json
+import shutil
+import threading
+from typing import Dict
+
+import numpy as np
+
+from config import (
+    FLAT_INDEX_PATH, FLAT_INDEX_DTYPE, EMBEDDING_DIMENSION,
+    VECTOR_QUANTIZATION, QUANTIZATION_RESCORE_CANDIDATES, COMPACT_DELETED_RATIO
+)
+from vector_backend import VectorStore
+
+# On-disk layout (all row-aligned, append-only raw arrays read via np.memmap):
+#   vectors.bin   (count, dim) L2-normalized FLAT_INDEX_DTYPE
+#   ids.bin       int64 point id per row, -1 once deleted/superseded
+#   pages.bin     int32 page_number per row
+#   files.bin     int32 index into meta["filenames"] per row
+#   offsets.bin   int64 byte offset of the row's payload in payloads.jsonl
+#   codes.bin     quantized copy of vectors.bin (int8 rows, or packed sign bits)
+#                 when quantization is enabled; searched first, then the top
+#                 candidates are rescored against vectors.bin
+#   payloads.jsonl one JSON payload per line (never rewritten in place)
+#   meta.json     dim, dtype, quantization (+ int8 scale), committed row count,
+#                 next unallocated point id, filename table
+# Rows are appended first and meta.json is replaced last, so a crash mid-append
+# leaves only ignored bytes past the committed count. Deleted rows stay in the
+# files until optimize() rewrites the live rows into `<path>.compact` and swaps
+# the directories (`<path>.old` is the previous index until the swap is done).
+
+_ROW_FILES = {
+    "ids": np.int64,
+    "pages": np.int32,
+    "files": np.int32,
+    "offsets": np.int64,
+}
+SEARCH_BLOCK_ROWS = 65536  # bounds the float32 temporary when vectors are float16 or quantized
+QUANTIZATIONS = ("none", "int8", "binary")
+# Number of set bits in every byte value, for Hamming distance on packed sign bits.
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+class FlatIndexStore(VectorStore):
+    """
+    Brute-force cosine search over a memory-mapped matrix: one matrix-vector
+    product plus argpartition. Meant for corpora of up to ~100k chunks, where
+    it starts faster and uses less memory than an embedded Qdrant.
+    """
+
+    def __init__(self, path: str = FLAT_INDEX_PATH, dtype: str = FLAT_INDEX_DTYPE,
+                 dimension: int = EMBEDDING_DIMENSION, quantization: str = VECTOR_QUANTIZATION,
+                 rescore_candidates: int = QUANTIZATION_RESCORE_CANDIDATES):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.dimension = dimension
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        self._lock = threading.RLock()
+        self._meta = None
+        self._row_of: Dict[int, int] = {}
+
+    # --- storage helpers ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _save_meta(self):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _map(self, name: str, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(f"{name}.bin"), dtype=dtype, mode="r+", shape=shape)
+
+    def _reopen(self):
+        """(Re)map the committed rows and rebuild the id -> row lookup."""
+        n = self._meta["count"]
+        self._vectors = self._map("vectors", self.dtype, (n, self._meta["dim"]))
+        if self.quantization != "none":
+            self._codes = self._map("codes", self._code_dtype(), (n, self._code_width()))
+        self._rows = {name: self._map(name, dtype, (n,)) for name, dtype in _ROW_FILES.items()}
+        ids = np.asarray(self._rows["ids"])
+        live = np.flatnonzero(ids >= 0)
+        self._row_of = dict(zip(ids[live].tolist(), live.tolist()))
+        self._file_codes = {name: i for i, name in enumerate(self._meta["filenames"])}
+
+    def create_collection(self):
+        if self._meta is not None:
+            return
+        with self._lock:
+            if self._meta is not None:
+                return
+            if not os.path.exists(self.path) and os.path.exists(self.path + ".old"):
+                os.rename(self.path + ".old", self.path)  # interrupted between the two swap renames
+            os.makedirs(self.path, exist_ok=True)
+            meta_path = self._file("meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    self._meta = json.load(f)
+                self.dtype = np.dtype(self._meta["dtype"])
+                # The quantization an index was built with is fixed: codes exist only for it.
+                self.quantization = self._meta.get("quantization", "none")
+            else:
+                self._meta = {
+                    "dim": self.dimension, "dtype": self.dtype.name, "quantization": self.quantization,
+                    "int8_scale": None, "count": 0, "next_id": 0, "filenames": []
+                }
+                self._save_meta()
+            # Drop any bytes appended after the last committed count (interrupted write).
+            n = self._meta["count"]
+            sizes = {"vectors": n * self._meta["dim"] * self.dtype.itemsize}
+            if self.quantization != "none":
+                sizes["codes"] = n * self._code_width() * np.dtype(self._code_dtype()).itemsize
+            sizes.update({name: n * np.dtype(dtype).itemsize for name, dtype in _ROW_FILES.items()})
+            for name, size in sizes.items():
+                with open(self._file(f"{name}.bin"), "ab") as f:
+                    f.truncate(size)
+            open(self._file("payloads.jsonl"), "ab").close()
+            self._reopen()
+            if "next_id" not in self._meta:  # index built before the allocator existed
+                self._meta["next_id"] = max(self._row_of, default=-1) + 1
+                self._save_meta()
+
+    def allocate_ids(self, n: int) -> range:
+        self.create_collection()
+        with self._lock:
+            ids = range(self._meta["next_id"], self._meta["next_id"] + n)
+            self._meta["next_id"] = ids.stop
+            self._save_meta()
+            return ids
+
+    # --- quantization ---
+
+    def _code_dtype(self):
+        return np.int8 if self.quantization == "int8" else np.uint8
+
+    def _code_width(self) -> int:
+        dim = self._meta["dim"]
+        return dim if self.quantization == "int8" else (dim + 7) // 8
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        if self._meta.get("int8_scale") is None:
+            # Fixed from the first batch (rows are append-only, so it cannot change later):
+            # the 99.9th percentile of |component| maps to 127, outliers are clipped.
+            self._meta["int8_scale"] = float(np.quantile(np.abs(vectors), 0.999)) or 1.0
+        scaled = vectors / self._meta["int8_scale"] * 127.0
+        return np.clip(np.rint(scaled), -127, 127).astype(np.int8)
+
+    def _code_scores(self, q: np.ndarray) -> np.ndarray:
+        """First-pass scores over the quantized rows (higher is better, same order as cosine)."""
+        if self.quantization == "binary":
+            q_bits = np.packbits(q > 0)
+            blocks = [
+                -_POPCOUNT[np.bitwise_xor(self._codes[i:i + SEARCH_BLOCK_ROWS], q_bits)].sum(axis=1, dtype=np.int32)
+                for i in range(0, len(self._codes), SEARCH_BLOCK_ROWS)
+            ]
+        else:
+            blocks = [
+                self._codes[i:i + SEARCH_BLOCK_ROWS].astype(np.float32) @ q
+                for i in range(0, len(self._codes), SEARCH_BLOCK_ROWS)
+            ]
+        return np.concatenate(blocks).astype(np.float32)
+
+    # --- writes ---
+
+    def add_documents(self, vectors, payloads, ids=None):
+        self.create_collection()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.where(norms == 0, 1.0, norms)).astype(self.dtype)
+        with self._lock:
+            if ids is None:
+                ids = self.allocate_ids(len(vectors))
+            ids = np.asarray(list(ids), dtype=np.int64)
+
+            # Superseded rows are tombstoned; the new version is appended.
+            for point_id in ids.tolist():
+                row = self._row_of.get(point_id)
+                if row is not None:
+                    self._rows["ids"][row] = -1
+
+            codes = []
+            for p in payloads:
+                name = p.get("filename", "")
+                if name not in self._file_codes:
+                    self._file_codes[name] = len(self._meta["filenames"])
+                    self._meta["filenames"].append(name)
+                codes.append(self._file_codes[name])
+
+            offsets = []
+            with open(self._file("payloads.jsonl"), "ab") as f:
+                pos = f.tell()
+                for p in payloads:
+                    line = (json.dumps(p, ensure_ascii=False) + "\n").encode("utf-8")
+                    offsets.append(pos)
+                    f.write(line)
+                    pos += len(line)
+
+            pages = [int(p.get("page_number") or 0) for p in payloads]
+            columns = {"ids": ids, "pages": pages, "files": codes, "offsets": offsets}
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            if self.quantization != "none":
+                with open(self._file("codes.bin"), "ab") as f:
+                    f.write(np.ascontiguousarray(self._quantize(vectors.astype(np.float32))).tobytes())
+            for name, dtype in _ROW_FILES.items():
+                with open(self._file(f"{name}.bin"), "ab") as f:
+                    f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+            self._flush_maps()
+            self._meta["count"] += len(ids)
+            # Caller-chosen ids must never be handed out again by the allocator.
+            self._meta["next_id"] = max(self._meta["next_id"], int(ids.max()) + 1)
+            self._save_meta()
+            self._reopen()
+
+    def _flush_maps(self):
+        for arr in list(self._rows.values()) + [self._vectors]:
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+    def delete_points(self, ids):
+        self.create_collection()
+        with self._lock:
+            for point_id in ids:
+                row = self._row_of.pop(int(point_id), None)
+                if row is not None:
+                    self._rows["ids"][row] = -1
+            self._flush_maps()
+
+    def delete_file(self, filename):
+        """Tombstone every live row of `filename`, found through the per-row filename codes."""
+        self.create_collection()
+        with self._lock:
+            code = self._file_codes.get(filename)
+            if code is None:
+                return 0
+            ids = np.asarray(self._rows["ids"])
+            rows = np.flatnonzero((np.asarray(self._rows["files"]) == code) & (ids >= 0))
+            for point_id in ids[rows].tolist():
+                self._row_of.pop(point_id, None)
+            self._rows["ids"][rows] = -1
+            self._flush_maps()
+            return len(rows)
+
+    def deleted_ratio(self) -> float:
+        self.create_collection()
+        with self._lock:
+            n = self._meta["count"]
+            return (n - len(self._row_of)) / n if n else 0.0
+
+    def optimize(self, force=False):
+        """
+        Rewrite the index with live rows only (vectors, codes, row columns and
+        payloads), so deleted rows stop costing disk, memory and scan time.
+        """
+        self.create_collection()
+        with self._lock:
+            n = self._meta["count"]
+            dead = n - len(self._row_of)
+            if not dead or (not force and dead / n < COMPACT_DELETED_RATIO):
+                return False
+            live = np.flatnonzero(np.asarray(self._rows["ids"]) >= 0)
+            new_path, old_path = self.path + ".compact", self.path + ".old"
+            shutil.rmtree(new_path, ignore_errors=True)
+            os.makedirs(new_path)
+            np.ascontiguousarray(self._vectors[live]).tofile(os.path.join(new_path, "vectors.bin"))
+            if self.quantization != "none":
+                np.ascontiguousarray(self._codes[live]).tofile(os.path.join(new_path, "codes.bin"))
+            offsets = []
+            with open(self._file("payloads.jsonl"), "rb") as src, \
+                    open(os.path.join(new_path, "payloads.jsonl"), "wb") as dst:
+                for row in live:
+                    src.seek(int(self._rows["offsets"][row]))
+                    offsets.append(dst.tell())
+                    dst.write(src.readline())
+            columns = {name: np.asarray(self._rows[name])[live] for name in _ROW_FILES}
+            columns["offsets"] = np.asarray(offsets, dtype=np.int64)
+            for name, dtype in _ROW_FILES.items():
+                columns[name].astype(dtype).tofile(os.path.join(new_path, f"{name}.bin"))
+            meta = dict(self._meta, count=len(live))
+            with open(os.path.join(new_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            # Release the memory maps before the old files are moved away.
+            self._vectors = self._codes = None
+            self._rows = {}
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.rename(self.path, old_path)
+            os.rename(new_path, self.path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self._meta = meta
+            self._reopen()
+            print(f"🧹 Flat index compacted: {dead} deleted rows dropped, {len(live)} kept.")
+            return True
+
+    # --- reads ---
+
+    def _payload(self, row: int) -> Dict:
+        with open(self._file("payloads.jsonl"), "rb") as f:
+            f.seek(int(self._rows["offsets"][row]))
+            return json.loads(f.readline())
+
+    def _mask(self, file_filters=None, page_range=None) -> np.ndarray:
+        mask = np.asarray(self._rows["ids"]) >= 0
+        if file_filters:
+            codes = [self._file_codes[name] for name in file_filters if name in self._file_codes]
+            mask &= np.isin(self._rows["files"], codes)
+        if page_range:
+            first, last = page_range
+            pages = np.asarray(self._rows["pages"])
+            if first is not None:
+                mask &= pages >= first
+            if last is not None:
+                mask &= pages <= last
+        return mask
+
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        if self.dtype == np.float32:
+            return self._vectors @ q
+        # Score float16 rows in blocks so the float32 temporary stays small.
+        return np.concatenate([
+            self._vectors[i:i + SEARCH_BLOCK_ROWS].astype(np.float32) @ q
+            for i in range(0, len(self._vectors), SEARCH_BLOCK_ROWS)
+        ]) if len(self._vectors) else np.zeros(0, dtype=np.float32)
+
+    def search(self, query_vector, top_k=3, file_filters=None, page_range=None):
+        self.create_collection()
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)  # not in place: q may be the caller's array
+        with self._lock:
+            if not len(self._vectors):
+                return []
+            mask = self._mask(file_filters, page_range)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            if self.quantization == "none":
+                cand_scores = self._scores(q)[candidates]
+            else:
+                # Pass 1 over the compact codes, pass 2 rescoring a shortlist with the originals.
+                rough = self._code_scores(q)[candidates]
+                n_short = min(max(self.rescore_candidates, top_k), len(candidates))
+                short = np.argpartition(-rough, n_short - 1)[:n_short]
+                candidates = np.sort(candidates[short])
+                cand_scores = self._vectors[candidates].astype(np.float32) @ q
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            top = top[np.argsort(-cand_scores[top])]
+            return [
+                dict(self._payload(int(candidates[i])), score=float(cand_scores[i]),
+                     point_id=int(self._rows["ids"][candidates[i]]))
+                for i in top
+            ]
+
+    def search_batch(self, query_vectors, top_k=3, file_filters=None, page_range=None):
+        """
+        All queries against each block of rows in one matrix product.
+        Quantized indexes keep their two-pass search per query.
+        """
+        if self.quantization != "none":
+            return super().search_batch(query_vectors, top_k, file_filters, page_range)
+        self.create_collection()
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dimension)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            if not len(self._vectors) or not len(queries):
+                return [[] for _ in queries]
+            candidates = np.flatnonzero(self._mask(file_filters, page_range))
+            if not len(candidates):
+                return [[] for _ in queries]
+            scores = np.concatenate([
+                self._vectors[candidates[i:i + SEARCH_BLOCK_ROWS]].astype(np.float32) @ queries.T
+                for i in range(0, len(candidates), SEARCH_BLOCK_ROWS)
+            ])  # (n_candidates, n_queries)
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            results = []
+            for j in range(len(queries)):
+                order = top[np.argsort(-scores[top[:, j], j]), j]
+                results.append([
+                    dict(self._payload(int(candidates[i])), score=float(scores[i, j]),
+                         point_id=int(self._rows["ids"][candidates[i]]))
+                    for i in order
+                ])
+            return results
+
+    def iter_payloads(self, batch_size=256):
+        self.create_collection()
+        with self._lock:
+            rows = sorted(self._row_of.items())
+        for point_id, row in rows:
+            yield point_id, self._payload(row)
+
+    def count(self):
+        self.create_collection()
+        return len(self._row_of)
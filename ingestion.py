@@ -0,0 +1,390 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+from typing import Dict, List
+
+from config import (
+    INGEST_MANIFEST_PATH, SUPPORTED_EXTENSIONS, INGEST_BATCH_SIZE, INGEST_QUEUE_BATCHES,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+)
+from chunker import iter_parsed_files
+from embedder import encode_texts, chunk_payloads, point_payloads
+from vector_backend import (
+    add_documents, allocate_ids, delete_points, delete_file, optimize, iter_payloads, count as store_count
+)
+from lexical_index import lexical_index
+from metadata_store import metadata_store
+from parsed_store import parsed_store
+from tracing import start_trace
+
+# Manifest layout:
+# {
+#   "corpus_version": int,     # bumped whenever the indexed content changes
+#   "files": {filename: {"sha256", "size", "mtime", "first_id", "num_chunks", "chunking"}},
+#   "pending": {filename: [first_id, num_chunks]}   # fresh ranges not yet checkpointed
+# }
+# Each file owns the contiguous point-id range [first_id, first_id + num_chunks),
+# reserved from the vector store's own id allocator. "chunking" is the
+# [CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS] the file was chunked with; files
+# chunked with other settings are re-ingested.
+
+CHUNKING = [CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS]
+
+_corpus_version = {}  # manifest path -> (mtime_ns, size, corpus_version)
+
+def _empty_manifest() -> Dict:
+    return {"corpus_version": 0, "files": {}}
+
+def load_manifest(path: str = INGEST_MANIFEST_PATH) -> Dict:
+    if not os.path.exists(path):
+        return _empty_manifest()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        # Never fall back to an empty manifest here: ingest would take every
+        # stored point for an unmanaged one and drop the whole index.
+        print(f"❌ Could not read ingest manifest {path}: {e}")
+        raise
+    for key, value in _empty_manifest().items():
+        manifest.setdefault(key, value)
+    manifest.pop("next_id", None)  # ids used to be allocated here; the store owns them now
+    return manifest
+
+def save_manifest(manifest: Dict, path: str = INGEST_MANIFEST_PATH):
+    """Write the manifest atomically so an interrupted ingest never leaves it half-written."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    _corpus_version.pop(path, None)
+
+def current_corpus_version(path: str = INGEST_MANIFEST_PATH) -> int:
+    """
+    Bumped on every ingest that changes the indexed content. Called on every
+    query, so the manifest is only re-read when its mtime or size changed.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0
+    cached = _corpus_version.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    try:
+        version = load_manifest(path)["corpus_version"]
+    except (OSError, ValueError):
+        return cached[2] if cached else 0  # keep answering; retried on the next query
+    _corpus_version[path] = (st.st_mtime_ns, st.st_size, version)
+    return version
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def is_document_name(name: str) -> bool:
+    """A bare .pdf/.docx file name: no directory part, so it cannot point outside its folder."""
+    return (
+        isinstance(name, str)
+        and name == os.path.basename(name)
+        and "/" not in name and "\\" not in name and "\0" not in name
+        and name not in (".", "..")
+        and name.lower().endswith(tuple(SUPPORTED_EXTENSIONS))
+    )
+
+def list_document_paths(folder_path: str) -> List[str]:
+    return sorted(
+        os.path.join(folder_path, name)
+        for name in os.listdir(folder_path)
+        if name.lower().endswith(tuple(SUPPORTED_EXTENSIONS))
+    )
+
+def drop_unmanaged_points(batch_size: int = 512) -> int:
+    """
+    Remove every point from a collection that has no ingest manifest yet,
+    i.e. one built before incremental ingestion, whose count-based ids gave
+    re-ingested files a second copy of their points. The manifest cannot map
+    those points to files, so the files are simply ingested again afterwards.
+    """
+    ids = [point_id for point_id, _ in iter_payloads(batch_size)]
+    delete_points(ids)
+    lexical_index.delete(ids)
+    metadata_store.delete(ids)
+    optimize(force=True)
+    removed = len(ids)
+    print(f"🧹 Removed {removed} points not tracked by the ingest manifest; their files will be re-ingested.")
+    return removed
+
+def drop_pending_ranges(manifest: Dict, manifest_path: str = INGEST_MANIFEST_PATH):
+    """
+    Delete points of fresh id ranges an interrupted run started but never
+    checkpointed; their files are still new or changed, so they are ingested
+    again this time.
+    """
+    pending = manifest.pop("pending", None)
+    if not pending:
+        return
+    ids = [i for first_id, n in pending.values() for i in range(first_id, first_id + n)]
+    delete_points(ids)
+    lexical_index.delete(ids)
+    metadata_store.delete(ids)
+    save_manifest(manifest, manifest_path)
+    print(f"🧹 Removed {len(ids)} points left by an interrupted ingest ({', '.join(sorted(pending))}).")
+
+def backfill_lexical_index(batch_size: int = 512):
+    """Index every stored chunk for BM25 (collections ingested before the lexical index existed)."""
+    print("🔠 Building BM25 index from the existing collection...")
+    ids, payloads, total = [], [], 0
+    for point_id, payload in iter_payloads(batch_size):
+        ids.append(point_id)
+        payloads.append(dict(payload, point_id=point_id))
+        if len(ids) >= batch_size:
+            lexical_index.add(ids, metadata_store.hydrate(payloads))
+            total += len(ids)
+            ids, payloads = [], []
+    if ids:
+        lexical_index.add(ids, metadata_store.hydrate(payloads))
+        total += len(ids)
+    print(f"🔠 BM25 index built for {total} chunks.")
+
+_DONE = object()
+
+class _StageFailed(Exception):
+    pass
+
+def _put(q: "queue.Queue", item, stop: threading.Event):
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def _run_stage(target, out_q: "queue.Queue", stop: threading.Event, *args):
+    """Run a pipeline stage in a daemon thread; errors are forwarded downstream."""
+    def runner():
+        try:
+            target(out_q, stop, *args)
+        except BaseException as e:  # forwarded, re-raised by the consumer
+            _put(out_q, _StageFailed(e), stop)
+            return
+        _put(out_q, _DONE, stop)
+    t = threading.Thread(target=runner, daemon=True)
+    t.start()
+    return t
+
+def _parse_stage(out_q, stop, changed: Dict, files: Dict, summary: Dict, batch_size: int, trace):
+    """
+    Parse changed files, assign each one its point-id range and emit
+    ("batch", chunks, ids) items of at most `batch_size` chunks, followed by a
+    ("file", fname, entry, stale_ids) marker once all of a file's chunks have
+    been emitted. A fresh range is announced with ("reserve", fname, range)
+    before any of its chunks.
+    """
+    buf_chunks, buf_ids, buf_markers = [], [], []
+
+    def flush():
+        nonlocal buf_chunks, buf_ids, buf_markers
+        if buf_chunks:
+            _put(out_q, ("batch", buf_chunks, buf_ids), stop)
+        for marker in buf_markers:
+            _put(out_q, marker, stop)
+        buf_chunks, buf_ids, buf_markers = [], [], []
+
+    for path, chunks, timings, error in iter_parsed_files(list(changed)):
+        if stop.is_set():
+            return
+        for stage, seconds in timings.items():
+            trace.add(stage, seconds)  # worker-process time, summed over files
+        fname = os.path.basename(path)
+        if error:
+            summary["failed"].append(fname)
+            continue
+        entry = files.get(fname)
+        digest, stat = changed[path]
+        n = len(chunks)
+        if entry and n <= entry["num_chunks"]:
+            # Reuse the file's own id range; upsert overwrites, drop the tail.
+            first_id = entry["first_id"]
+            stale = range(first_id + n, first_id + entry["num_chunks"])
+        else:
+            first_id = allocate_ids(n).start
+            stale = range(entry["first_id"], entry["first_id"] + entry["num_chunks"]) if entry else range(0)
+            _put(out_q, ("reserve", fname, [first_id, n]), stop)  # recorded before any of its chunks land
+
+        ids = list(range(first_id, first_id + n))
+        for start in range(0, n, batch_size):
+            room = batch_size - len(buf_chunks)
+            buf_chunks.extend(chunks[start:start + room])
+            buf_ids.extend(ids[start:start + room])
+            if len(buf_chunks) >= batch_size:
+                flush()
+        buf_markers.append(("file", fname, {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "first_id": first_id,
+            "num_chunks": n,
+            "chunking": CHUNKING
+        }, list(stale), bool(entry)))
+    flush()
+
+def _embed_stage(out_q, stop, in_q, trace):
+    """Embed ("batch", ...) items into ("vectors", matrix, payloads, ids); pass markers through."""
+    while not stop.is_set():
+        item = in_q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageFailed):
+            raise item.args[0]
+        if item[0] == "batch":
+            _, chunks, ids = item
+            with trace.span("embed"):
+                vectors = encode_texts([c["chunk_text"] for c in chunks])
+            item = ("vectors", vectors, chunk_payloads(chunks, ids), ids)
+        _put(out_q, item, stop)
+
+def ingest_folder(folder_path: str, manifest_path: str = INGEST_MANIFEST_PATH) -> Dict:
+    """
+    Incrementally sync `folder_path` into the vector store.
+
+    Unchanged files are skipped, new files get a fresh id range, and changed
+    files (or files chunked with other chunk settings) have their old points
+    replaced in place. Work streams through bounded queues (parse -> embed ->
+    upsert) so memory stays flat, and the manifest is checkpointed after every
+    fully-upserted file: an interrupted run resumes with the files it had not
+    finished, after dropping the points it had half-written.
+    Returns a summary dict with the filenames that were added, updated,
+    skipped and failed, and the chunk count embedded.
+    """
+    first_run = not os.path.exists(manifest_path)
+    manifest = load_manifest(manifest_path)  # raises if unreadable: stop rather than re-embed everything
+    files = manifest["files"]
+    summary = {"added": [], "updated": [], "skipped": [], "failed": [], "chunks": 0}
+    if first_run and store_count() > 0:
+        drop_unmanaged_points()
+    drop_pending_ranges(manifest, manifest_path)
+    if files and lexical_index.count() == 0:
+        backfill_lexical_index()
+
+    # Pass 1: find new/changed files (cheap, sequential).
+    changed = {}
+    for path in list_document_paths(folder_path):
+        fname = os.path.basename(path)
+        entry = files.get(fname)
+        current = entry is not None and entry.get("chunking") == CHUNKING
+        stat = os.stat(path)
+        # Cheap size/mtime check first; only hash the file when those differ.
+        if current and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            summary["skipped"].append(fname)
+            continue
+        digest = file_sha256(path)
+        if current and entry.get("sha256") == digest:
+            # Touched but not modified: remember the new mtime so the next run skips hashing.
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+            summary["skipped"].append(fname)
+            continue
+        changed[path] = (digest, stat)
+
+    if changed and summary["skipped"]:
+        print(f"⏩ {len(summary['skipped'])} file(s) already ingested; processing {len(changed)}.")
+
+    # Pass 2: parse -> embed -> upsert through bounded queues.
+    # Fresh id ranges are reserved from the store as files are parsed; a range
+    # left behind by an interrupted run is simply never used again.
+    trace = start_trace("ingest", folder=folder_path, files=len(changed))
+    stop = threading.Event()
+    parsed_q = queue.Queue(maxsize=INGEST_QUEUE_BATCHES)
+    embedded_q = queue.Queue(maxsize=INGEST_QUEUE_BATCHES)
+    t0 = time.perf_counter()
+    try:
+        if changed:
+            _run_stage(_parse_stage, parsed_q, stop, changed, files, summary, INGEST_BATCH_SIZE, trace)
+            _run_stage(_embed_stage, embedded_q, stop, parsed_q, trace)
+        while changed:  # until the upstream stages report _DONE
+            item = embedded_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageFailed):
+                raise item.args[0]
+            if item[0] == "vectors":
+                _, vectors, payloads, ids = item
+                with trace.span("upsert"):
+                    add_documents(vectors, point_payloads(payloads), ids=ids)
+                    lexical_index.add(ids, payloads)
+                    metadata_store.put(payloads)
+                summary["chunks"] += len(ids)
+                continue
+            if item[0] == "reserve":
+                _, fname, id_range = item
+                manifest.setdefault("pending", {})[fname] = id_range
+                save_manifest(manifest, manifest_path)
+                continue
+            # File marker: every chunk of this file is stored -> checkpoint.
+            _, fname, entry, stale, existed = item
+            with trace.span("checkpoint"):
+                manifest.get("pending", {}).pop(fname, None)
+                if stale:
+                    delete_points(stale)
+                    lexical_index.delete(stale)
+                    metadata_store.delete(stale)
+                files[fname] = entry
+                manifest["corpus_version"] += 1
+                save_manifest(manifest, manifest_path)
+            summary["updated" if existed else "added"].append(fname)
+    finally:
+        stop.set()
+        save_manifest(manifest, manifest_path)
+
+    elapsed = time.perf_counter() - t0
+    if changed:
+        trace.finish(chunks=summary["chunks"], added=len(summary["added"]),
+                     updated=len(summary["updated"]), failed=len(summary["failed"]))
+    rate = f" ({summary['chunks'] / elapsed:.1f} chunks/sec)" if summary["chunks"] and elapsed > 0 else ""
+    print(f"✅ Ingest: {len(summary['added'])} new, {len(summary['updated'])} changed, "
+          f"{len(summary['skipped'])} unchanged, {summary['chunks']} chunks embedded{rate}.")
+    return summary
+
+def delete_documents(folder_path: str, filenames: List[str], remove_files: bool = True,
+                     manifest_path: str = INGEST_MANIFEST_PATH) -> Dict:
+    """
+    Remove files from every index: their points (one payload-filter delete
+    per file), BM25 rows, chunk records, manifest entries and parsed-document
+    cache entries, and (with `remove_files`) the files themselves. The index is
+    compacted afterwards if deleted points now make up COMPACT_DELETED_RATIO of it.
+    Only bare .pdf/.docx names are accepted; anything with a directory part
+    is reported as failed and left alone.
+    Returns {"deleted": [...], "points": int, "failed": {filename: error}}.
+    """
+    manifest = load_manifest(manifest_path)
+    summary = {"deleted": [], "points": 0, "failed": {}}
+    for fname in filenames:
+        if not is_document_name(fname):
+            summary["failed"][str(fname)] = "not a .pdf/.docx file name"
+            continue
+        path = os.path.join(folder_path, fname)
+        try:
+            summary["points"] += delete_file(fname)
+            lexical_index.delete_file(fname)
+            metadata_store.delete_file(fname)
+            if manifest["files"].pop(fname, None) is not None:
+                manifest["corpus_version"] += 1
+                save_manifest(manifest, manifest_path)
+            parsed_store.remove(path)
+            if remove_files and os.path.exists(path):
+                os.remove(path)
+            summary["deleted"].append(fname)
+        except Exception as e:
+            print(f"❌ Could not delete {fname}: {e}")
+            summary["failed"][fname] = str(e)
+    if summary["deleted"]:
+        optimize()
+    print(f"🗑️ Deleted {len(summary['deleted'])} file(s), {summary['points']} points.")
+    return summary
@@ -0,0 +1,98 @@
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from config import LEXICAL_INDEX_PATH, LEXICAL_MMAP_BYTES
+
+# BM25 over an SQLite FTS5 table: the inverted index lives on disk, is
+# updated per point (rowid = vector-store point id) and is read through mmap.
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    chunk_text,
+    filename UNINDEXED,
+    page_number UNINDEXED,
+    chunk_id UNINDEXED,
+    tokenize = 'porter unicode61'
+)
+"""
+
+class LexicalIndex:
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={int(LEXICAL_MMAP_BYTES)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def add(self, ids: List[int], payloads: List[Dict]):
+        """Insert or replace the given points."""
+        rows = [
+            (int(i), p.get("chunk_text", ""), p.get("filename", ""), p.get("page_number", 0), p.get("chunk_id", ""))
+            for i, p in zip(ids, payloads)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE rowid = ?", [(r[0],) for r in rows])
+            self._conn.executemany(
+                "INSERT INTO chunks (rowid, chunk_text, filename, page_number, chunk_id) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def delete(self, ids: List[int]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE rowid = ?", [(int(i),) for i in ids])
+
+    def delete_file(self, filename: str) -> int:
+        """Remove every chunk of `filename`; returns how many were removed."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,)).rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        # Quote every term so user text can never be parsed as FTS5 syntax.
+        terms = {t for t in re.findall(r"\w+", query.lower()) if len(t) > 1 or t.isdigit()}
+        return " OR ".join(f'"{t}"' for t in sorted(terms)) or None
+
+    def search(self, query: str, top_k: int, file_filters=None, page_range=None) -> List[Dict]:
+        """
+        BM25 top_k for `query`, best first. Each hit is a payload dict with
+        `point_id` and `bm25` (higher is better) added.
+        """
+        match = self._match_expression(query)
+        if not match:
+            return []
+        sql = ("SELECT rowid, chunk_text, filename, page_number, chunk_id, bm25(chunks) AS rank "
+               "FROM chunks WHERE chunks MATCH ?")
+        params: list = [match]
+        if file_filters:
+            sql += f" AND filename IN ({','.join('?' * len(file_filters))})"
+            params.extend(file_filters)
+        if page_range:
+            first, last = page_range
+            if first is not None:
+                sql += " AND page_number >= ?"
+                params.append(first)
+            if last is not None:
+                sql += " AND page_number <= ?"
+                params.append(last)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(int(top_k))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{
+            "point_id": rowid,
+            "chunk_text": text,
+            "filename": filename,
+            "page_number": page_number,
+            "chunk_id": chunk_id,
+            "bm25": -rank  # SQLite's bm25() is "lower is better"
+        } for rowid, text, filename, page_number, chunk_id, rank in rows]
+
+lexical_index = LexicalIndex()
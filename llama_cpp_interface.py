@@ -1,21 +1,186 @@
 import os
 import re
-from config import LLM_MODEL_PATH, LLM_MAX_INPUT_TOKENS, PROMPT_TEMPLATE, DEVICE
-from llama_cpp import Llama
+import time
+import pickle
+import hashlib
+import threading
+from typing import Iterator, List, Optional
+from config import (
+    LLM_MODEL_PATH, LLM_MAX_INPUT_TOKENS, PROMPT_TEMPLATE, DEVICE, LOG_LATENCY,
+    LLM_PREFIX_CACHE_ENABLED, LLM_PREFIX_CACHE_PATH,
+    LLM_WORKERS, LLM_THREADS, LLM_QUEUE_SIZE, LLM_REQUEST_TIMEOUT,
+    LLM_MODE, STUB_TOKEN_DELAY
+)
+from llm_scheduler import LLMScheduler, SchedulerBusy
+from context_packer import pack_chunks
 
 # Set model context window: TinyLlama Q4_K_M supports 1024 tokens; limit accordingly.
 N_CTX = min(LLM_MAX_INPUT_TOKENS, 1024)
 N_GPU_LAYERS = 40 if DEVICE.lower() == "gpu" else 0
+MAX_ANSWER_TOKENS = 128  # Stay well under 1024 context tokens
+STOP_SEQUENCES = ["\n\n", "User:", "###"]
+PROMPT_SAFETY_TOKENS = 8  # Slack for tokenization differences at the join points
+BUSY_ANSWER = "The model is busy answering other questions. Please try again in a moment."
 
-print(f"🦙 Loading GGUF model via llama.cpp ({DEVICE.upper()} mode)...")
-llm = Llama(
-    model_path=LLM_MODEL_PATH,
-    n_ctx=N_CTX,
-    n_threads=os.cpu_count() or 4,
-    n_gpu_layers=N_GPU_LAYERS,
-    use_gpu=(DEVICE.lower() == "gpu"),
-    verbose=False
-)
+# Prompt-prefix KV cache: the instruction preamble of PROMPT_TEMPLATE never
+# changes. Each worker evaluates it once, snapshots the llama.cpp state, and
+# starts every request from that snapshot so only the variable suffix
+# (source, content, question) is evaluated.
+# Cut at the last newline before the first placeholder so the prefix tokenizes
+# the same on its own as it does inside a full prompt.
+STATIC_PREFIX = PROMPT_TEMPLATE[:PROMPT_TEMPLATE.index("{")].rsplit("\n", 1)[0] + "\n"
+
+def _prefix_cache_key() -> str:
+    """
+    Identifies a saved KV state: the pickled llama.cpp state is only valid for
+    the same library version, model file and context settings.
+    """
+    if LLM_MODE == "stub":
+        return hashlib.sha256(f"stub|{N_CTX}|{STATIC_PREFIX}".encode("utf-8")).hexdigest()
+    import llama_cpp
+    stat = os.stat(LLM_MODEL_PATH)
+    raw = (f"{getattr(llama_cpp, '__version__', '?')}|{os.path.abspath(LLM_MODEL_PATH)}|"
+           f"{stat.st_size}|{stat.st_mtime}|{N_CTX}|{N_GPU_LAYERS}|{STATIC_PREFIX}")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _load_prefix_state(key: str):
+    if not LLM_PREFIX_CACHE_PATH or not os.path.exists(LLM_PREFIX_CACHE_PATH):
+        return None
+    try:
+        with open(LLM_PREFIX_CACHE_PATH, "rb") as f:
+            saved = pickle.load(f)
+        return saved["state"] if saved.get("key") == key else None
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable prompt-prefix cache: {e}")
+        return None
+
+def _save_prefix_state(key: str, state):
+    if not LLM_PREFIX_CACHE_PATH:
+        return
+    try:
+        os.makedirs(os.path.dirname(LLM_PREFIX_CACHE_PATH) or ".", exist_ok=True)
+        tmp_path = f"{LLM_PREFIX_CACHE_PATH}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"key": key, "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, LLM_PREFIX_CACHE_PATH)
+    except Exception as e:
+        print(f"⚠️ Could not persist prompt-prefix cache: {e}")
+
+def load_model(n_threads: int):
+    if LLM_MODE == "stub":
+        from stub_models import StubLlama
+        return StubLlama(n_ctx=N_CTX, token_delay=STUB_TOKEN_DELAY)
+    from llama_cpp import Llama
+    print(f"🦙 Loading GGUF model via llama.cpp ({DEVICE.upper()} mode, {n_threads} threads)...")
+    return Llama(
+        model_path=LLM_MODEL_PATH,
+        n_ctx=N_CTX,
+        n_threads=n_threads,
+        n_gpu_layers=N_GPU_LAYERS,
+        use_gpu=(DEVICE.lower() == "gpu"),
+        verbose=False
+    )
+
+class ModelWorker:
+    """
+    One llama.cpp context plus its prompt-prefix snapshot. Only ever used by
+    a single scheduler thread at a time.
+    """
+
+    def __init__(self, n_threads: int):
+        self.llm = load_model(n_threads)
+        self.prefix_tokens: List[int] = []
+        self.prefix_state = None
+        if LLM_PREFIX_CACHE_ENABLED:
+            try:
+                self.warm_prefix_cache()
+            except Exception as e:
+                print(f"⚠️ Prompt-prefix cache disabled: {e}")
+
+    def warm_prefix_cache(self):
+        """
+        Evaluate STATIC_PREFIX once (or load its saved state from disk) and keep
+        the snapshot for restore_prefix().
+        """
+        self.prefix_tokens = self.llm.tokenize(STATIC_PREFIX.encode("utf-8"), add_bos=True)
+        key = _prefix_cache_key()
+        state = _load_prefix_state(key)
+        if state is not None:
+            try:
+                self.llm.load_state(state)
+                print(f"🦙 Prompt-prefix state loaded from disk ({len(self.prefix_tokens)} tokens).")
+            except Exception as e:
+                print(f"⚠️ Saved prompt-prefix state does not fit this model ({e}); re-evaluating.")
+                state = None
+        if state is None:
+            t0 = time.perf_counter()
+            self.llm.reset()
+            self.llm.eval(self.prefix_tokens)
+            state = self.llm.save_state()
+            print(f"🦙 Prompt prefix evaluated in {time.perf_counter() - t0:.2f} sec "
+                  f"({len(self.prefix_tokens)} tokens).")
+            _save_prefix_state(key, state)
+        self.prefix_state = state
+
+    def restore_prefix(self):
+        """
+        Make sure the KV cache starts with the static prefix. llama.cpp
+        already reuses the longest matching token prefix, so the snapshot is
+        only loaded when the current state does not begin with it.
+        """
+        if self.prefix_state is None:
+            return
+        n = len(self.prefix_tokens)
+        if self.llm.n_tokens >= n and list(self.llm.input_ids[:n]) == list(self.prefix_tokens):
+            return
+        self.llm.load_state(self.prefix_state)
+
+    def generate(self, prompt: str) -> Iterator[str]:
+        self.restore_prefix()
+        for part in self.llm(
+            prompt,
+            max_tokens=MAX_ANSWER_TOKENS,
+            temperature=0.2,
+            stop=STOP_SEQUENCES,
+            echo=False,
+            stream=True
+        ):
+            text = part["choices"][0]["text"]
+            if text:
+                yield text
+
+# Both singletons are built on first use, so importing this module is cheap.
+_tokenizer = None
+_scheduler: Optional[LLMScheduler] = None
+_init_lock = threading.Lock()
+
+def get_tokenizer():
+    """Vocabulary-only instance for token counting: cheap, and never blocks on a busy worker."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _init_lock:
+            if _tokenizer is None and LLM_MODE == "stub":
+                from stub_models import StubLlama
+                _tokenizer = StubLlama(n_ctx=N_CTX)
+            elif _tokenizer is None:
+                from llama_cpp import Llama
+                _tokenizer = Llama(model_path=LLM_MODEL_PATH, vocab_only=True, verbose=False)
+    return _tokenizer
+
+def get_scheduler() -> LLMScheduler:
+    """The process-wide scheduler; its workers load the GGUF model when it is first built."""
+    global _scheduler
+    if _scheduler is None:
+        with _init_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    ModelWorker,
+                    num_workers=LLM_WORKERS,
+                    total_threads=LLM_THREADS or os.cpu_count() or 4,
+                    max_queue=LLM_QUEUE_SIZE,
+                    timeout=LLM_REQUEST_TIMEOUT
+                )
+    return _scheduler
 
 def clean_repetitions(text: str) -> str:
     """
@@ -31,39 +196,115 @@ def clean_repetitions(text: str) -> str:
             seen.add(s.lower())
     return " ".join(cleaned)
 
-def generate_answer(chunk: dict, user_query: str) -> str:
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().tokenize(text.encode("utf-8"), add_bos=False))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = get_tokenizer().tokenize(text.encode("utf-8"), add_bos=False)
+    if len(tokens) <= max_tokens:
+        return text
+    return get_tokenizer().detokenize(tokens[:max(max_tokens, 0)]).decode("utf-8", errors="ignore")
+
+def _format_prompt(chunk: dict, user_query: str, chunk_text: str) -> str:
+    return PROMPT_TEMPLATE.format(
+        filename=chunk.get("filename", ""),
+        page_number=chunk.get("page_number", ""),
+        chunk_id=chunk.get("chunk_id", ""),
+        chunk_text=chunk_text,
+        user_query=user_query
+    )
+
+def context_budget(chunk: dict, user_query: str) -> int:
+    """
+    Tokens left for document content once the template, the question,
+    BOS and the answer's max_tokens are accounted for.
+    """
+    fixed = len(get_tokenizer().tokenize(_format_prompt(chunk, user_query, "").encode("utf-8"), add_bos=True))
+    return N_CTX - fixed - MAX_ANSWER_TOKENS - PROMPT_SAFETY_TOKENS
+
+def pack_context(chunks: List[dict], user_query: str) -> dict:
+    """
+    Pack the highest-scoring, non-overlapping chunks into exactly the token
+    budget the prompt leaves for content. Returns a chunk dict suitable for
+    generate_answer, with per-chunk `citations`.
+    """
+    if not chunks:
+        return {"chunk_text": "", "filename": "", "page_number": "", "chunk_id": "", "citations": []}
+    ranked = sorted(chunks, key=lambda c: c.get("score", 0.0), reverse=True)
+    # The source header names every candidate chunk id, so budget for the worst case.
+    header = {
+        "filename": ranked[0].get("filename", ""),
+        "page_number": ranked[0].get("page_number", ""),
+        "chunk_id": ",".join(c.get("chunk_id", "") for c in ranked)
+    }
+    packed_text, citations = pack_chunks(
+        ranked, count_tokens, context_budget(header, user_query), truncate=truncate_to_tokens
+    )
+    return {
+        "chunk_text": packed_text,
+        "filename": citations[0]["filename"] if citations else header["filename"],
+        "page_number": citations[0]["page_number"] if citations else header["page_number"],
+        "chunk_id": ",".join(c["chunk_id"] for c in citations),
+        "citations": citations
+    }
+
+def build_prompt(chunk: dict, user_query: str) -> str:
+    """
+    Fill PROMPT_TEMPLATE. Content that would push the prompt past the
+    context window (minus the answer budget) is cut at a token boundary.
+    """
+    chunk_text = chunk.get("chunk_text", "")
+    budget = context_budget(chunk, user_query)
+    if count_tokens(chunk_text) > budget:
+        chunk_text = truncate_to_tokens(chunk_text, budget)
+    return _format_prompt(chunk, user_query, chunk_text)
+
+def stream_answer(chunk: dict, user_query: str, stats: Optional[dict] = None) -> Iterator[str]:
+    """
+    Yields answer tokens as llama.cpp produces them. Text is raw; run
+    clean_repetitions over the joined result once the stream ends.
+    The request goes through the scheduler, so it may raise SchedulerBusy
+    (queue full) or RequestTimeout. If `stats` is given it is filled with
+    queue_wait, time_to_first_token (from submission), generation_time,
+    tokens and tokens_per_sec when the stream finishes.
+    """
+    prompt = build_prompt(chunk, user_query)
+    print("🧠 Generating answer...")
+    stats = {} if stats is None else stats
+    t0 = time.perf_counter()
+    first_token_at = None
+    n_tokens = 0
+    for text in get_scheduler().stream(lambda worker: worker.generate(prompt), stats=stats):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        n_tokens += 1
+        yield text
+
+    end = time.perf_counter()
+    ttft = (first_token_at or end) - t0
+    gen_time = end - (first_token_at or end)
+    tokens_per_sec = (n_tokens - 1) / gen_time if n_tokens > 1 and gen_time > 0 else 0.0
+    stats.update({
+        "time_to_first_token": ttft,
+        "generation_time": gen_time,
+        "tokens": n_tokens,
+        "tokens_per_sec": tokens_per_sec
+    })
+    if LOG_LATENCY:
+        print(f"⏱️ Queue wait: {stats.get('queue_wait', 0.0):.2f} sec | First token: {ttft:.2f} sec | "
+              f"{n_tokens} tokens @ {tokens_per_sec:.1f} tok/sec")
+
+def generate_answer(chunk: dict, user_query: str, stats: Optional[dict] = None) -> str:
     """
     Formats the prompt using the matched chunk and user's question,
     then generates an answer using LLaMA.
     """
     try:
-        # Truncate chunk_text to ~2000 chars (~512 tokens conservatively)
-        chunk_text = chunk.get("chunk_text", "")[:2000]
-
-        prompt = PROMPT_TEMPLATE.format(
-            filename=chunk.get("filename", ""),
-            page_number=chunk.get("page_number", ""),
-            chunk_id=chunk.get("chunk_id", ""),
-            chunk_text=chunk_text,
-            user_query=user_query
-        )
-
-        print("🧠 Generating answer...")
-        result = llm(
-            prompt,
-            max_tokens=128,  # Stay well under 1024 context tokens
-            temperature=0.2,
-            stop=["\n\n", "User:", "###"],
-            echo=False
-        )
-
-        raw_answer = (
-            result["choices"][0]["text"].strip()
-            if isinstance(result["choices"][0], dict)
-            else result["choices"][0].strip()
-        )
+        raw_answer = "".join(stream_answer(chunk, user_query, stats=stats)).strip()
         return clean_repetitions(raw_answer)
+    except SchedulerBusy:
+        print("⚠️ LLM queue full; request rejected.")
+        return BUSY_ANSWER
     except Exception as e:
         print(f"❌ LLM generation failed: {e}")
         return "Failed to generate an answer."
-
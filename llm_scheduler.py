@@ -0,0 +1,137 @@
+import time
+import queue
+import threading
+from typing import Callable, Dict, Iterator, Optional
+
+class SchedulerBusy(Exception):
+    """Raised when the request queue is full (backpressure)."""
+
+class RequestTimeout(Exception):
+    """Raised when a request does not finish within its timeout."""
+
+class _Request:
+    def __init__(self, job: Callable):
+        self.job = job
+        self.out: "queue.Queue" = queue.Queue()
+        self.cancelled = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.queue_wait: Optional[float] = None
+        self.run_time: Optional[float] = None
+
+class LLMScheduler:
+    """
+    Bounded request queue in front of a pool of model workers.
+
+    Each worker thread owns one model built by `model_factory(n_threads)`, so
+    no two requests ever touch the same llama.cpp context. Jobs are callables
+    `job(model) -> iterator of items`; items are streamed back to the caller.
+    A full queue raises SchedulerBusy immediately instead of piling up
+    requests, and every request has a deadline covering queue wait plus run time.
+    """
+
+    def __init__(self, model_factory: Callable, num_workers: int, total_threads: int,
+                 max_queue: int, timeout: float):
+        self.timeout = timeout
+        self.num_workers = max(1, num_workers)
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._busy = 0
+        self.counters = {"completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+        self._queue_wait_total = 0.0
+        self._run_time_total = 0.0
+
+        threads_per_worker = max(1, total_threads // self.num_workers)
+        # Models are built up front so load errors surface to the caller.
+        models = [model_factory(threads_per_worker) for _ in range(self.num_workers)]
+        self._threads = []
+        for i, model in enumerate(models):
+            t = threading.Thread(target=self._worker, args=(model,), name=f"llm-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"🦙 LLM scheduler: {self.num_workers} worker(s) x {threads_per_worker} thread(s), "
+              f"queue size {max_queue}")
+
+    def _worker(self, model):
+        while True:
+            req = self._queue.get()
+            if req is None:
+                break
+            started = time.perf_counter()
+            req.queue_wait = started - req.enqueued_at
+            if req.cancelled.is_set():
+                continue  # caller already gave up while we were queued
+            with self._lock:
+                self._busy += 1
+            ok = False
+            try:
+                for item in req.job(model):
+                    if req.cancelled.is_set():
+                        break
+                    req.out.put(("item", item))
+                req.out.put(("done", None))
+                ok = True
+            except Exception as e:
+                req.out.put(("error", e))
+            finally:
+                req.run_time = time.perf_counter() - started
+                with self._lock:
+                    self._busy -= 1
+                    self.counters["completed" if ok else "failed"] += 1
+                    self._queue_wait_total += req.queue_wait
+                    self._run_time_total += req.run_time
+
+    def stream(self, job: Callable, timeout: Optional[float] = None,
+               stats: Optional[Dict] = None) -> Iterator:
+        """
+        Queue `job` and yield its items as the worker produces them.
+        If `stats` is given it receives `queue_wait` (seconds spent waiting for a worker).
+        """
+        req = _Request(job)
+        try:
+            self._queue.put_nowait(req)
+        except queue.Full:
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise SchedulerBusy(f"LLM queue is full ({self._queue.maxsize} waiting requests)")
+
+        deadline = req.enqueued_at + (timeout or self.timeout)
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    kind, value = req.out.get(timeout=remaining)
+                except queue.Empty:
+                    with self._lock:
+                        self.counters["timed_out"] += 1
+                    raise RequestTimeout(f"LLM request exceeded {timeout or self.timeout:g} sec")
+                if kind == "item":
+                    if stats is not None and "queue_wait" not in stats:
+                        stats["queue_wait"] = req.queue_wait
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    break
+        finally:
+            req.cancelled.set()
+            if stats is not None and req.queue_wait is not None:
+                stats["queue_wait"] = req.queue_wait
+
+    def snapshot(self) -> Dict:
+        """Queue depth, busy workers, outcome counters and mean wait/run times."""
+        with self._lock:
+            finished = self.counters["completed"] + self.counters["failed"]
+            return dict(
+                self.counters,
+                queue_depth=self._queue.qsize(),
+                busy_workers=self._busy,
+                workers=self.num_workers,
+                avg_queue_wait=self._queue_wait_total / finished if finished else 0.0,
+                avg_run_time=self._run_time_total / finished if finished else 0.0
+            )
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
@@ -2,7 +2,7 @@ import os
 import fitz  # PyMuPDF
 import uuid
 from embedder import embed_and_store_chunks
-from qdrant_helper import create_collection as create_or_load_index  # Qdrant!
+from vector_backend import create_collection as create_or_load_index  # Qdrant!
 
 # === CONFIG ===
 CHUNK_SIZE = 300       # Number of words per chunk
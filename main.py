@@ -1,85 +1,116 @@
-from data_loader import load_documents_from_folder
-from embedder import embed_and_store_chunks, embed_query
-from retriever import retrieve_top_k_chunks
-from llama_cpp_interface import generate_answer
-from config import TOP_K
-from qdrant_helper import create_collection as create_or_load_index  # Qdrant version
-
-# Ensure Qdrant collection is loaded globally once
-create_or_load_index()
+import startup  # first, so startup timings start at process start
+import os
+import time
+import csv
+import json
+from ingestion import ingest_folder
+from tracing import percentile
+from config import WARMUP_ON_START, DOCS_DIR
 
 def ingest_documents(folder_path: str):
-    print("📥 Loading documents and preparing chunks...")
-    chunks = load_documents_from_folder(folder_path)
-    print(f"🧩 Total chunks generated: {len(chunks)}")
-    embed_and_store_chunks(chunks)
-    print("✅ Document ingestion complete.")
-
-def answer_question(user_query: str) -> dict:
-    print(f"❓ User query: {user_query}")
-    # Step 1: Embed query
+    print("📥 Syncing documents folder (only new or changed files are embedded)...")
     try:
-        query_vector = embed_query(user_query)
-    except Exception as e:
-        print(f"❌ Failed to embed query: {e}")
-        return {
-            "answer": "Failed to embed the query.",
-            "source": None
-        }
-
-    # Step 2: Retrieve top-k chunks
-    try:
-        top_chunks = retrieve_top_k_chunks(query_vector, top_k=TOP_K)
-    except Exception as e:
-        print(f"❌ Retrieval error: {e}")
-        return {
-            "answer": "Failed to retrieve relevant context.",
-            "source": None
-        }
-
-    if not top_chunks:
-        return {
-            "answer": "No relevant context found in the documents.",
-            "source": None
-        }
-
-    selected_chunk = top_chunks[0]
-
-    if not isinstance(selected_chunk, dict) or "chunk_text" not in selected_chunk:
-        return {
-            "answer": "The answer could not be generated due to invalid document format.",
-            "source": None
-        }
+        summary = ingest_folder(folder_path)
+    except KeyboardInterrupt:
+        print("\n⏸️ Ingestion interrupted. Finished files are saved; run `python main.py ingest` again to resume.")
+        return
+    print(f"🧩 Chunks embedded this run: {summary['chunks']}")
+    print("✅ Document ingestion complete.")
 
-    try:
-        answer = generate_answer(selected_chunk, user_query)
-    except Exception as e:
-        print(f"❌ Generation failed: {e}")
-        answer = "Failed to generate an answer."
+def read_questions(path: str) -> list:
+    """
+    Questions from a JSONL file (objects with a "question" field, or bare strings)
+    or a CSV file (a "question" column, else the first column). Other fields are
+    kept and copied to the output. Records without a question, and lines that
+    are not valid JSON, are skipped with a warning.
+    """
+    records, skipped = [], []
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            key = "question" if "question" in (reader.fieldnames or []) else (reader.fieldnames or ["question"])[0]
+            for row in reader:
+                question = row.get(key) or ""  # short rows fill missing columns with None
+                if question.strip():
+                    records.append(dict(row, question=question))
+                else:
+                    skipped.append(reader.line_num)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    item = None
+                if not isinstance(item, dict):
+                    item = {"question": item} if isinstance(item, str) else {}
+                if isinstance(item.get("question"), str) and item["question"].strip():
+                    records.append(item)
+                else:
+                    skipped.append(line_no)
+    if skipped:
+        print(f"⚠️ Skipped {len(skipped)} record(s) without a question (line(s) "
+              f"{', '.join(map(str, skipped[:10]))}{', ...' if len(skipped) > 10 else ''}).")
+    return records
 
-    return {
-        "answer": answer,
-        "source": {
-            "filename": selected_chunk.get("filename", "N/A"),
-            "page_number": selected_chunk.get("page_number", "N/A"),
-            "chunk_id": selected_chunk.get("chunk_id", "N/A"),
-            "chunk_text": selected_chunk.get("chunk_text", "")
-        }
+def run_batch(in_path: str, out_path: str = None) -> dict:
+    """Answer every question in `in_path`, write one JSON line per answer, report throughput."""
+    from answer_question import answer_questions, FAILED_ANSWERS
+    records = read_questions(in_path)
+    out_path = out_path or os.path.splitext(in_path)[0] + ".answers.jsonl"
+    print(f"📋 {len(records)} questions from {in_path} -> {out_path}")
+    t0 = time.perf_counter()
+    latencies, stages, outcomes = [], {}, {}
+    with open(out_path, "w", encoding="utf-8") as f:
+        results = answer_questions([r["question"] for r in records])
+        for i, (record, result) in enumerate(zip(records, results), start=1):
+            f.write(json.dumps(dict(record, **result), ensure_ascii=False) + "\n")
+            f.flush()
+            latencies.append(result.get("latency", 0.0))
+            for stage, seconds in result.get("timings", {}).items():
+                stages.setdefault(stage, []).append(seconds)
+            outcome = ("no_context" if not result.get("source")
+                       else "failed" if result.get("answer") in FAILED_ANSWERS else "answered")
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if i % 10 == 0 or i == len(records):
+                print(f"🧠 [{i}/{len(records)}] answered ({i / (time.perf_counter() - t0):.2f} q/s)")
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    summary = {
+        "questions": len(records),
+        "wall_s": wall,
+        "qps": len(records) / wall if wall > 0 else 0.0,
+        **{f"latency_p{int(q * 100)}_s": percentile(latencies, q) for q in (0.5, 0.95, 0.99)},
+        "stage_p50_s": {stage: percentile(sorted(v), 0.5) for stage, v in stages.items()},
+        "outcomes": outcomes,
     }
+    with open(os.path.splitext(out_path)[0] + ".summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ {summary['questions']} questions in {wall:.2f} sec: {summary['qps']:.2f} questions/sec | "
+          f"latency p50 {summary['latency_p50_s']:.2f}s p95 {summary['latency_p95_s']:.2f}s "
+          f"p99 {summary['latency_p99_s']:.2f}s")
+    print("⏱️ Stage p50: " + " | ".join(f"{k} {v:.3f}s" for k, v in summary["stage_p50_s"].items()))
+    return summary
 
 if __name__ == "__main__":
     import sys
-    import time
 
     if len(sys.argv) < 2:
-        print("Usage:\n  python main.py ingest\n  python main.py query")
+        print("Usage:\n  python main.py ingest\n  python main.py query\n"
+              "  python main.py batch QUESTIONS.jsonl|.csv [ANSWERS.jsonl]")
         exit()
 
     if sys.argv[1] == "ingest":
-        folder = "documents/"
-        ingest_documents(folder)
+        startup.mark("ingest started")
+        ingest_documents(DOCS_DIR)
 
     elif sys.argv[1] == "query":
+        from answer_question import answer_question
+        if WARMUP_ON_START:
+            startup.start_warm_up()  # models load while the user types
+        startup.mark("query prompt ready")
         while True:
             user_input = input("\n🔎 Ask a question (or type 'exit'): ")
             if user_input.lower() in ["exit", "quit"]:
@@ -96,5 +127,12 @@ if __name__ == "__main__":
                     f"(Page {result['source']['page_number']}, Chunk {result['source']['chunk_id']})"
                 )
             print(f"⚡ Response time: {end_time - start_time:.2f} sec")
+            if result.get("timings"):
+                print("⏱️ Stages: " + " | ".join(f"{k} {v:.3f}s" for k, v in result["timings"].items()))
+    elif sys.argv[1] == "batch":
+        if len(sys.argv) < 3:
+            print("Usage: python main.py batch QUESTIONS.jsonl|.csv [ANSWERS.jsonl]")
+            exit()
+        run_batch(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
     else:
-        print("Unknown command. Use 'ingest' or 'query'")
+        print("Unknown command. Use 'ingest', 'query' or 'batch'")
@@ -0,0 +1,120 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List
+
+from config import METADATA_STORE_PATH
+
+# Chunk records (filename, page, chunk id, full text) keyed by vector-store
+# point id, with a secondary index on filename. Every ingest batch is one
+# transaction, so the store never holds half a batch, and nothing is
+# rewritten wholesale: WAL appends only the changed pages. Vector payloads
+# keep just the fields search filters on; chunk text is read from here for
+# the hits a query actually returns.
+
+LEGACY_METADATA_FILE = "vector_metadata.json"  # the old JSON sidecar, imported once if present
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    point_id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL,
+    chunk_text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_filename ON chunks (filename);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class MetadataStore:
+    def __init__(self, path: str = METADATA_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        if os.path.exists(LEGACY_METADATA_FILE) and not self._meta_value("legacy_imported"):
+            self._import_legacy(LEGACY_METADATA_FILE)
+
+    def _meta_value(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _import_legacy(self, json_path: str):
+        """One-time import of the JSON sidecar; recorded in `meta` so it never runs again."""
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read {json_path} ({e}); skipping metadata import.")
+            return
+        # Records written by embed_and_store_chunks without ids carry UUIDs, which no point uses.
+        records = [r for r in records if isinstance(r, dict) and isinstance(r.get("id"), int)]
+        if not self.count():  # never let the old sidecar overwrite newer records
+            self.put(records)
+            if records:
+                print(f"🗂️ Imported {len(records)} chunk records from {json_path}.")
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_imported', ?)", (json_path,))
+
+    def put(self, payloads: List[Dict]):
+        """Insert or replace records (chunk_payloads() dicts, keyed by their "id") in one transaction."""
+        rows = [
+            (int(p["id"]), p.get("filename", ""), int(p.get("page_number") or 0),
+             p.get("chunk_id", ""), p.get("chunk_text", ""))
+            for p in payloads
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get_many(self, point_ids: List[int]) -> Dict[int, Dict]:
+        """{point_id: record} for the ids that exist."""
+        ids = [int(i) for i in point_ids]
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT point_id, filename, page_number, chunk_id, chunk_text FROM chunks "
+                f"WHERE point_id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {
+            point_id: {"filename": filename, "page_number": page, "chunk_id": chunk_id, "chunk_text": text}
+            for point_id, filename, page, chunk_id, text in rows
+        }
+
+    def hydrate(self, hits: List[Dict]) -> List[Dict]:
+        """Fill in chunk_text (in place) for hits whose payload does not carry it."""
+        missing = [h["point_id"] for h in hits if not h.get("chunk_text") and h.get("point_id") is not None]
+        if missing:
+            records = self.get_many(missing)
+            for hit in hits:
+                record = records.get(hit.get("point_id"))
+                if record is not None and not hit.get("chunk_text"):
+                    hit["chunk_text"] = record["chunk_text"]
+        return hits
+
+    def ids_for_file(self, filename: str) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT point_id FROM chunks WHERE filename = ? ORDER BY point_id", (filename,)
+            )]
+
+    def delete(self, point_ids: List[int]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE point_id = ?", [(int(i),) for i in point_ids])
+
+    def delete_file(self, filename: str) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,)).rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+metadata_store = MetadataStore()
@@ -0,0 +1,136 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config import PARSED_STORE_PATH, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# Parse results per document, keyed by absolute path and valid while the
+# file's size and mtime are unchanged: page texts, the chunks cut from them
+# and the counts. Shared by ingestion (skips re-parsing) and the app's
+# chunk preview (a single query instead of re-parsing every file per rerun).
+# Bump PARSER_VERSION whenever extraction or chunking changes output; entries
+# cut with other chunk settings are stale too.
+PARSER_VERSION = 1
+_VERSION = f"{PARSER_VERSION}/{CHUNK_MAX_TOKENS}/{CHUNK_OVERLAP_TOKENS}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    version TEXT NOT NULL,
+    num_pages INTEGER NOT NULL,
+    num_chunks INTEGER NOT NULL,
+    error TEXT,
+    parsed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (path, page_number)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    path TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    page_number INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL,
+    chunk_text TEXT NOT NULL,
+    PRIMARY KEY (path, seq)
+);
+"""
+
+def _key(path: str) -> str:
+    return os.path.abspath(path)
+
+class ParsedDocumentStore:
+    def __init__(self, path: str = PARSED_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _fresh_rows(self, paths: List[str]) -> Dict[str, Tuple]:
+        """documents rows for `paths` whose stored size/mtime/version still match the file."""
+        keys = {_key(p): p for p in paths}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path, size, mtime, version, num_pages, num_chunks, error FROM documents "
+                f"WHERE path IN ({','.join('?' * len(keys))})", list(keys)
+            ).fetchall() if keys else []
+        fresh = {}
+        for key, size, mtime, version, num_pages, num_chunks, error in rows:
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            if version == _VERSION and stat.st_size == size and stat.st_mtime == mtime:
+                fresh[keys[key]] = (num_pages, num_chunks, error)
+        return fresh
+
+    def summaries(self, paths: List[str]) -> Dict[str, Optional[Dict]]:
+        """{path: {"num_pages", "num_chunks", "error"} or None if not parsed (or stale)}."""
+        fresh = self._fresh_rows(paths)
+        return {
+            p: dict(zip(("num_pages", "num_chunks", "error"), fresh[p])) if p in fresh else None
+            for p in paths
+        }
+
+    def get_chunks(self, path: str) -> Optional[List[Dict]]:
+        """The stored chunks of `path` if its entry is fresh, else None."""
+        if path not in self._fresh_rows([path]):
+            return None
+        fname = os.path.basename(path)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_number, chunk_id, chunk_text FROM chunks WHERE path = ? ORDER BY seq", (_key(path),)
+            ).fetchall()
+        return [{"filename": fname, "page_number": page, "chunk_id": cid, "chunk_text": text}
+                for page, cid, text in rows]
+
+    def get_pages(self, path: str) -> Optional[List[Tuple[int, str]]]:
+        if path not in self._fresh_rows([path]):
+            return None
+        with self._lock:
+            return self._conn.execute(
+                "SELECT page_number, text FROM pages WHERE path = ? ORDER BY page_number", (_key(path),)
+            ).fetchall()
+
+    def first_chunk(self, path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunk_text FROM chunks WHERE path = ? ORDER BY seq LIMIT 1", (_key(path),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path: str, stat: os.stat_result, pages: List[Tuple[int, str]], chunks: List[Dict],
+            error: Optional[str] = None):
+        """
+        Replace the entry for `path`. `stat` must be taken before parsing
+        started, so a file modified mid-parse is treated as stale next time.
+        """
+        key = _key(path)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages WHERE path = ?", (key,))
+            self._conn.execute("DELETE FROM chunks WHERE path = ?", (key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime, _VERSION, len(pages), len(chunks), error, time.time())
+            )
+            self._conn.executemany("INSERT INTO pages VALUES (?, ?, ?)", [(key, n, text) for n, text in pages])
+            self._conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                [(key, i, c["page_number"], c["chunk_id"], c["chunk_text"]) for i, c in enumerate(chunks)]
+            )
+
+    def remove(self, path: str):
+        key = _key(path)
+        with self._lock, self._conn:
+            for table in ("documents", "pages", "chunks"):
+                self._conn.execute(f"DELETE FROM {table} WHERE path = ?", (key,))
+
+parsed_store = ParsedDocumentStore()
@@ -1,41 +1,289 @@
+import os
+import json
+import threading
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, VectorParams, Distance
+from qdrant_client.models import (
+    VectorParams, Distance, PointIdsList, FilterSelector, PayloadSchemaType, OptimizersConfigDiff,
+    Filter, FieldCondition, MatchAny, Range,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, SearchRequest, QuantizationSearchParams, HnswConfigDiff
+)
 import numpy as np
-from config import QDRANT_COLLECTION, QDRANT_PATH, EMBEDDING_DIMENSION
+from config import (
+    QDRANT_COLLECTION, QDRANT_PATH, EMBEDDING_DIMENSION, UPSERT_BATCH_SIZE,
+    VECTOR_QUANTIZATION, QUANTIZATION_RESCORE_CANDIDATES,
+    QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT, QDRANT_HNSW_EF, COMPACT_DELETED_RATIO
+)
+from vector_backend import VectorStore
 
-client = QdrantClient(path=QDRANT_PATH)  # Stores data locally (offline mode!)
+# Payload fields used in query filters; indexed so filtered search stays cheap.
+PAYLOAD_INDEXES = {
+    "filename": PayloadSchemaType.KEYWORD,
+    "page_number": PayloadSchemaType.INTEGER,
+}
 
-def create_collection():
+def build_filter(file_filters=None, page_range=None):
     """
-    Ensure the Qdrant collection exists.
+    Translate filename / page-range restrictions into a Qdrant payload filter.
+    `page_range` is an inclusive (first, last) tuple; either end may be None.
+    Returns None when there is nothing to filter on.
     """
-    existing = [c.name for c in client.get_collections().collections]
-    if QDRANT_COLLECTION not in existing:
-        client.create_collection(
-            collection_name=QDRANT_COLLECTION,
-            vectors_config=VectorParams(size=EMBEDDING_DIMENSION, distance=Distance.COSINE)
-        )
+    conditions = []
+    if file_filters:
+        conditions.append(FieldCondition(key="filename", match=MatchAny(any=list(file_filters))))
+    if page_range and any(p is not None for p in page_range):
+        first, last = page_range
+        conditions.append(FieldCondition(key="page_number", range=Range(gte=first, lte=last)))
+    return Filter(must=conditions) if conditions else None
 
-def add_documents(vectors, payloads):
+def quantization_config(quantization: str):
     """
-    Add vectors and payloads (metadata) to Qdrant collection.
+    Qdrant quantization for new collections: the int8 / binary copy is kept in
+    RAM for the first pass while the float32 originals stay on disk for rescoring.
     """
-    create_collection()
-    existing_count = client.count(QDRANT_COLLECTION).count or 0
-    points = [
-        PointStruct(id=existing_count + i, vector=np.array(v, dtype=np.float32), payload=p)
-        for i, (v, p) in enumerate(zip(vectors, payloads))
-    ]
-    client.upsert(collection_name=QDRANT_COLLECTION, points=points)
-
-def search(query_vector, top_k=3):
+    if quantization == "int8":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+class QdrantStore(VectorStore):
     """
-    Search for top_k most similar vectors and return their payloads.
+    Embedded (on-disk, offline) Qdrant collection. One instance is a
+    long-lived handle: the client is opened once, the collection is checked
+    once, and the id allocator lives in `<path>/<collection>.ids.json`.
     """
-    create_collection()
-    res = client.search(
-        collection_name=QDRANT_COLLECTION,
-        query_vector=np.array(query_vector, dtype=np.float32),
-        limit=top_k
-    )
-    return [hit.payload for hit in res]
+
+    def __init__(self, path: str = QDRANT_PATH, collection: str = QDRANT_COLLECTION,
+                 dimension: int = EMBEDDING_DIMENSION, quantization: str = VECTOR_QUANTIZATION,
+                 rescore_candidates: int = QUANTIZATION_RESCORE_CANDIDATES,
+                 hnsw_m: int = QDRANT_HNSW_M, hnsw_ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+                 hnsw_ef: int = QDRANT_HNSW_EF):
+        self.client = QdrantClient(path=path)  # Stores data locally (offline mode!)
+        self.path = path
+        self.collection = collection
+        self.dimension = dimension
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.hnsw_ef = hnsw_ef
+        self._payload_indexes_checked = False
+        self._ready = False
+        self._next_id = None
+        self._lock = threading.Lock()
+
+    def create_collection(self):
+        """
+        Ensure the Qdrant collection exists and its filter fields are indexed.
+        Only the first call talks to Qdrant; afterwards it is a flag check.
+        Quantization only applies to newly created collections (Qdrant server;
+        the embedded local mode accepts the config but always searches floats).
+        """
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                self._open_collection()
+                self._ready = True
+
+    def _open_collection(self):
+        existing = [c.name for c in self.client.get_collections().collections]
+        if self.collection not in existing:
+            quantized = self.quantization != "none"
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=self.dimension, distance=Distance.COSINE, on_disk=quantized),
+                quantization_config=quantization_config(self.quantization),
+                hnsw_config=HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+                if self.hnsw_m or self.hnsw_ef_construct else None,
+                # Segments are vacuumed by Qdrant's own optimizer past this share of deleted points.
+                optimizers_config=OptimizersConfigDiff(deleted_threshold=COMPACT_DELETED_RATIO)
+            )
+        self.ensure_payload_indexes()
+
+    def ensure_payload_indexes(self):
+        """
+        Create the payload indexes once per process (also upgrades collections
+        created before the indexes existed).
+        """
+        if self._payload_indexes_checked:
+            return
+        schema = self.client.get_collection(self.collection).payload_schema or {}
+        for field, field_type in PAYLOAD_INDEXES.items():
+            if field not in schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection,
+                    field_name=field,
+                    field_schema=field_type
+                )
+        self._payload_indexes_checked = True
+
+    # --- id allocation ---
+
+    def _allocator_path(self) -> str:
+        return os.path.join(self.path, f"{self.collection}.ids.json")
+
+    def _max_point_id(self) -> int:
+        """Highest stored id; only scanned once, for collections older than the allocator."""
+        highest, offset = -1, None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection, limit=1024, offset=offset,
+                with_payload=False, with_vectors=False
+            )
+            highest = max([highest] + [int(p.id) for p in points])
+            if offset is None:
+                return highest
+
+    def _load_next_id(self) -> int:
+        if self._next_id is None:
+            try:
+                with open(self._allocator_path(), "r", encoding="utf-8") as f:
+                    self._next_id = json.load(f)["next_id"]
+            except (OSError, ValueError, KeyError):
+                self._next_id = self._max_point_id() + 1
+        return self._next_id
+
+    def allocate_ids(self, n: int) -> range:
+        self.create_collection()
+        with self._lock:
+            start = self._load_next_id()
+            self._save_next_id(start + n)
+            return range(start, start + n)
+
+    def _save_next_id(self, next_id: int):
+        tmp_path = self._allocator_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"next_id": next_id}, f)
+        os.replace(tmp_path, self._allocator_path())
+        self._next_id = next_id
+
+    def add_documents(self, vectors, payloads, ids=None):
+        """
+        Add vectors and payloads (metadata) to Qdrant collection.
+        `vectors` may be a (n, dim) float32 matrix; it is uploaded as-is in
+        UPSERT_BATCH_SIZE requests.
+        With explicit `ids`, existing points with the same id are overwritten;
+        otherwise fresh ids come from the allocator.
+        """
+        self.create_collection()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if ids is None:
+            ids = self.allocate_ids(len(vectors))
+        else:
+            # Caller-chosen ids must never be handed out again by the allocator.
+            ids = list(ids)
+            with self._lock:
+                if ids and max(ids) >= self._load_next_id():
+                    self._save_next_id(max(ids) + 1)
+        self.client.upload_collection(
+            collection_name=self.collection,
+            vectors=vectors,
+            payload=payloads,
+            ids=list(ids),
+            batch_size=UPSERT_BATCH_SIZE
+        )
+
+    def delete_points(self, ids):
+        """
+        Delete points by id (used when a re-ingested file shrinks or moves id range).
+        """
+        self.create_collection()
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=PointIdsList(points=list(ids))
+        )
+
+    def delete_file(self, filename):
+        """
+        Delete all points of `filename` with one payload-filter delete, served
+        by the `filename` keyword index instead of a list of point ids.
+        """
+        self.create_collection()
+        selector = build_filter(file_filters=[filename])
+        n = self.client.count(self.collection, count_filter=selector, exact=True).count or 0
+        if n:
+            self.client.delete(
+                collection_name=self.collection,
+                points_selector=FilterSelector(filter=selector)
+            )
+        return n
+
+    def optimize(self, force=False):
+        """
+        Nothing to rewrite from here: Qdrant vacuums segments by itself once
+        COMPACT_DELETED_RATIO of a segment is deleted (set on new collections),
+        and the embedded local mode drops deleted points from storage directly.
+        """
+        return False
+
+    def search(self, query_vector, top_k=3, file_filters=None, page_range=None):
+        """
+        Search for top_k most similar vectors and return their payloads
+        (each with the similarity `score` and `point_id` added).
+        Filters are applied inside Qdrant, so up to top_k matching hits come back
+        however narrow the filter is.
+        """
+        self.create_collection()
+        res = self.client.search(
+            collection_name=self.collection,
+            query_vector=np.array(query_vector, dtype=np.float32),
+            query_filter=build_filter(file_filters, page_range),
+            search_params=self._search_params(top_k),
+            limit=top_k
+        )
+        return [dict(hit.payload, score=hit.score, point_id=hit.id) for hit in res]
+
+    def _search_params(self, top_k):
+        if self.quantization == "none" and not self.hnsw_ef:
+            return None
+        quantization = None
+        if self.quantization != "none":
+            # Quantized first pass, then rescore ~rescore_candidates hits with the originals.
+            quantization = QuantizationSearchParams(
+                rescore=True, oversampling=max(1.0, self.rescore_candidates / max(top_k, 1))
+            )
+        return SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+    def search_batch(self, query_vectors, top_k=3, file_filters=None, page_range=None):
+        """All queries in one search_batch request (one round trip, one filter build)."""
+        self.create_collection()
+        query_filter = build_filter(file_filters, page_range)
+        params = self._search_params(top_k)
+        responses = self.client.search_batch(
+            collection_name=self.collection,
+            requests=[
+                SearchRequest(vector=np.asarray(q, dtype=np.float32).tolist(), filter=query_filter,
+                              params=params, limit=top_k, with_payload=True)
+                for q in query_vectors
+            ]
+        )
+        return [[dict(hit.payload, score=hit.score, point_id=hit.id) for hit in res] for res in responses]
+
+    def iter_payloads(self, batch_size=256):
+        """
+        Yield (point_id, payload) for every stored point (used to backfill
+        side indexes for collections built before they existed).
+        """
+        self.create_collection()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for point in points:
+                yield point.id, point.payload
+            if offset is None:
+                break
+
+    def count(self):
+        self.create_collection()
+        return self.client.count(self.collection).count or 0
@@ -0,0 +1,97 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List
+
+from config import EMBEDDING_MODE, RERANK_MODEL_NAME, RERANK_TOP_N, RERANK_BUDGET_MS, RERANK_CACHE_SIZE, LOG_LATENCY
+from embedder import EMBED_DEVICE
+
+_cross_encoder = None
+_model_lock = threading.Lock()
+
+def get_cross_encoder():
+    """The process-wide cross-encoder, loaded on first use."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _model_lock:
+            if _cross_encoder is None and EMBEDDING_MODE == "stub":
+                from stub_models import StubCrossEncoder
+                _cross_encoder = StubCrossEncoder()
+            elif _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+                print(f"🔤 Loading reranker ({RERANK_MODEL_NAME})...")
+                _cross_encoder = CrossEncoder(RERANK_MODEL_NAME, device=EMBED_DEVICE)
+    return _cross_encoder
+
+# One scoring thread: a batch that overruns its budget keeps running and
+# still fills the cache, but the request that asked for it does not wait.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_cache: "OrderedDict[tuple, float]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_key(query: str, chunk: Dict) -> tuple:
+    # Keyed by the text, not the point id: re-ingesting a changed file reuses its ids.
+    q = " ".join(query.lower().split())
+    return (q, hashlib.sha1(chunk.get("chunk_text", "").encode("utf-8")).hexdigest())
+
+def _cache_put(keys: List[tuple], scores):
+    with _cache_lock:
+        for key, score in zip(keys, scores):
+            _cache[key] = float(score)
+            _cache.move_to_end(key)
+        while len(_cache) > RERANK_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _predict(model, pairs):
+    return model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+def rerank(query: str, chunks: List[Dict], top_n: int = RERANK_TOP_N,
+           budget_ms: float = RERANK_BUDGET_MS) -> List[Dict]:
+    """
+    Score (query, chunk) pairs with the cross-encoder in one batch and return
+    the best `top_n` chunks, each with `rerank_score` set and `score` replaced
+    by it (the retrieval score is kept as `retrieval_score`).
+    If scoring does not finish within `budget_ms`, the chunks are returned in
+    their original (retrieval) order instead. Loading the model is not part of
+    the budget (startup warm-up normally has it loaded already).
+    """
+    if not chunks:
+        return []
+    try:
+        model = get_cross_encoder()
+    except Exception as e:
+        print(f"⚠️ Reranker unavailable ({e}); keeping retrieval order.")
+        return chunks[:top_n]
+    t0 = time.perf_counter()
+    keys = [_cache_key(query, c) for c in chunks]
+    with _cache_lock:
+        scores = [_cache.get(k) for k in keys]
+    missing = [i for i, s in enumerate(scores) if s is None]
+
+    if missing:
+        pairs = [(query, chunks[i].get("chunk_text", "")) for i in missing]
+        missing_keys = [keys[i] for i in missing]
+        future = _executor.submit(_predict, model, pairs)
+        future.add_done_callback(lambda f: f.exception() is None and _cache_put(missing_keys, f.result()))
+        try:
+            fresh = future.result(timeout=max(budget_ms / 1000.0 - (time.perf_counter() - t0), 0.0))
+        except FutureTimeout:
+            print(f"⚠️ Rerank exceeded {budget_ms:.0f} ms budget; keeping retrieval order.")
+            return chunks[:top_n]
+        except Exception as e:
+            print(f"⚠️ Rerank failed ({e}); keeping retrieval order.")
+            return chunks[:top_n]
+        for i, score in zip(missing, fresh):
+            scores[i] = float(score)
+
+    ranked = sorted(zip(scores, range(len(chunks))), key=lambda x: x[0], reverse=True)[:top_n]
+    if LOG_LATENCY:
+        cached = len(chunks) - len(missing)
+        print(f"⏱️ Rerank: {len(chunks)} candidates ({cached} cached) in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    return [
+        dict(chunks[i], retrieval_score=chunks[i].get("score"), rerank_score=score, score=score)
+        for score, i in ranked
+    ]
@@ -1,55 +1,132 @@
-from typing import List, Dict, Optional
-from qdrant_helper import search
-from config import TOP_K
+from typing import List, Dict, Optional, Tuple
+from vector_backend import search, search_batch
+from lexical_index import lexical_index
+from metadata_store import metadata_store
+from config import TOP_K, RETRIEVAL_MODE, HYBRID_CANDIDATES, RRF_K
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """
+    Fuse several best-first hit lists (keyed by point_id) with RRF:
+    score = sum over lists of 1 / (k + rank). Returns payloads best first,
+    each with the fused `score`.
+    """
+    fused, payloads = {}, {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = hit.get("point_id", (hit.get("filename"), hit.get("chunk_id")))
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            payloads.setdefault(key, hit)
+    order = sorted(fused, key=fused.get, reverse=True)
+    return [dict(payloads[key], score=fused[key]) for key in order]
+
+def _to_chunks(results: List[Dict]) -> List[Dict]:
+    """Normalize hits into chunk dicts, reading chunk text for hits whose payload has none."""
+    # Point payloads carry no chunk text; read it for the returned hits only.
+    results = metadata_store.hydrate([dict(r) for r in results if isinstance(r, dict)])
+    chunks = []
+    for payload in results:
+        chunk_text = payload.get("chunk_text", "")
+        if not chunk_text.strip():
+            continue   # Skip empty chunks
+        chunks.append({
+            "chunk_id": payload.get("chunk_id", ""),
+            "filename": payload.get("filename", ""),
+            "page_number": payload.get("page_number", ""),
+            "chunk_text": chunk_text,
+            "score": payload.get("score", 0.0),
+            "point_id": payload.get("point_id")
+        })
+
+    # Uncomment for debugging
+    # for i, c in enumerate(chunks):
+    #     print(f"Top {i+1}: File: {c['filename']} | Page: {c['page_number']} | {c['chunk_text'][:100]}...")
+    return chunks
 
 def retrieve_top_k_chunks(
     query_vector: List[float],
     top_k: int = TOP_K,
-    file_filters: Optional[List[str]] = None
+    file_filters: Optional[List[str]] = None,
+    page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    query_text: Optional[str] = None,
+    mode: str = RETRIEVAL_MODE,
+    store=None,
+    lexical=None
 ) -> List[Dict]:
     """
-    Retrieve the top_k most relevant document chunks from Qdrant based on the query vector.
+    Retrieve the top_k most relevant document chunks from the vector store based on the query vector.
+    In "hybrid" mode (with `query_text`), dense and BM25 candidates are fused
+    with reciprocal rank fusion, so exact terms are found even when the
+    embedding misses them.
 
     Args:
         query_vector (List[float]): Embedding vector for the user query.
         top_k (int, optional): Number of top results to return.
         file_filters (List[str], optional): If set, limits results to these filenames.
+        page_range (Tuple[int, int], optional): Inclusive (first, last) page bounds; either may be None.
+        query_text (str, optional): Raw question text, needed for the lexical half of hybrid mode.
+        mode (str, optional): "dense" or "hybrid".
+        store, lexical (optional): Vector store / LexicalIndex to search instead of the
+            configured ones (used by the evaluation harness).
 
     Returns:
-        List[Dict]: Each dict contains chunk_id, filename, page_number, chunk_text.
+        List[Dict]: Each dict contains chunk_id, filename, page_number, chunk_text, score.
     """
-    print("🔍 Searching Qdrant for most relevant chunks...")
+    dense_search = store.search if store is not None else search
+    lexical = lexical if lexical is not None else lexical_index
+    hybrid = mode == "hybrid" and bool(query_text)
+    print(f"🔍 Searching vectors{' + BM25' if hybrid else ''} for most relevant chunks...")
 
     try:
-        results = search(query_vector, top_k)
+        if hybrid:
+            n_candidates = max(top_k, HYBRID_CANDIDATES)
+            dense = dense_search(query_vector, n_candidates, file_filters=file_filters, page_range=page_range)
+            try:
+                lexical_hits = lexical.search(query_text, n_candidates, file_filters=file_filters, page_range=page_range)
+            except Exception as e:
+                print(f"⚠️ Lexical search failed, using dense results only: {e}")
+                lexical_hits = []
+            results = reciprocal_rank_fusion([dense, lexical_hits])[:top_k]
+        else:
+            results = dense_search(query_vector, top_k, file_filters=file_filters, page_range=page_range)
         if not results:
-            print("⚠️ No results found in Qdrant collection.")
+            print("⚠️ No results found in the vector store.")
             return []
-
-        chunks = []
-        for payload in results:
-            if not isinstance(payload, dict):
-                continue
-            chunk_text = payload.get("chunk_text", "")
-            filename = payload.get("filename", "")
-            if file_filters is not None and filename not in file_filters:
-                continue  # Skip if not in allowed files
-            if not chunk_text.strip():
-                continue   # Skip empty chunks
-            chunks.append({
-                "chunk_id": payload.get("chunk_id", ""),
-                "filename": filename,
-                "page_number": payload.get("page_number", ""),
-                "chunk_text": chunk_text
-            })
-
-        # Uncomment for debugging
-        # for i, c in enumerate(chunks):
-        #     print(f"Top {i+1}: File: {c['filename']} | Page: {c['page_number']} | {c['chunk_text'][:100]}...")
-
-        return chunks
+        return _to_chunks(results)
 
     except Exception as e:
-        print(f"❌ Qdrant search failed: {e}")
+        print(f"❌ Vector search failed: {e}")
         return []
 
+def retrieve_top_k_chunks_batch(
+    query_vectors,
+    top_k: int = TOP_K,
+    file_filters: Optional[List[str]] = None,
+    page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    query_texts: Optional[List[str]] = None,
+    mode: str = RETRIEVAL_MODE
+) -> List[List[Dict]]:
+    """
+    retrieve_top_k_chunks for many queries at once: the dense half is one
+    search_batch call (a single matrix product on the flat index, one request
+    on Qdrant); BM25 still runs per query. Returns one chunk list per query
+    (empty on failure).
+    """
+    hybrid = mode == "hybrid" and bool(query_texts)
+    n_candidates = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+    try:
+        dense = search_batch(query_vectors, n_candidates, file_filters=file_filters, page_range=page_range)
+    except Exception as e:
+        print(f"❌ Vector search failed: {e}")
+        return [[] for _ in query_vectors]
+    results = []
+    for i, hits in enumerate(dense):
+        if hybrid:
+            try:
+                lexical_hits = lexical_index.search(query_texts[i], n_candidates,
+                                                    file_filters=file_filters, page_range=page_range)
+            except Exception as e:
+                print(f"⚠️ Lexical search failed, using dense results only: {e}")
+                lexical_hits = []
+            hits = reciprocal_rank_fusion([hits, lexical_hits])[:top_k]
+        results.append(_to_chunks(hits) if hits else [])
+    return results
@@ -0,0 +1,241 @@
+"""
+Local HTTP service: one process keeps the vector store, embedder, reranker
+and LLM resident, and any number of front-ends (app.py with SERVER_URL set,
+scripts, curl) share it.
+
+    python server.py [--host 127.0.0.1] [--port 8765] [--no-warm-up]
+
+    GET  /health       {"status": "ok", "startup": {...}}
+    GET  /metrics      Prometheus text: stage latencies + query micro-batching counters
+    GET  /cache        answer-cache counters and size
+    POST /cache/clear  empty the answer cache
+    POST /retrieve     {"question", "top_k"?, "file_filters"?, "page_range"?} -> {"chunks": [...], "timings": {...}}
+    POST /answer       {"question", "file_filters"?, "page_range"?, "stream"?}
+                       -> answer_question() result, or with "stream": true an NDJSON
+                          stream of {"token": ...} events ending with {"result": {...}}
+    POST /ingest       {} -> ingest_folder(DOCS_DIR) summary
+    POST /delete       {"filenames"} -> delete_documents(DOCS_DIR, filenames) summary
+
+Concurrent requests run on their own threads; their query embeddings are
+coalesced into shared encode calls (QUERY_BATCH_MAX / QUERY_BATCH_WAIT_MS),
+and generation goes through the usual LLM scheduler. Ingest and delete
+requests are serialized and only ever touch DOCS_DIR. POST bodies must be
+sent as application/json, so a browser cannot forge one from another site
+without a CORS preflight (which this server never approves).
+"""
+import startup  # first, so startup timings start at process start
+import os
+import json
+import argparse
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+from embedder import embed_query, enable_query_batching
+from retriever import retrieve_top_k_chunks
+from answer_question import answer_question, answer_question_stream
+from answer_cache import answer_cache
+from ingestion import ingest_folder, delete_documents, is_document_name
+from config import (
+    SERVER_HOST, SERVER_PORT, QUERY_BATCH_MAX, QUERY_BATCH_WAIT_MS, TOP_K, WARMUP_ON_START, DOCS_DIR
+)
+
+_write_lock = threading.Lock()  # one ingest/delete at a time
+_batcher = None
+
+class BadRequest(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+def _page_range(value):
+    if not value:
+        return None
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(p is None or (isinstance(p, int) and not isinstance(p, bool)) for p in value)):
+        raise BadRequest('"page_range" must be [first, last] with integer or null pages')
+    first, last = value
+    return (first or None, last or None)
+
+def _file_filters(value):
+    if not value:
+        return None
+    if not isinstance(value, list) or not all(isinstance(f, str) for f in value):
+        raise BadRequest('"file_filters" must be a list of file names')
+    return value
+
+def _top_k(value):
+    if value is None:
+        return TOP_K
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise BadRequest('"top_k" must be a positive integer')
+    return value
+
+def metrics_text() -> str:
+    lines = [tracing.prometheus_text().rstrip("\n")]
+    if _batcher is not None:
+        lines += [
+            "# HELP rag_query_embed_batches_total Encode calls made for query embeddings.",
+            "# TYPE rag_query_embed_batches_total counter",
+            f"rag_query_embed_batches_total {_batcher.stats['batches']}",
+            "# HELP rag_query_embed_queries_total Query embeddings computed.",
+            "# TYPE rag_query_embed_queries_total counter",
+            f"rag_query_embed_queries_total {_batcher.stats['queries']}",
+        ]
+    return "\n".join(lines) + "\n"
+
+def cache_info() -> dict:
+    return dict(answer_cache.stats, entries=len(answer_cache))
+
+def retrieve(body: dict) -> dict:
+    question = body["question"]
+    top_k, file_filters, page_range = (
+        _top_k(body.get("top_k")), _file_filters(body.get("file_filters")), _page_range(body.get("page_range"))
+    )
+    trace = tracing.start_trace("retrieve", query=question)
+    with trace.span("embed"):
+        query_vector = embed_query(question)
+    with trace.span("search"):
+        chunks = retrieve_top_k_chunks(
+            query_vector, top_k=top_k, query_text=question, file_filters=file_filters, page_range=page_range
+        )
+    trace.finish(outcome="retrieved" if chunks else "empty", hits=len(chunks))
+    return {"chunks": chunks, "timings": dict(trace.stages)}
+
+def delete(body: dict) -> dict:
+    filenames = body.get("filenames") or []
+    if not isinstance(filenames, list):
+        raise BadRequest('"filenames" must be a list')
+    bad = [f for f in filenames if not is_document_name(f)]
+    if bad:
+        raise BadRequest(f"not plain .pdf/.docx file names: {bad}")
+    with _write_lock:
+        return delete_documents(DOCS_DIR, filenames)
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "RAGServer/1.0"
+
+    def log_message(self, fmt, *args):
+        print(f"🌐 {self.address_string()} {fmt % args}")
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _check_origin(self):
+        """Browsers send Origin on cross-site requests; only our own origin (or none) is accepted."""
+        origin = self.headers.get("Origin")
+        if origin and urlsplit(origin).netloc != self.headers.get("Host"):
+            raise BadRequest(f"cross-origin request from {origin} refused", 403)
+
+    def _body(self) -> dict:
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise BadRequest("request body must be application/json", 415)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise BadRequest("body must be a JSON object")
+        return body
+
+    def _question_body(self) -> dict:
+        body = self._body()
+        if not isinstance(body.get("question"), str) or not body["question"].strip():
+            raise BadRequest('"question" is required')
+        return body
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "startup": startup.metrics()})
+        elif self.path == "/metrics":
+            self._send(200, metrics_text(), "text/plain; version=0.0.4")
+        elif self.path == "/cache":
+            self._send(200, cache_info())
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            self._check_origin()
+            if self.path == "/retrieve":
+                self._send(200, retrieve(self._question_body()))
+            elif self.path == "/answer":
+                body = self._question_body()
+                file_filters, page_range = _file_filters(body.get("file_filters")), _page_range(body.get("page_range"))
+                if body.get("stream"):
+                    self._stream_answer(body["question"], file_filters, page_range)
+                else:
+                    self._send(200, answer_question(body["question"], file_filters=file_filters,
+                                                    page_range=page_range))
+            elif self.path == "/ingest":
+                self._body()
+                with _write_lock:
+                    self._send(200, ingest_folder(DOCS_DIR))
+            elif self.path == "/delete":
+                self._send(200, delete(self._body()))
+            elif self.path == "/cache/clear":
+                self._body()
+                answer_cache.clear()
+                self._send(200, cache_info())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+        except BadRequest as e:
+            self._send(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
+        except Exception as e:
+            print(f"❌ {self.path} failed: {e}")
+            self._send(500, {"error": str(e)})
+
+    def _stream_answer(self, question: str, file_filters, page_range):
+        """NDJSON events, flushed as tokens arrive; the connection closes after the result."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        events = answer_question_stream(question, file_filters=file_filters, page_range=page_range)
+        try:
+            for event in events:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:  # headers are already sent: report the failure in-stream
+            print(f"❌ Streaming answer failed: {e}")
+            self.wfile.write((json.dumps({"result": {"answer": "Failed to generate an answer.", "source": None,
+                                                     "error": str(e)}}) + "\n").encode("utf-8"))
+        finally:
+            events.close()  # stop generating if the client disconnected
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, warm_up: bool = WARMUP_ON_START):
+    global _batcher
+    _batcher = enable_query_batching(QUERY_BATCH_MAX, QUERY_BATCH_WAIT_MS)
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    if warm_up:
+        startup.start_warm_up()
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    startup.mark("server listening")
+    print(f"🌐 Serving on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--no-warm-up", action="store_true", help="Load models on first request instead")
+    args = parser.parse_args()
+    serve(args.host, args.port, warm_up=WARMUP_ON_START and not args.no_warm_up)
@@ -0,0 +1,67 @@
+import time
+import threading
+from typing import Dict, Optional
+
+from config import LOG_LATENCY
+
+# Import this module first in an entry point so PROCESS_START is close to
+# interpreter start; everything else is measured relative to it.
+PROCESS_START = time.perf_counter()
+
+marks: Dict[str, float] = {}
+_first_answer: Optional[float] = None
+_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+
+def mark(name: str) -> float:
+    """Record (once) and print seconds since process start for a startup milestone."""
+    with _lock:
+        if name not in marks:
+            marks[name] = time.perf_counter() - PROCESS_START
+            print(f"⏱️ Startup: {name} after {marks[name]:.2f} sec")
+        return marks[name]
+
+def record_first_answer() -> Optional[float]:
+    """Cold start -> first answer, recorded the first time an answer is produced."""
+    global _first_answer
+    with _lock:
+        if _first_answer is not None:
+            return None
+        _first_answer = time.perf_counter() - PROCESS_START
+    if LOG_LATENCY:
+        print(f"⏱️ Cold start to first answer: {_first_answer:.2f} sec")
+    return _first_answer
+
+def metrics() -> Dict:
+    return dict(marks, first_answer=_first_answer)
+
+def _warm_up(include_llm: bool):
+    # Imported here so an entry point that never warms up never imports the models.
+    from vector_backend import get_store
+    from embedder import get_embedder
+    from config import RERANK_ENABLED
+    try:
+        get_store().create_collection()
+        get_embedder()
+        if RERANK_ENABLED:
+            from reranker import get_cross_encoder
+            get_cross_encoder()
+        if include_llm:
+            from llama_cpp_interface import get_tokenizer, get_scheduler
+            get_tokenizer()
+            get_scheduler()
+        mark("warm-up finished")
+    except Exception as e:
+        print(f"⚠️ Background warm-up failed (models will load on first use): {e}")
+
+def start_warm_up(include_llm: bool = True) -> threading.Thread:
+    """
+    Load the vector store and models in a daemon thread so the first question
+    does not pay for them. Safe to call repeatedly; only one warm-up ever runs.
+    """
+    global _warmup_thread
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, args=(include_llm,), name="warm-up", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
@@ -0,0 +1,135 @@
+"""
+Deterministic stand-ins for the embedding model, the cross-encoder and the
+llama.cpp model, selected with EMBEDDING_MODE = "stub" / LLM_MODE = "stub".
+They need no model files and always give the same output for the same input,
+which is what benchmarks and offline smoke runs want; answer quality is not
+the point.
+"""
+import re
+import time
+import zlib
+import threading
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+class StubEmbedder:
+    """
+    Hashed bag of words (plus word bigrams), L2-normalized. Texts that share
+    words get similar vectors, so retrieval over a stub index still behaves
+    like retrieval.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dimension, dtype=np.float32)
+        words = _words(text)
+        for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            v[h % self.dimension] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._embed(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([self._embed(t) for t in texts])
+
+class StubCrossEncoder:
+    """Scores (query, passage) pairs by the fraction of query words found in the passage."""
+
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        scores = []
+        for query, passage in pairs:
+            q = set(_words(query))
+            scores.append(len(q & set(_words(passage))) / len(q) if q else 0.0)
+        return np.asarray(scores, dtype=np.float32)
+
+class StubLlama:
+    """
+    The subset of llama_cpp.Llama this repo uses. Tokens are words and
+    punctuation marks; the "answer" is the content sentence sharing the most
+    words with the question. `token_delay` adds a fixed cost per generated
+    token for latency-shaped benchmarks.
+    """
+
+    # Shared by every instance so the tokenizer and the workers agree on ids.
+    _vocab: Dict[str, int] = {}
+    _inverse: List[str] = []
+    _vocab_lock = threading.Lock()
+
+    def __init__(self, model_path: str = "", n_ctx: int = 1024, token_delay: float = 0.0, **kwargs):
+        self.n_ctx = n_ctx
+        self.token_delay = token_delay
+        self.input_ids: List[int] = []
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.input_ids)
+
+    def _token_id(self, token: str) -> int:
+        with self._vocab_lock:
+            if token not in self._vocab:
+                self._vocab[token] = len(self._inverse) + 2  # 0/1 reserved, 1 = BOS
+                self._inverse.append(token)
+            return self._vocab[token]
+
+    def tokenize(self, text: bytes, add_bos: bool = True) -> List[int]:
+        ids = [self._token_id(t) for t in _WORD.findall(text.decode("utf-8", errors="ignore"))]
+        return [1] + ids if add_bos else ids
+
+    def detokenize(self, tokens: List[int]) -> bytes:
+        return " ".join(self._inverse[t - 2] for t in tokens if t >= 2).encode("utf-8")
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens: List[int]):
+        self.input_ids = list(self.input_ids) + list(tokens)
+
+    def save_state(self):
+        return list(self.input_ids)
+
+    def load_state(self, state):
+        self.input_ids = list(state)
+
+    def _answer(self, prompt: str) -> str:
+        content = prompt.split("Content:", 1)[-1]
+        content, _, question = content.rpartition("User Question:")
+        question = question.split("Answer:", 1)[0]
+        q = set(_words(question))
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", content) if s.strip()]
+        if not q or not sentences:
+            return "The answer is not available in the provided documents."
+        best = max(sentences, key=lambda s: len(q & set(_words(s))))
+        if not q & set(_words(best)):
+            return "The answer is not available in the provided documents."
+        return " " + best
+
+    def __call__(self, prompt: str, max_tokens: int = 16, stop=None, stream: bool = False,
+                 **kwargs) -> Union[Dict, Iterator[Dict]]:
+        self.input_ids = self.tokenize(prompt.encode("utf-8"), add_bos=True)
+        pieces = re.findall(r"\s*\S+", self._answer(prompt))[:max_tokens]
+
+        def parts():
+            for piece in pieces:
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+                yield {"choices": [{"text": piece}]}
+
+        if stream:
+            return parts()
+        return {"choices": [{"text": "".join(p["choices"][0]["text"] for p in parts())}]}
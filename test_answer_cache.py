@@ -0,0 +1,75 @@
+import numpy as np
+
+from answer_cache import AnswerCache, make_scope, normalize_query
+
+SCOPE = make_scope(1)
+
+def make(tmp_path, **options):
+    options.setdefault("similarity", 0.95)
+    return AnswerCache(path=str(tmp_path / "answers.jsonl"), **options)
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+def result(answer):
+    return {"answer": answer, "source": {"filename": "a.pdf"}}
+
+def test_normalize_and_scope():
+    assert normalize_query("  What IS   this?? ") == "what is this"
+    assert make_scope(3, ["b.pdf", "a.pdf"], (2, None)) == "v3|a.pdf,b.pdf|2-"
+    assert make_scope(3) == "v3|*|*"
+
+def test_exact_and_semantic_hits(tmp_path):
+    cache = make(tmp_path)
+    cache.store("What is X?", vector(1, 0, 0), SCOPE, result("x"))
+    assert cache.lookup("what is x", vector(0, 1, 0), SCOPE)["cached"] == "exact_hits"
+    near = cache.lookup("tell me about X", vector(1, 0.1, 0), SCOPE)
+    assert near["cached"] == "semantic_hits" and near["answer"] == "x"
+    assert cache.lookup("something else", vector(0, 1, 0), SCOPE) is None
+    assert cache.stats == {"exact_hits": 1, "semantic_hits": 1, "misses": 1}
+
+def test_lookup_and_store_leave_the_query_vector_alone(tmp_path):
+    cache = make(tmp_path)
+    query = vector(3, 4, 0)
+    cache.store("q", query, SCOPE, result("a"))
+    cache.lookup("other", query, SCOPE)
+    np.testing.assert_array_equal(query, vector(3, 4, 0))
+
+def test_answers_are_scoped_to_filters_and_corpus_version(tmp_path):
+    cache = make(tmp_path)
+    cache.store("q", vector(1, 0), make_scope(1, ["a.pdf"]), result("a"))
+    assert cache.lookup("q", vector(1, 0), make_scope(1, ["b.pdf"])) is None
+    assert cache.lookup("q", vector(1, 0), make_scope(2, ["a.pdf"])) is None
+    cache.purge_other_versions(2)
+    assert len(cache) == 0
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache = make(tmp_path, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: now[0])
+    cache.store("q", vector(1, 0), SCOPE, result("a"))
+    now[0] += 59
+    assert cache.lookup("q", vector(1, 0), SCOPE) is not None
+    now[0] += 2
+    assert cache.lookup("q", vector(1, 0), SCOPE) is None
+    assert len(cache) == 0
+
+def test_lru_eviction_survives_a_reload(tmp_path):
+    cache = make(tmp_path, max_entries=2)
+    cache.store("a", vector(1, 0, 0), SCOPE, result("a"))
+    cache.store("b", vector(0, 1, 0), SCOPE, result("b"))
+    cache.lookup("a", None, SCOPE)                      # a is now more recent than b
+    cache.store("c", vector(0, 0, 1), SCOPE, result("c"))
+    reloaded = make(tmp_path, max_entries=2)
+    assert reloaded.lookup("b", None, SCOPE) is None
+    assert reloaded.lookup("a", None, SCOPE)["answer"] == "a"
+    assert reloaded.lookup("c", None, SCOPE)["answer"] == "c"
+
+def test_log_is_compacted_and_clear_persists(tmp_path):
+    cache = make(tmp_path, max_entries=2)
+    for _ in range(10):
+        cache.store("a", vector(1, 0), SCOPE, result("a"))
+    with open(cache.path) as f:
+        assert sum(1 for _ in f) <= 2 * cache.max_entries
+    cache.clear()
+    assert len(make(tmp_path)) == 0
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import answer_question
+import vector_backend
+import embedder
+from answer_question import answer_questions
+from chunker import page_chunks
+from lexical_index import lexical_index
+from metadata_store import metadata_store
+
+@pytest.fixture(scope="module", autouse=True)
+def corpus():
+    chunks = []
+    for i in range(5):
+        chunks += page_chunks(f"qa{i}.pdf", 1, f"Document {i} explains topic{i} and widget number {i * 7}. " * 5)
+    ids = list(vector_backend.allocate_ids(len(chunks)))
+    payloads = embedder.chunk_payloads(chunks, ids)
+    vector_backend.add_documents(embedder.encode_texts([c["chunk_text"] for c in chunks]),
+                                 embedder.point_payloads(payloads), ids)
+    lexical_index.add(ids, payloads)
+    metadata_store.put(payloads)
+
+def test_results_keep_input_order_and_failures_keep_their_slot(monkeypatch):
+    def generate(selected_chunk, user_query, stats=None):
+        if "boom" in user_query:
+            raise RuntimeError("model crashed")
+        if "slow" in user_query:
+            time.sleep(0.2)  # finishes after the questions behind it
+        return f"answer to {user_query}"
+
+    real_encode = answer_question.encode_texts
+    def encode(texts):
+        if any("explode" in t for t in texts):
+            raise RuntimeError("encoder down")
+        return real_encode(texts)
+
+    monkeypatch.setattr(answer_question, "generate_answer", generate)
+    monkeypatch.setattr(answer_question, "encode_texts", encode)
+    questions = ["slow topic0", "topic1", "explode topic2", "topic3", "boom topic4", "topic0 widget"]
+    results = list(answer_questions(questions, batch_size=2, workers=3))
+
+    assert [r["answer"] for r in results] == [
+        "answer to slow topic0", "answer to topic1",
+        "Failed to retrieve relevant information.", "Failed to retrieve relevant information.",
+        "Failed to generate an answer.", "answer to topic0 widget",
+    ]
+    assert all(r["source"] for i, r in enumerate(results) if i not in (2, 3))
+    assert all("timings" in r for r in results)
@@ -0,0 +1,56 @@
+from context_packer import pack_chunks
+
+def count_words(text):
+    return len(text.split())
+
+def chunk(text, score, filename="a.pdf", page=1, chunk_id="1_0"):
+    return {"chunk_text": text, "score": score, "filename": filename, "page_number": page, "chunk_id": chunk_id}
+
+ALPHA = "alpha beta gamma delta epsilon zeta eta theta iota kappa"
+OMEGA = "one two three four five six seven eight nine ten"
+
+def test_packs_best_scoring_chunks_first_with_numbered_citations():
+    text, citations = pack_chunks([chunk(OMEGA, 0.2, chunk_id="b"), chunk(ALPHA, 0.9, chunk_id="a")],
+                                  count_words, budget=1000)
+    assert [c["chunk_id"] for c in citations] == ["a", "b"]
+    assert [c["ref"] for c in citations] == [1, 2]
+    assert text.index("[1]") < text.index(ALPHA) < text.index("[2]") < text.index(OMEGA)
+
+def test_drops_chunks_mostly_contained_in_a_packed_chunk():
+    overlapping = ALPHA + " lambda mu"  # sliding-window neighbour of ALPHA
+    _, citations = pack_chunks([chunk(ALPHA, 0.9, chunk_id="a"), chunk(overlapping, 0.8, chunk_id="b"),
+                                chunk(OMEGA, 0.1, chunk_id="c")], count_words, budget=1000)
+    assert [c["chunk_id"] for c in citations] == ["a", "c"]
+
+def test_respects_the_budget_and_skips_to_smaller_chunks():
+    big = " ".join(f"word{i}" for i in range(100))
+    text, citations = pack_chunks([chunk(ALPHA, 0.9, chunk_id="a"), chunk(big, 0.8, chunk_id="big"),
+                                   chunk(OMEGA, 0.1, chunk_id="c")], count_words, budget=40)
+    assert [c["chunk_id"] for c in citations] == ["a", "c"]
+    assert count_words(text) <= 40
+
+def test_truncates_the_best_chunk_when_nothing_fits():
+    big = " ".join(f"word{i}" for i in range(100))
+    truncate = lambda text, n: " ".join(text.split()[:n])
+    text, citations = pack_chunks([chunk(big, 0.9)], count_words, budget=20, truncate=truncate)
+    assert len(citations) == 1
+    assert count_words(text) <= 20
+
+def test_without_truncate_an_oversized_chunk_is_left_out():
+    big = " ".join(f"word{i}" for i in range(100))
+    assert pack_chunks([chunk(big, 0.9)], count_words, budget=20) == ("", [])
+
+def test_empty_chunks_are_ignored():
+    assert pack_chunks([chunk("   ", 1.0)], count_words, budget=100) == ("", [])
+
+def test_truncated_chunk_is_clamped_when_the_tokenizer_rounds_up():
+    big = " ".join(f"word{i}" for i in range(100))
+    truncate = lambda text, n: " ".join(text.split()[:n])
+    lumpy = lambda text: count_words(text) + (3 if "word" in text else 0)  # costs more once text joins the header
+    text, citations = pack_chunks([chunk(big, 0.9)], lumpy, budget=20, truncate=truncate)
+    assert len(citations) == 1
+    assert lumpy(text) <= 20
+
+def test_truncated_chunk_is_dropped_when_not_even_its_header_fits():
+    truncate = lambda text, n: " ".join(text.split()[:n])
+    assert pack_chunks([chunk(ALPHA, 0.9)], count_words, budget=3, truncate=truncate) == ("", [])
@@ -0,0 +1,55 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+
+def make(tmp_path, model_name="m", max_entries=10):
+    return EmbeddingCache(path=str(tmp_path / "cache"), model_name=model_name, dimension=DIM,
+                          max_entries=max_entries)
+
+def vec(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+def put(cache, ids):
+    cache.put_many([f"text {i}" for i in ids], np.stack([vec(i) for i in ids]))
+
+def cached(cache, ids):
+    return [i for i in ids if cache.get_many([f"text {i}"])[0] is not None]
+
+def test_hits_ignore_whitespace_and_count_stats(tmp_path):
+    cache = make(tmp_path)
+    put(cache, [1, 2])
+    hit, miss = cache.get_many(["  text   1 ", "text 3"])
+    np.testing.assert_array_equal(hit, vec(1))
+    assert miss is None
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+def test_duplicates_are_stored_once(tmp_path):
+    cache = make(tmp_path)
+    put(cache, [1, 1, 2])
+    put(cache, [2])
+    assert len(cache) == 2
+
+def test_persists_across_instances_and_resets_on_model_change(tmp_path):
+    put(make(tmp_path), [1, 2, 3])
+    assert cached(make(tmp_path), [1, 2, 3]) == [1, 2, 3]
+    assert len(make(tmp_path, model_name="other")) == 0
+
+def test_overflow_keeps_the_most_recently_used_rows(tmp_path):
+    cache = make(tmp_path)
+    put(cache, range(5))
+    cache.get_many(["text 0"])              # 0 is now more recent than 1-4
+    put(cache, range(5, 11))                # 11 rows > 10: compact to 8
+    assert len(cache) == 8
+    assert cached(cache, range(11)) == [0, 4, 5, 6, 7, 8, 9, 10]
+
+def test_recency_survives_compaction_and_reopen(tmp_path):
+    cache = make(tmp_path)
+    put(cache, range(11))                   # compacts to rows 3-10
+    put(cache, [11])                        # newest row after the compaction
+    cache.get_many(["text 3"])
+    put(cache, range(12, 14))               # 11 rows again: 4 and 5 are the oldest
+    assert cached(cache, [3, 4, 5, 11]) == [3, 11]
+    reopened = make(tmp_path)
+    assert cached(reopened, [3, 11, 13]) == [3, 11, 13]
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pytest
+
+from flat_index import FlatIndexStore
+
+DIM = 8
+
+def unit(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i % DIM] = 1.0
+    return v
+
+def payload(filename, page, i):
+    return {"filename": filename, "page_number": page, "chunk_id": f"{page}_{i}"}
+
+@pytest.fixture
+def store(tmp_path):
+    return make(tmp_path)
+
+def make(tmp_path, **options):
+    options.setdefault("dtype", "float32")
+    options.setdefault("quantization", "none")
+    return FlatIndexStore(path=str(tmp_path / "index"), dimension=DIM, **options)
+
+def fill(store):
+    """a.pdf: ids 0-3 on pages 1-4, b.pdf: ids 4-5 on pages 1-2; point i is the unit vector e_i."""
+    payloads = [payload("a.pdf", p, 0) for p in range(1, 5)] + [payload("b.pdf", p, 0) for p in range(1, 3)]
+    store.add_documents(np.stack([unit(i) for i in range(6)]), payloads, ids=list(range(6)))
+
+def test_search_returns_nearest_first_with_score_and_point_id(store):
+    fill(store)
+    hits = store.search(unit(2) + 0.1 * unit(3), top_k=2)
+    assert [h["point_id"] for h in hits] == [2, 3]
+    assert hits[0]["score"] > hits[1]["score"]
+    assert hits[0]["filename"] == "a.pdf" and hits[0]["page_number"] == 3
+
+def test_search_leaves_the_query_vector_alone(store):
+    fill(store)
+    query = 3 * unit(1)
+    store.search(query)
+    np.testing.assert_array_equal(query, 3 * unit(1))
+
+def test_filters_by_filename_and_page_range(store):
+    fill(store)
+    assert {h["point_id"] for h in store.search(unit(0), top_k=10, file_filters=["b.pdf"])} == {4, 5}
+    assert {h["point_id"] for h in store.search(unit(0), top_k=10, page_range=(2, 3))} == {1, 2, 5}
+    assert {h["point_id"] for h in store.search(unit(0), top_k=10, page_range=(None, 1))} == {0, 4}
+    assert store.search(unit(0), file_filters=["missing.pdf"]) == []
+
+def test_overwriting_an_id_supersedes_the_old_row(store):
+    fill(store)
+    store.add_documents(np.stack([unit(7)]), [payload("a.pdf", 1, 9)], ids=[0])
+    assert store.count() == 6
+    assert store.search(unit(7), top_k=1)[0]["point_id"] == 0
+    assert all(h["point_id"] != 0 for h in store.search(unit(0), top_k=6) if h["score"] > 0.5)
+
+def test_delete_file_tombstones_rows_until_optimize(store):
+    fill(store)
+    assert store.delete_file("b.pdf") == 2
+    assert store.delete_file("b.pdf") == 0
+    assert store.count() == 4
+    assert store.deleted_ratio() == pytest.approx(2 / 6)
+    assert all(h["filename"] == "a.pdf" for h in store.search(unit(4), top_k=10))
+
+    assert store.optimize(force=True)
+    assert store.deleted_ratio() == 0.0
+    assert not os.path.exists(store.path + ".old")
+    assert sorted(pid for pid, _ in store.iter_payloads()) == [0, 1, 2, 3]
+    assert store.search(unit(3), top_k=1)[0]["point_id"] == 3
+
+def test_optimize_waits_for_the_deleted_ratio(store):
+    fill(store)
+    store.delete_points([0])
+    assert not store.optimize()  # 1/6 is below COMPACT_DELETED_RATIO
+    store.delete_points([1])
+    assert store.optimize()
+    assert not store.optimize()  # nothing left to drop
+
+def test_compacted_index_reopens_and_never_reuses_ids(tmp_path):
+    store = make(tmp_path)
+    fill(store)
+    store.delete_file("a.pdf")
+    store.optimize(force=True)
+    reopened = make(tmp_path)
+    assert reopened.count() == 2
+    assert reopened.search(unit(5), top_k=1)[0]["point_id"] == 5
+    assert reopened.allocate_ids(2) == range(6, 8)
+
+def test_reopen_recovers_from_an_interrupted_swap(tmp_path):
+    store = make(tmp_path)
+    fill(store)
+    os.rename(store.path, store.path + ".old")  # crash between the two renames
+    assert make(tmp_path).count() == 6
+
+def test_search_batch_matches_search(store):
+    fill(store)
+    queries = np.stack([unit(1) + 0.2 * unit(4), unit(5)])
+    batched = store.search_batch(queries, top_k=3, file_filters=["a.pdf", "b.pdf"])
+    for q, hits in zip(queries, batched):
+        single = store.search(q, top_k=3, file_filters=["a.pdf", "b.pdf"])
+        assert [h["point_id"] for h in hits] == [h["point_id"] for h in single]
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_search_rescores_to_the_exact_top_hit(tmp_path, quantization):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, DIM)).astype(np.float32)
+    store = make(tmp_path, quantization=quantization, rescore_candidates=50)
+    store.add_documents(vectors, [payload("a.pdf", 1, i) for i in range(200)])
+    exact = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for i in (0, 57, 199):
+        assert store.search(vectors[i], top_k=1)[0]["point_id"] == int(np.argmax(exact @ exact[i]))
+
+def test_unknown_quantization_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make(tmp_path, quantization="pq")
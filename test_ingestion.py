@@ -0,0 +1,147 @@
+import os
+import functools
+
+import pytest
+
+import chunker
+import ingestion
+from ingestion import ingest_folder, delete_documents, load_manifest
+from lexical_index import lexical_index
+from metadata_store import metadata_store
+from parsed_store import parsed_store
+from vector_backend import count as store_count
+
+# Documents are plain-text files named .docx; only text extraction is faked,
+# chunking, embedding (stub model) and every store are the real ones.
+
+def sentences(n, tag):
+    return " ".join(f"{tag} sentence {i} talks about widgets and gadgets in plenty of words here." for i in range(n))
+
+@pytest.fixture(autouse=True)
+def plain_text_documents(monkeypatch):
+    def extract_pages(file_path, page_range=None, timings=None):
+        with open(file_path, encoding="utf-8") as f:
+            return [(0, f.read())]
+    monkeypatch.setattr(chunker, "extract_pages", extract_pages)
+    monkeypatch.setattr(ingestion, "iter_parsed_files", functools.partial(chunker.iter_parsed_files, workers=1))
+
+@pytest.fixture
+def folder(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    return docs
+
+@pytest.fixture
+def manifest(tmp_path):
+    return str(tmp_path / "manifest.json")
+
+def write(folder, name, text):
+    path = folder / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def entry(manifest, name):
+    return load_manifest(manifest)["files"][name]
+
+def id_range(e):
+    return list(range(e["first_id"], e["first_id"] + e["num_chunks"]))
+
+def test_unchanged_and_touched_files_are_skipped(folder, manifest):
+    path = write(folder, "a.docx", sentences(40, "a"))
+    first = ingest_folder(str(folder), manifest)
+    assert first["added"] == ["a.docx"] and first["chunks"] > 0
+    assert ingest_folder(str(folder), manifest)["skipped"] == ["a.docx"]
+    os.utime(path, (1, 1))  # touched, same content: hashed, not re-embedded
+    again = ingest_folder(str(folder), manifest)
+    assert again["skipped"] == ["a.docx"] and again["chunks"] == 0
+    assert entry(manifest, "a.docx")["mtime"] == 1
+
+def test_shrinking_file_reuses_its_id_range(folder, manifest):
+    write(folder, "a.docx", sentences(40, "a"))
+    ingest_folder(str(folder), manifest)
+    before = entry(manifest, "a.docx")
+    write(folder, "a.docx", sentences(15, "b"))
+    assert ingest_folder(str(folder), manifest)["updated"] == ["a.docx"]
+    after = entry(manifest, "a.docx")
+    assert after["first_id"] == before["first_id"] and after["num_chunks"] < before["num_chunks"]
+    assert metadata_store.ids_for_file("a.docx") == id_range(after)  # the tail is gone
+    assert all("b sentence" in r["chunk_text"] for r in metadata_store.get_many(id_range(after)).values())
+
+def test_growing_file_moves_to_a_new_range(folder, manifest):
+    write(folder, "a.docx", sentences(15, "a"))
+    ingest_folder(str(folder), manifest)
+    before = entry(manifest, "a.docx")
+    write(folder, "a.docx", sentences(40, "b"))
+    ingest_folder(str(folder), manifest)
+    after = entry(manifest, "a.docx")
+    assert after["num_chunks"] > before["num_chunks"]
+    assert after["first_id"] >= before["first_id"] + before["num_chunks"]
+    assert metadata_store.ids_for_file("a.docx") == id_range(after)
+
+def test_interrupted_run_resumes_with_unfinished_files(folder, manifest, monkeypatch):
+    write(folder, "a.docx", sentences(20, "a"))
+    write(folder, "b.docx", sentences(20, "b"))
+    monkeypatch.setattr(ingestion, "INGEST_BATCH_SIZE", 1)
+    real_add, calls = ingestion.add_documents, []
+    n_a = len(chunker.page_chunks("a.docx", 0, sentences(20, "a")))
+
+    def failing_add(vectors, payloads, ids=None):
+        calls.append(ids)
+        if len(calls) == n_a + 2:  # a.docx is checkpointed, b.docx is half done
+            raise KeyboardInterrupt
+        return real_add(vectors, payloads, ids=ids)
+
+    monkeypatch.setattr(ingestion, "add_documents", failing_add)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_folder(str(folder), manifest)
+    assert list(load_manifest(manifest)["files"]) == ["a.docx"]
+
+    monkeypatch.setattr(ingestion, "add_documents", real_add)
+    resumed = ingest_folder(str(folder), manifest)
+    assert resumed["skipped"] == ["a.docx"] and resumed["added"] == ["b.docx"]
+    # b.docx's half-written first attempt is gone, not left beside its new range.
+    assert metadata_store.ids_for_file("b.docx") == id_range(entry(manifest, "b.docx"))
+    assert store_count() == sum(e["num_chunks"] for e in load_manifest(manifest)["files"].values())
+
+def test_files_chunked_with_other_settings_are_reingested(folder, manifest, monkeypatch):
+    write(folder, "a.docx", sentences(20, "a"))
+    ingest_folder(str(folder), manifest)
+    monkeypatch.setattr(ingestion, "CHUNKING", [123, 4])
+    assert ingest_folder(str(folder), manifest)["updated"] == ["a.docx"]
+    assert entry(manifest, "a.docx")["chunking"] == [123, 4]
+
+def test_first_run_drops_unmanaged_points(folder, manifest):
+    write(folder, "a.docx", sentences(20, "a"))
+    ingest_folder(str(folder), str(folder / "other-manifest.json"))  # points the new manifest knows nothing of
+    ingest_folder(str(folder), manifest)
+    assert store_count() == entry(manifest, "a.docx")["num_chunks"]
+
+def test_unreadable_manifest_stops_ingest_without_touching_the_index(folder, manifest):
+    write(folder, "a.docx", sentences(20, "a"))
+    ingest_folder(str(folder), manifest)
+    points = store_count()
+    with open(manifest, "w") as f:
+        f.write("{ half a manifest")
+    with pytest.raises(ValueError):
+        ingest_folder(str(folder), manifest)
+    assert store_count() == points
+
+def test_delete_removes_points_records_and_file(folder, manifest):
+    write(folder, "a.docx", sentences(20, "a"))
+    write(folder, "b.docx", sentences(20, "b"))
+    ingest_folder(str(folder), manifest)
+    kept = entry(manifest, "b.docx")
+    summary = delete_documents(str(folder), ["a.docx"], manifest_path=manifest)
+    assert summary["deleted"] == ["a.docx"] and summary["points"] > 0
+    assert not (folder / "a.docx").exists()
+    assert list(load_manifest(manifest)["files"]) == ["b.docx"]
+    assert metadata_store.ids_for_file("a.docx") == []
+    assert not [h for h in lexical_index.search("a sentence widgets", top_k=50) if h["filename"] == "a.docx"]
+    assert parsed_store.summaries([str(folder / "a.docx")])[str(folder / "a.docx")] is None
+    assert metadata_store.ids_for_file("b.docx") == id_range(kept)
+
+def test_delete_refuses_names_outside_the_folder(folder, manifest, tmp_path):
+    outside = write(tmp_path, "outside.docx", "keep me")
+    summary = delete_documents(str(folder), ["../outside.docx", "notes.txt"], manifest_path=manifest)
+    assert summary["deleted"] == [] and set(summary["failed"]) == {"../outside.docx", "notes.txt"}
+    assert outside.exists()
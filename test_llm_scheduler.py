@@ -0,0 +1,76 @@
+import time
+import threading
+
+import pytest
+
+from llm_scheduler import LLMScheduler, SchedulerBusy, RequestTimeout
+
+def make(num_workers=1, max_queue=4, timeout=5.0):
+    return LLMScheduler(lambda n_threads: f"model-{n_threads}", num_workers=num_workers,
+                        total_threads=4, max_queue=max_queue, timeout=timeout)
+
+def blocking_job(release: threading.Event, started: threading.Event = None):
+    def job(model):
+        if started is not None:
+            started.set()
+        release.wait(5)
+        yield "done"
+    return job
+
+def test_streams_job_items_and_reports_queue_wait():
+    scheduler = make()
+    stats = {}
+    assert list(scheduler.stream(lambda model: iter([model, "b"]), stats=stats)) == ["model-4", "b"]
+    assert stats["queue_wait"] >= 0.0
+    scheduler.shutdown()
+
+def test_job_errors_reach_the_caller_and_are_counted():
+    scheduler = make()
+    def failing(model):
+        raise RuntimeError("boom")
+        yield
+    with pytest.raises(RuntimeError, match="boom"):
+        list(scheduler.stream(failing))
+    scheduler.shutdown()
+    assert scheduler.snapshot()["failed"] == 1
+
+def test_full_queue_rejects_immediately():
+    scheduler = make(max_queue=1)
+    release, started = threading.Event(), threading.Event()
+    running = scheduler.stream(blocking_job(release, started))
+    consumer = threading.Thread(target=lambda: list(running))
+    consumer.start()
+    started.wait(5)                                    # the only worker is busy
+    queued = scheduler.stream(blocking_job(release))
+    waiter = threading.Thread(target=lambda: list(queued))
+    waiter.start()                                     # fills the single queue slot
+    while scheduler.snapshot()["queue_depth"] < 1:
+        time.sleep(0.01)
+    with pytest.raises(SchedulerBusy):
+        next(scheduler.stream(lambda model: iter(["x"])))
+    release.set()
+    consumer.join(5)
+    waiter.join(5)
+    snapshot = scheduler.snapshot()
+    assert snapshot["rejected"] == 1 and snapshot["completed"] == 2
+    scheduler.shutdown()
+
+def test_request_times_out_while_waiting_for_a_busy_worker():
+    scheduler = make(timeout=0.2)
+    release, started = threading.Event(), threading.Event()
+    running = scheduler.stream(blocking_job(release, started), timeout=5)
+    consumer = threading.Thread(target=lambda: list(running))
+    consumer.start()
+    started.wait(5)
+    with pytest.raises(RequestTimeout):
+        list(scheduler.stream(lambda model: iter(["never"])))
+    release.set()
+    consumer.join(5)
+    assert scheduler.snapshot()["timed_out"] == 1
+    scheduler.shutdown()
+
+def test_workers_split_the_thread_budget():
+    scheduler = make(num_workers=2)
+    assert scheduler.snapshot()["workers"] == 2
+    assert next(scheduler.stream(lambda model: iter([model]))) == "model-2"
+    scheduler.shutdown()
@@ -0,0 +1,16 @@
+from main import read_questions
+
+def test_jsonl_records_without_a_question_are_skipped(tmp_path):
+    path = tmp_path / "q.jsonl"
+    path.write_text('{"question": "a", "id": 1}\n{"id": 2}\nnot json\n\n"bare"\n{"question": "  "}\n')
+    assert read_questions(str(path)) == [{"question": "a", "id": 1}, {"question": "bare"}]
+
+def test_csv_short_and_empty_rows_are_skipped(tmp_path):
+    path = tmp_path / "q.csv"
+    path.write_text("id,question,expected\n1,hi,x\n2\n3,,y\n")
+    assert read_questions(str(path)) == [{"id": "1", "question": "hi", "expected": "x"}]
+
+def test_csv_without_a_question_column_uses_the_first_column(tmp_path):
+    path = tmp_path / "q.csv"
+    path.write_text("prompt,id\nwhat is x,1\n")
+    assert read_questions(str(path)) == [{"prompt": "what is x", "id": "1", "question": "what is x"}]
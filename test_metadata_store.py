@@ -0,0 +1,45 @@
+import json
+
+import metadata_store as ms
+from metadata_store import MetadataStore
+
+def record(point_id, filename="a.pdf", text=None):
+    return {"id": point_id, "filename": filename, "page_number": 1, "chunk_id": f"1_{point_id}",
+            "chunk_text": text or f"text of {point_id}"}
+
+def make(tmp_path):
+    return MetadataStore(path=str(tmp_path / "meta.sqlite"))
+
+def test_hydrate_fills_only_missing_text(tmp_path):
+    store = make(tmp_path)
+    store.put([record(1), record(2)])
+    hits = [{"point_id": 1}, {"point_id": 2, "chunk_text": "kept"}, {"point_id": 3}, {"filename": "x"}]
+    assert store.hydrate(hits) is hits
+    assert [h.get("chunk_text") for h in hits] == ["text of 1", "kept", None, None]
+
+def test_put_replaces_and_deletes_by_file(tmp_path):
+    store = make(tmp_path)
+    store.put([record(1), record(2), record(3, filename="b.pdf")])
+    store.put([record(2, text="new")])
+    assert store.get_many([2])[2]["chunk_text"] == "new"
+    assert store.ids_for_file("a.pdf") == [1, 2]
+    assert store.delete_file("a.pdf") == 2
+    assert store.count() == 1
+
+def test_legacy_sidecar_is_imported_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open(ms.LEGACY_METADATA_FILE, "w") as f:
+        json.dump([record(1), record(2), dict(record(3), id="3f2b-uuid")], f)  # uuid ids match no point
+    store = make(tmp_path)
+    assert store.ids_for_file("a.pdf") == [1, 2]
+    store.delete_file("a.pdf")
+    assert make(tmp_path).count() == 0  # reopening does not import it again
+
+def test_legacy_sidecar_never_overwrites_newer_records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make(tmp_path).put([record(1, text="newer")])
+    with open(ms.LEGACY_METADATA_FILE, "w") as f:
+        json.dump([record(1, text="older"), record(2)], f)
+    store = make(tmp_path)
+    assert store.get_many([1, 2]) == {1: {"filename": "a.pdf", "page_number": 1, "chunk_id": "1_1",
+                                          "chunk_text": "newer"}}
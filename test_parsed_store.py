@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import chunker
+from parsed_store import parsed_store
+
+# Documents are plain-text files named .docx; only text extraction is faked.
+
+@pytest.fixture(autouse=True)
+def plain_text_documents(monkeypatch):
+    def extract_pages(file_path, page_range=None, timings=None):
+        with open(file_path, encoding="utf-8") as f:
+            return [(0, f.read())]
+    monkeypatch.setattr(chunker, "extract_pages", extract_pages)
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "a.docx"
+    path.write_text(" ".join(f"sentence {i} talks about widgets and gadgets in plenty of words here."
+                             for i in range(20)), encoding="utf-8")
+    return str(path)
+
+def parse(path):
+    return list(chunker.iter_parsed_files([path], workers=1))
+
+def test_parsed_files_are_served_from_the_store(path):
+    [(_, chunks, _, error)] = parse(path)
+    assert chunks and error is None
+    assert parsed_store.summaries([path])[path]["num_chunks"] == len(chunks)
+    [(_, cached, timings, _)] = parse(path)
+    assert cached == chunks and timings == {"parse": 0.0, "chunk": 0.0}
+
+def test_entries_go_stale_with_the_file_or_chunk_settings(path, monkeypatch):
+    parse(path)
+    os.utime(path, (1, 1))
+    assert parsed_store.summaries([path])[path] is None and parsed_store.get_chunks(path) is None
+    parse(path)
+    assert parsed_store.get_chunks(path)
+    monkeypatch.setattr("parsed_store._VERSION", "other")
+    assert parsed_store.summaries([path])[path] is None
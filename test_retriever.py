@@ -0,0 +1,28 @@
+import pytest
+
+from retriever import reciprocal_rank_fusion
+
+def hit(point_id, **extra):
+    return dict({"point_id": point_id, "filename": "a.pdf", "chunk_id": f"1_{point_id}"}, **extra)
+
+def test_rrf_rewards_hits_found_by_both_rankings():
+    dense = [hit(1), hit(2), hit(3)]
+    lexical = [hit(3), hit(4)]
+    fused = reciprocal_rank_fusion([dense, lexical], k=60)
+    assert [h["point_id"] for h in fused] == [3, 1, 2, 4]  # 2 and 4 tie at 1/62: first seen wins
+    assert fused[0]["score"] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[1]["score"] == pytest.approx(1 / 61)
+
+def test_rrf_keeps_the_first_payload_seen_for_a_point():
+    fused = reciprocal_rank_fusion([[hit(1, chunk_text="dense")], [hit(1, chunk_text="lexical")]])
+    assert len(fused) == 1
+    assert fused[0]["chunk_text"] == "dense"
+
+def test_rrf_falls_back_to_filename_and_chunk_id_without_point_ids():
+    a = {"filename": "a.pdf", "chunk_id": "1_0"}
+    b = {"filename": "b.pdf", "chunk_id": "1_0"}
+    fused = reciprocal_rank_fusion([[a, b], [b]])
+    assert [h["filename"] for h in fused] == ["b.pdf", "a.pdf"]
+
+def test_rrf_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([[], []]) == []
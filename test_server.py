@@ -0,0 +1,32 @@
+import pytest
+
+from ingestion import is_document_name
+from server import BadRequest, _file_filters, _page_range, _top_k
+
+def test_page_range_accepts_pairs_of_pages_or_nulls():
+    assert _page_range(None) is None
+    assert _page_range([2, None]) == (2, None)
+    assert _page_range([0, 5]) == (None, 5)
+
+@pytest.mark.parametrize("value", ["abc", [1], [1, 2, 3], ["1", 2], [1.5, 2], [True, 2], {"a": 1}])
+def test_malformed_page_range_is_a_bad_request(value):
+    with pytest.raises(BadRequest) as excinfo:
+        _page_range(value)
+    assert excinfo.value.status == 400
+
+def test_top_k_and_file_filters_are_validated():
+    assert _top_k(3) == 3
+    assert _file_filters(["a.pdf"]) == ["a.pdf"]
+    for bad in ("3", 0, -1, True):
+        with pytest.raises(BadRequest):
+            _top_k(bad)
+    with pytest.raises(BadRequest):
+        _file_filters("a.pdf")
+
+@pytest.mark.parametrize("name, ok", [
+    ("report.pdf", True), ("Notes.DOCX", True), ("../config.py", False), ("../a.pdf", False),
+    ("sub/a.pdf", False), ("sub\\a.pdf", False), ("/etc/a.pdf", False), ("a.txt", False),
+    ("..", False), ("", False), (None, False), ("a\0.pdf", False),
+])
+def test_document_names_must_be_plain_pdf_or_docx_basenames(name, ok):
+    assert is_document_name(name) is ok
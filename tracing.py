@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from config import (
+    LOG_LATENCY, LOG_DIR, SAVE_RESPONSES, RESPONSE_TIME_WARNING_THRESHOLD,
+    TRACE_ENABLED, TRACE_WINDOW, METRICS_WRITE_INTERVAL
+)
+
+TRACE_FILE = os.path.join(LOG_DIR, "traces.jsonl")
+METRICS_FILE = os.path.join(LOG_DIR, "metrics.prom")
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Rolling windows of recent stage durations, keyed by (trace kind, stage);
+# "total" is the whole trace. Lifetime count/sum feed the Prometheus summary.
+_windows: Dict[tuple, deque] = {}
+_lifetime: Dict[tuple, List[float]] = {}
+_lock = threading.Lock()
+# metrics.prom is rewritten by a background thread, not by the request that
+# finished a trace; see _metrics_changed().
+_metrics_dirty = threading.Event()
+_metrics_writer = None
+_metrics_writer_lock = threading.Lock()
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+class Trace:
+    """
+    Timings for one request (kind="answer") or one ingest run (kind="ingest").
+    Stages are timed with `span()` or added from measurements made elsewhere
+    with `add()`; repeated stages accumulate. Safe to use from several threads.
+    """
+
+    def __init__(self, kind: str, **attrs):
+        self.kind = kind
+        self.attrs = attrs
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + max(seconds, 0.0)
+
+    def finish(self, **attrs) -> Dict:
+        """Close the trace: update the rolling summaries and write the JSONL record."""
+        total = time.perf_counter() - self._start
+        attrs = dict(self.attrs, **attrs)
+        if not SAVE_RESPONSES:
+            attrs.pop("query", None)
+            attrs.pop("answer", None)
+        record = dict(attrs, ts=time.time(), kind=self.kind, total=total,
+                      stages={k: round(v, 4) for k, v in self.stages.items()})
+        if TRACE_ENABLED:
+            _record(self.kind, dict(self.stages, total=total))
+            _append_jsonl(record)
+            _metrics_changed()
+        slowest = max(self.stages.items(), key=lambda kv: kv[1], default=None)
+        if LOG_LATENCY and self.stages:
+            parts = " | ".join(f"{k} {v:.2f}s" for k, v in self.stages.items())
+            print(f"⏱️ {self.kind}: {total:.2f} sec total | {parts}")
+        if self.kind == "answer" and total > RESPONSE_TIME_WARNING_THRESHOLD and slowest:
+            print(f"⚠️ Slow answer: {total:.1f} sec (> {RESPONSE_TIME_WARNING_THRESHOLD} sec); "
+                  f"slowest stage: {slowest[0]} ({slowest[1]:.1f} sec)")
+        return record
+
+def start_trace(kind: str, **attrs) -> Trace:
+    return Trace(kind, **attrs)
+
+def _record(kind: str, stages: Dict[str, float]):
+    with _lock:
+        for stage, seconds in stages.items():
+            key = (kind, stage)
+            _windows.setdefault(key, deque(maxlen=TRACE_WINDOW)).append(seconds)
+            life = _lifetime.setdefault(key, [0, 0.0])
+            life[0] += 1
+            life[1] += seconds
+
+def _append_jsonl(record: Dict):
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        with _lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not write trace: {e}")
+
+def summary() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """{kind: {stage: {"p50", "p95", "p99", "count"}}} over the rolling window."""
+    out: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with _lock:
+        items = [(key, sorted(values)) for key, values in _windows.items()]
+    for (kind, stage), values in items:
+        stats = {f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES}
+        out.setdefault(kind, {})[stage] = dict(stats, count=len(values))
+    return out
+
+def prometheus_text() -> str:
+    """Prometheus text exposition of the rolling stage latencies."""
+    lines = [
+        "# HELP rag_stage_seconds Stage latency (quantiles over the last traces).",
+        "# TYPE rag_stage_seconds summary",
+    ]
+    with _lock:
+        items = [(key, sorted(values), list(_lifetime[key])) for key, values in _windows.items()]
+    for (kind, stage), values, (count, total) in sorted(items):
+        labels = f'kind="{kind}",stage="{stage}"'
+        for q in QUANTILES:
+            lines.append(f'rag_stage_seconds{{{labels},quantile="{q}"}} {percentile(values, q):.6f}')
+        lines.append(f"rag_stage_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"rag_stage_seconds_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path: str = METRICS_FILE):
+    """Rewrite the metrics file (for a node_exporter textfile collector or a quick look)."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"  # traces finish concurrently in server.py
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Could not write metrics: {e}")
+
+def _metrics_changed():
+    """Schedule a metrics.prom rewrite: at most one per METRICS_WRITE_INTERVAL, plus one at exit."""
+    global _metrics_writer
+    _metrics_dirty.set()
+    if _metrics_writer is None:
+        with _metrics_writer_lock:
+            if _metrics_writer is None:
+                _metrics_writer = threading.Thread(target=_write_metrics_loop, daemon=True, name="metrics-writer")
+                _metrics_writer.start()
+                atexit.register(flush_metrics)
+
+def _write_metrics_loop():
+    while True:
+        _metrics_dirty.wait()
+        time.sleep(METRICS_WRITE_INTERVAL)
+        flush_metrics()
+
+def flush_metrics():
+    """Write metrics.prom now if any trace finished since the last write."""
+    if _metrics_dirty.is_set():
+        _metrics_dirty.clear()
+        write_metrics()
+
+def summarize_file(path: str = TRACE_FILE, kinds: Optional[Iterable[str]] = None) -> Dict:
+    """Percentiles per stage over every record in a trace JSONL file."""
+    values: Dict[tuple, List[float]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if kinds and record.get("kind") not in kinds:
+                continue
+            for stage, seconds in dict(record.get("stages", {}), total=record.get("total", 0.0)).items():
+                values.setdefault((record.get("kind"), stage), []).append(seconds)
+    out: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for (kind, stage), vals in values.items():
+        vals.sort()
+        out.setdefault(kind, {})[stage] = dict(
+            {f"p{int(q * 100)}": percentile(vals, q) for q in QUANTILES}, count=len(vals)
+        )
+    return out
+
+if __name__ == "__main__":
+    # python tracing.py [traces.jsonl] -> where the time goes, per stage
+    report = summarize_file(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE)
+    for kind, stages in report.items():
+        print(f"\n{kind}:")
+        for stage, s in sorted(stages.items(), key=lambda kv: -kv[1]["p50"]):
+            print(f"  {stage:<14} p50 {s['p50']:7.3f}s  p95 {s['p95']:7.3f}s  p99 {s['p99']:7.3f}s  (n={s['count']})")
@@ -0,0 +1,127 @@
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import VECTOR_BACKEND
+
+class VectorStore:
+    """
+    Interface every vector backend implements. Vectors are cosine-compared
+    embeddings; payloads carry filename, page_number and chunk_id, and the
+    chunk text lives in the metadata store (older collections may still carry
+    it in the payload). Point ids are non-negative integers from the store's
+    own monotonic allocator (allocate_ids), persisted next to the collection,
+    so ids are never reused even after deletes.
+    """
+
+    def create_collection(self):
+        """
+        Ensure the underlying collection/index exists. Checked once per store;
+        later calls are free, so every method may call it.
+        """
+        raise NotImplementedError
+
+    def allocate_ids(self, n: int) -> range:
+        """Reserve `n` fresh point ids (durably, before they are used)."""
+        raise NotImplementedError
+
+    def add_documents(self, vectors, payloads: List[Dict], ids: Optional[List[int]] = None):
+        """
+        Insert or overwrite points. `vectors` is a (n, dim) float32 matrix.
+        Without `ids`, fresh ones come from allocate_ids().
+        """
+        raise NotImplementedError
+
+    def delete_points(self, ids: List[int]):
+        raise NotImplementedError
+
+    def delete_file(self, filename: str) -> int:
+        """Delete every point whose payload filename is `filename`; returns how many were removed."""
+        raise NotImplementedError
+
+    def optimize(self, force: bool = False) -> bool:
+        """
+        Reclaim the space held by deleted points once they make up at least
+        COMPACT_DELETED_RATIO of the index (always with `force`).
+        Returns True if anything was rewritten.
+        """
+        raise NotImplementedError
+
+    def search(self, query_vector, top_k: int = 3, file_filters: Optional[List[str]] = None,
+               page_range: Optional[Tuple[Optional[int], Optional[int]]] = None) -> List[Dict]:
+        """Top-k payloads, best first, each with `score` and `point_id` added."""
+        raise NotImplementedError
+
+    def search_batch(self, query_vectors, top_k: int = 3, file_filters: Optional[List[str]] = None,
+                     page_range: Optional[Tuple[Optional[int], Optional[int]]] = None) -> List[List[Dict]]:
+        """search() for every row of `query_vectors`, with one shared filter. Backends override this
+        with a bulk path; the default just loops."""
+        return [self.search(q, top_k, file_filters=file_filters, page_range=page_range) for q in query_vectors]
+
+    def iter_payloads(self, batch_size: int = 256) -> Iterator[Tuple[int, Dict]]:
+        """Yield (point_id, payload) for every stored point."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+def make_store(backend: str = VECTOR_BACKEND, **options) -> VectorStore:
+    """
+    Build a store for `backend` ("qdrant" or "flat"). `options` override the
+    backend's config defaults (e.g. path=..., collection=...), which is how
+    benchmarks build throwaway indexes.
+    """
+    if backend == "qdrant":
+        from qdrant_helper import QdrantStore
+        return QdrantStore(**options)
+    if backend == "flat":
+        from flat_index import FlatIndexStore
+        return FlatIndexStore(**options)
+    raise ValueError(f"Unknown vector backend: {backend!r} (expected 'qdrant' or 'flat')")
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> VectorStore:
+    """
+    The process-wide store for the configured VECTOR_BACKEND. Built once even
+    when the warm-up thread and request threads ask at the same time (a second
+    embedded Qdrant client would fail on the directory lock).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = make_store()
+    return _store
+
+# Module-level shortcuts on the configured store, used throughout the app.
+
+def create_collection():
+    return get_store().create_collection()
+
+def allocate_ids(n):
+    return get_store().allocate_ids(n)
+
+def add_documents(vectors, payloads, ids=None):
+    return get_store().add_documents(vectors, payloads, ids=ids)
+
+def delete_points(ids):
+    return get_store().delete_points(ids)
+
+def delete_file(filename):
+    return get_store().delete_file(filename)
+
+def optimize(force=False):
+    return get_store().optimize(force)
+
+def search(query_vector, top_k=3, file_filters=None, page_range=None):
+    return get_store().search(query_vector, top_k, file_filters=file_filters, page_range=page_range)
+
+def search_batch(query_vectors, top_k=3, file_filters=None, page_range=None):
+    return get_store().search_batch(query_vectors, top_k, file_filters=file_filters, page_range=page_range)
+
+def iter_payloads(batch_size=256):
+    return get_store().iter_payloads(batch_size)
+
+def count():
+    return get_store().count()